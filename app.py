@@ -1,30 +1,57 @@
 import streamlit as st
 import os
-import google.generativeai as genai
+import uuid
+import threading
 from dotenv import load_dotenv
-from backend.document_loader import save_uploaded_file, extract_text_from_pdf, extract_text_from_html
-from backend.rag_pipeline import build_and_persist_vectorstore, load_vectorstore_and_qa
+from backend.document_loader import (
+    store_uploaded_file,
+    is_upload_processed,
+    preview_pdf_text,
+    extract_text_from_html,
+)
+from backend.summarizer import SUMMARY_PROMPTS, document_summaries
+from backend.llm_backend import get_llm_backend
+from backend.index_catalog import list_documents, namespace_dir, register_document
+from backend.ingest_jobs import DONE, FAILED, get_ingest_queue
 from backend.mindmap_generator import generate_mindmap_outline, generate_study_mindmap
+from backend.utils import source_label
 from frontend.components import render_answer
-import graphviz
 
 # Load environment variables
 load_dotenv()
 
-# Get the API key and configure Gemini
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not found in .env file")
 
-# Configure Gemini with API key
-genai.configure(api_key=api_key)
+# backend.rag_pipeline pulls in torch, sentence-transformers, langchain and FAISS,
+# and the embedding model takes seconds to load. Both happen once per server in
+# a background thread, so neither the first page render nor the first question waits.
+@st.cache_resource
+def start_embedding_warmup():
+    def warm_up():
+        from backend.rag_pipeline import get_embeddings
 
-# Check if API key is properly configured
-gemini_configured = True
+        get_embeddings()
+        print("✅ Embedding model warmed up")
+
+    thread = threading.Thread(target=warm_up, name="embedding-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+if os.getenv("EMBEDDING_WARMUP", "true").lower() == "true":
+    start_embedding_warmup()
+
+# Generation backend shared by every tab (Gemini unless LLM_BACKEND says otherwise)
+try:
+    llm = get_llm_backend()
+    gemini_configured = True
+except ValueError:
+    gemini_configured = False
 
 def plot_mindmap(node):
     """Convert mindmap outline to graphviz visualization"""
     try:
+        import graphviz
+
         dot = graphviz.Digraph()
         dot.attr(rankdir='TB')  # Top to bottom layout
         dot.attr('node', shape='box', style='rounded,filled', fillcolor='lightblue')
@@ -78,6 +105,21 @@ if 'vectorstore_loaded' not in st.session_state:
     st.session_state.vectorstore_loaded = False
 if 'current_document' not in st.session_state:
     st.session_state.current_document = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'selected_docs' not in st.session_state:
+    st.session_state.selected_docs = []
+if 'auto_selected' not in st.session_state:
+    st.session_state.auto_selected = set()
+if 'ingest_jobs' not in st.session_state:
+    st.session_state.ingest_jobs = {}  # job id -> doc id, uploads this session is waiting for
+if 'ingest_failed' not in st.session_state:
+    st.session_state.ingest_failed = {}  # doc id -> error message
+# A document processed in the last run joins the selection before the widget is drawn
+if 'pending_doc' in st.session_state:
+    if st.session_state.pending_doc not in st.session_state.selected_docs:
+        st.session_state.selected_docs = st.session_state.selected_docs + [st.session_state.pending_doc]
+    del st.session_state.pending_doc
 
 # =====================
 # CUSTOM CSS
@@ -97,6 +139,102 @@ body {
 st.sidebar.title("📂 Folders")
 st.sidebar.button("➕ New Folder")
 
+# Documents in the shared catalog; questions fan out over the selected ones
+catalog_docs = dict(list_documents())
+st.session_state.selected_docs = [d for d in st.session_state.selected_docs if d in catalog_docs]
+st.sidebar.multiselect(
+    "📚 Documents",
+    options=list(catalog_docs),
+    format_func=lambda doc_id: catalog_docs[doc_id]["name"],
+    key="selected_docs",
+)
+st.session_state.vectorstore_loaded = bool(st.session_state.selected_docs)
+
+
+# Polls while this session has uploads in the ingestion queue; the pipeline
+# itself runs in worker processes, so the script never waits on it
+@st.fragment(run_every=2 if st.session_state.ingest_jobs else None)
+def show_ingest_progress():
+    jobs = get_ingest_queue().jobs
+    for job_id, doc_id in list(st.session_state.ingest_jobs.items()):
+        job = jobs.get(job_id)
+        if job is None:
+            del st.session_state.ingest_jobs[job_id]
+        elif job["state"] == DONE:
+            register_document(doc_id, job["name"], namespace_dir(doc_id), session_id=st.session_state.session_id)
+            del st.session_state.ingest_jobs[job_id]
+            st.session_state.auto_selected.add(doc_id)
+            st.session_state.pending_doc = doc_id
+            st.rerun(scope="app")
+        elif job["state"] == FAILED:
+            del st.session_state.ingest_jobs[job_id]
+            st.session_state.ingest_failed[doc_id] = f"Error processing {job['name']}: {job['error']}"
+            st.rerun(scope="app")
+        else:
+            st.progress(job["progress"] / 100, text=f"⏳ {job['name']}: {job['state']} ({job['progress']:.0f}%)")
+    for error in st.session_state.ingest_failed.values():
+        st.error(error)
+
+
+with st.sidebar:
+    show_ingest_progress()
+st.session_state.current_document = ", ".join(
+    catalog_docs[d]["name"] for d in st.session_state.selected_docs
+) or None
+
+
+def session_qa():
+    """QA wrapper over the documents selected in this session"""
+    from backend.rag_pipeline import load_vectorstore_and_qa
+
+    return load_vectorstore_and_qa(doc_ids=st.session_state.selected_docs)
+
+
+def show_precomputed_summary(view, heading):
+    """Render the ingest-time summary view for the selected documents; False if any is missing"""
+    precomputed = document_summaries(st.session_state.selected_docs)
+    if not precomputed or not all(data and view in data["summaries"] for data in precomputed.values()):
+        return False
+    st.markdown(heading)
+    for doc_id, data in precomputed.items():
+        if len(precomputed) > 1:
+            st.markdown(f"**{catalog_docs[doc_id]['name']}**")
+        st.markdown(data["summaries"][view])
+    return True
+
+
+def selected_mindmap(mode, generate, preview):
+    """
+    Mindmap of the selected documents: each one's map-reduce mindmap over all
+    its chunks (cached per document and mode), else generate() over the
+    overview text for indexes without a chunk store. While a mindmap is being
+    built, its partial tree is shown as text in the preview placeholder.
+    """
+    from backend.rag_pipeline import document_mindmap
+
+    outlines = []
+    for doc_id in st.session_state.selected_docs:
+        def show_partial(outline, name=catalog_docs[doc_id]["name"]):
+            preview.text(f"⏳ Building the mindmap of {name}...\n\n" + display_mindmap_text(outline))
+
+        outlines.append(document_mindmap(doc_id, mode, show_partial))
+    preview.empty()
+    if not all(outlines):
+        return generate(document_overview_text("study" if mode == "study" else "mindmap"))
+    if len(outlines) == 1:
+        return outlines[0]
+    return {"topic": "Selected Documents", "children": outlines}
+
+
+def document_overview_text(query):
+    """Whole-document text for mindmaps: precomputed section summaries, else the top chunks for query"""
+    precomputed = document_summaries(st.session_state.selected_docs)
+    if precomputed and all(precomputed.values()):
+        return "\n\n".join(section for data in precomputed.values() for section in data["levels"][-1] if section)
+    docs = session_qa().retriever.invoke(query)
+    return "\n\n".join([doc.page_content for doc in docs])
+
+
 with st.sidebar.expander("📁 General (1)", expanded=False):
     st.write("Previous Chats")
     # Placeholder for previous chat items
@@ -135,7 +273,7 @@ if not gemini_configured:
     st.error("⚠️ Gemini API Key not configured! Please update your .env file with a valid GEMINI_API_KEY")
     st.stop()
 else:
-    st.success("✅ Gemini API Key configured")
+    st.success("✅ Gemini API Key configured" if llm.name == "gemini" else f"✅ Using {llm.name} generation backend")
 
 # =====================
 # MAIN CONTENT AREA
@@ -166,31 +304,27 @@ if mode == "Chat":
         
         # Generate and display assistant response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                try:
-                    if st.session_state.vectorstore_loaded:
-                        # Use RAG pipeline if document is loaded
-                        qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-                        answer, sources = qa.run_with_sources(prompt)
-                        st.markdown(answer)
-                        
-                        # Show sources in expander
-                        with st.expander("📚 Sources"):
-                            for i, source in enumerate(sources):
-                                st.write(f"Source {i+1}: {source}")
-                    else:
-                        # Use direct Gemini for general chat
-                        model = genai.GenerativeModel("models/gemini-1.5-flash")
-                        response = model.generate_content(prompt)
-                        answer = response.text
-                        st.markdown(answer)
-                    
-                    # Add assistant response to chat history
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
-                    
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-                    st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I encountered an error: {str(e)}"})
+            try:
+                if st.session_state.vectorstore_loaded:
+                    # Use RAG pipeline if document is loaded; tokens render as they arrive
+                    with st.spinner("Thinking..."):
+                        sources, chunks = session_qa().stream(prompt)
+                    answer = st.write_stream(chunks)
+
+                    # Show sources in expander
+                    with st.expander("📚 Sources"):
+                        for i, source in enumerate(sources):
+                            st.write(f"{source_label(source, i)}: {source['text'][:200]}")
+                else:
+                    # Use the generation backend directly for general chat
+                    answer = st.write_stream(llm.stream(prompt))
+
+                # Add assistant response to chat history
+                st.session_state.messages.append({"role": "assistant", "content": answer})
+                
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+                st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I encountered an error: {str(e)}"})
 
     st.subheader("Tools")
     colA, colB, colC = st.columns(3)
@@ -216,8 +350,6 @@ elif mode == "Study":
             if st.button("Get Answer"):
                 with st.spinner("Generating study answer..."):
                     try:
-                        model = genai.GenerativeModel("models/gemini-1.5-flash")
-                        
                         # Enhanced prompt for study mode
                         study_prompt = f"""
                         You are a helpful study assistant. Please provide a comprehensive, educational answer to this study question:
@@ -233,10 +365,9 @@ elif mode == "Study":
                         Make it educational and easy to understand for learning purposes.
                         """
                         
-                        response = model.generate_content(study_prompt)
-                        answer = response.text
+                        chunks = llm.stream(study_prompt)
                         st.markdown("**Study Answer:**")
-                        st.markdown(answer)
+                        answer = st.write_stream(chunks)
                         
                     except Exception as e:
                         st.error(f"Error generating answer: {str(e)}")
@@ -247,181 +378,6 @@ elif mode == "Study":
         st.button("Add Flashcard")
         st.write("📚 Flashcards will appear here.")
 
-    with tab3:
-        st.text_area("Mindmap Topic", placeholder="Enter main topic...")
-        st.button("Generate Mindmap")
-        st.write("🧠 Mindmap visualization placeholder")
-
-# --- SUMMARY MODE ---
-elif mode == "Summary":
-    st.write("Document summarization and analysis tools.")
-    tab1, tab2, tab3 = st.tabs(["Document Upload", "Summary Generation", "Key Insights"])
-
-    with tab1:
-        st.subheader("📄 Document Upload for Summarization")
-        
-        # Document upload
-        uploaded_file = st.file_uploader("Upload Document for Summarization", type=["pdf", "html", "md", "txt"])
-        
-        if uploaded_file:
-            try:
-                # Save uploaded file
-                save_path = save_uploaded_file(uploaded_file, dest_folder="data/uploads")
-                st.success(f"✅ Document saved: {uploaded_file.name}")
-                
-                # Extract text based on file type
-                if uploaded_file.type == "application/pdf" or uploaded_file.name.endswith('.pdf'):
-                    text = extract_text_from_pdf(save_path)
-                else:
-                    text = extract_text_from_html(save_path)
-                
-                # Show extracted text preview
-                with st.expander("📖 Extracted Text Preview"):
-                    st.text_area("Text Content", value=text[:2000] + "..." if len(text) > 2000 else text, height=300)
-                
-                # Process document button
-                if st.button("🔍 Process Document for Summarization"):
-                    with st.spinner("Processing document..."):
-                        try:
-                            # Build vectorstore
-                            vs_path = build_and_persist_vectorstore([text], persist_dir="data/processed/vectorstore")
-                            st.session_state.vectorstore_loaded = True
-                            st.session_state.current_document = uploaded_file.name
-                            st.success("✅ Document processed successfully! Ready for summarization.")
-                        except Exception as e:
-                            st.error(f"Error processing document: {str(e)}")
-                
-            except Exception as e:
-                st.error(f"Error processing file: {str(e)}")
-
-    with tab2:
-        st.subheader("📝 Summary Generation")
-        
-        if st.session_state.vectorstore_loaded and st.session_state.current_document:
-            st.write(f"**Document:** {st.session_state.current_document}")
-            
-            # Summary options
-            summary_type = st.selectbox(
-                "Choose summary type:",
-                ["Executive Summary", "Key Points", "Detailed Summary", "Bullet Points"]
-            )
-            
-            if st.button("📄 Generate Summary"):
-                with st.spinner("Generating summary..."):
-                    try:
-                        model = genai.GenerativeModel("models/gemini-1.5-flash")
-                        
-                        # Get document content for summarization
-                        qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-                        docs = qa.retriever.invoke("summary")
-                        full_text = "\n\n".join([doc.page_content for doc in docs])
-                        
-                        # Create summary prompt based on type
-                        if summary_type == "Executive Summary":
-                            prompt = f"Create a concise executive summary of the following document:\n\n{full_text}"
-                        elif summary_type == "Key Points":
-                            prompt = f"Extract the key points from the following document:\n\n{full_text}"
-                        elif summary_type == "Detailed Summary":
-                            prompt = f"Create a detailed summary of the following document:\n\n{full_text}"
-                        else:  # Bullet Points
-                            prompt = f"Summarize the following document in bullet points:\n\n{full_text}"
-                        
-                        response = model.generate_content(prompt)
-                        summary = response.text
-                        
-                        st.markdown("**Generated Summary:**")
-                        st.markdown(summary)
-                        
-                    except Exception as e:
-                        st.error(f"Error generating summary: {str(e)}")
-        else:
-            st.info("Please upload and process a document first to generate summaries.")
-
-    with tab3:
-        st.subheader("🔍 Key Insights")
-        
-        if st.session_state.vectorstore_loaded and st.session_state.current_document:
-            st.write(f"**Document:** {st.session_state.current_document}")
-            
-            if st.button("💡 Extract Key Insights"):
-                with st.spinner("Extracting insights..."):
-                    try:
-                        model = genai.GenerativeModel("models/gemini-1.5-flash")
-                        
-                        # Get document content
-                        qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-                        docs = qa.retriever.invoke("insights")
-                        full_text = "\n\n".join([doc.page_content for doc in docs])
-                        
-                        prompt = f"""
-                        Analyze the following document and extract key insights, important findings, and notable information:
-                        
-                        {full_text}
-                        
-                        Please provide:
-                        1. Main themes and topics
-                        2. Key findings or conclusions
-                        3. Important statistics or data points
-                        4. Notable quotes or statements
-                        5. Action items or recommendations (if any)
-                        """
-                        
-                        response = model.generate_content(prompt)
-                        insights = response.text
-                        
-                        st.markdown("**Key Insights:**")
-                        st.markdown(insights)
-                        
-                    except Exception as e:
-                        st.error(f"Error extracting insights: {str(e)}")
-        else:
-            st.info("Please upload and process a document first to extract insights.")
-
-# --- STUDY MODE (Additional Study Features) ---
-elif mode == "Study":
-    st.write("Advanced study tools and learning assistance.")
-    tab1, tab2, tab3 = st.tabs(["Study Q&A", "Flashcards", "Mindmaps"])
-
-    with tab1:
-        st.subheader("📚 Study Q&A")
-        
-        if study_question := st.text_area("Ask a Question", placeholder="Enter your study question..."):
-            if st.button("Get Answer"):
-                with st.spinner("Generating study answer..."):
-                    try:
-                        model = genai.GenerativeModel("models/gemini-1.5-flash")
-                        
-                        # Enhanced prompt for study mode
-                        study_prompt = f"""
-                        You are a helpful study assistant. Please provide a comprehensive, educational answer to this study question:
-                        
-                        {study_question}
-                        
-                        Please structure your answer with:
-                        1. A clear explanation
-                        2. Key points to remember
-                        3. Examples if applicable
-                        4. Study tips related to this topic
-                        
-                        Make it educational and easy to understand for learning purposes.
-                        """
-                        
-                        response = model.generate_content(study_prompt)
-                        answer = response.text
-                        st.markdown("**Study Answer:**")
-                        st.markdown(answer)
-                        
-                    except Exception as e:
-                        st.error(f"Error generating answer: {str(e)}")
-
-    with tab2:
-        st.subheader("📚 Flashcards")
-        st.text_input("Flashcard Term")
-        st.text_area("Definition")
-        if st.button("Add Flashcard"):
-            st.info("Flashcard feature coming soon!")
-        st.write("📚 Flashcards will appear here.")
-
     with tab3:
         st.subheader("🧠 Mindmaps")
         
@@ -429,18 +385,15 @@ elif mode == "Study":
             st.write("Generate a mindmap from your uploaded document:")
             
             col1, col2 = st.columns([1, 1])
+            # Full width under the buttons: the partial tree while a mindmap builds
+            preview = st.empty()
             
             with col1:
                 if st.button("🧠 Generate Document Mindmap", type="primary"):
                     with st.spinner("Generating mindmap from document..."):
                         try:
-                            # Get document content
-                            qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-                            docs = qa.retriever.invoke("mindmap")
-                            full_text = "\n\n".join([doc.page_content for doc in docs])
-                            
-                            # Generate mindmap outline
-                            outline = generate_mindmap_outline(full_text)
+                            # Map-reduce over the whole document, built once per document
+                            outline = selected_mindmap("overview", generate_mindmap_outline, preview)
                             
                             # Store in session state
                             st.session_state.mindmap_outline = outline
@@ -453,13 +406,8 @@ elif mode == "Study":
                 if st.button("📚 Generate Study Mindmap", type="secondary"):
                     with st.spinner("Generating study-focused mindmap..."):
                         try:
-                            # Get document content
-                            qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-                            docs = qa.retriever.invoke("study")
-                            full_text = "\n\n".join([doc.page_content for doc in docs])
-                            
-                            # Generate study mindmap outline
-                            outline = generate_study_mindmap(full_text)
+                            # Map-reduce over the whole document, built once per document
+                            outline = selected_mindmap("study", generate_study_mindmap, preview)
                             
                             # Store in session state
                             st.session_state.mindmap_outline = outline
@@ -510,6 +458,120 @@ elif mode == "Study":
             5. Click "Generate Document Mindmap" or "Generate Study Mindmap"
             """)
 
+# --- SUMMARY MODE ---
+elif mode == "Summary":
+    st.write("Document summarization and analysis tools.")
+    tab1, tab2, tab3 = st.tabs(["Document Upload", "Summary Generation", "Key Insights"])
+
+    with tab1:
+        st.subheader("📄 Document Upload for Summarization")
+        
+        # Document upload
+        uploaded_file = st.file_uploader("Upload Document for Summarization", type=["pdf", "html", "md", "txt"])
+        
+        if uploaded_file:
+            try:
+                # Save uploaded file (content-addressed, so re-uploads are deduplicated)
+                save_path, content_hash, _ = store_uploaded_file(uploaded_file, dest_folder="data/uploads")
+                st.success(f"✅ Document saved: {uploaded_file.name}")
+
+                if is_upload_processed(content_hash, namespace_dir(content_hash), dest_folder="data/uploads"):
+                    # Same content was already extracted, chunked and embedded
+                    register_document(content_hash, uploaded_file.name, namespace_dir(content_hash),
+                                      session_id=st.session_state.session_id)
+                    # Select it once per upload; the user may deselect it afterwards
+                    if content_hash not in st.session_state.auto_selected:
+                        st.session_state.auto_selected.add(content_hash)
+                        st.session_state.pending_doc = content_hash
+                        st.rerun()
+                    st.info("✅ This document has already been processed. Ready for summarization.")
+                else:
+                    # Extract text based on file type; PDFs are streamed page by page
+                    is_pdf = uploaded_file.type == "application/pdf" or uploaded_file.name.endswith('.pdf')
+                    if is_pdf:
+                        text = preview_pdf_text(save_path, max_chars=2000)
+                    else:
+                        text = extract_text_from_html(save_path)
+
+                    # Show extracted text preview
+                    with st.expander("📖 Extracted Text Preview"):
+                        st.text_area("Text Content", value=text[:2000] + "..." if len(text) > 2000 else text, height=300)
+
+                    # Process document button; indexing runs in the background ingestion queue
+                    if content_hash in st.session_state.ingest_jobs.values():
+                        st.info("⏳ Processing in the background; progress is shown in the sidebar.")
+                    elif st.button("🔍 Process Document for Summarization"):
+                        job = get_ingest_queue().submit(content_hash, uploaded_file.name, save_path,
+                                                        session_id=st.session_state.session_id)
+                        st.session_state.ingest_jobs[job["id"]] = content_hash
+                        st.session_state.ingest_failed.pop(content_hash, None)
+                        st.rerun()
+
+            except Exception as e:
+                st.error(f"Error processing file: {str(e)}")
+
+    with tab2:
+        st.subheader("📝 Summary Generation")
+        
+        if st.session_state.vectorstore_loaded and st.session_state.current_document:
+            st.write(f"**Document:** {st.session_state.current_document}")
+            
+            # Summary options
+            summary_type = st.selectbox(
+                "Choose summary type:",
+                ["Executive Summary", "Key Points", "Detailed Summary", "Bullet Points"]
+            )
+            
+            if st.button("📄 Generate Summary"):
+                # Precomputed at ingest over the whole document
+                if not show_precomputed_summary(summary_type, "**Generated Summary:**"):
+                    with st.spinner("Generating summary..."):
+                        try:
+                            # Get document content for summarization
+                            qa = session_qa()
+                            docs = qa.retriever.invoke("summary")
+                            full_text = "\n\n".join([doc.page_content for doc in docs])
+                        
+                            # Create summary prompt based on type
+                            prompt = SUMMARY_PROMPTS[summary_type].format(text=full_text)
+                        
+                            chunks = llm.stream(prompt)
+
+                            st.markdown("**Generated Summary:**")
+                            summary = st.write_stream(chunks)
+                        
+                        except Exception as e:
+                            st.error(f"Error generating summary: {str(e)}")
+        else:
+            st.info("Please upload and process a document first to generate summaries.")
+
+    with tab3:
+        st.subheader("🔍 Key Insights")
+        
+        if st.session_state.vectorstore_loaded and st.session_state.current_document:
+            st.write(f"**Document:** {st.session_state.current_document}")
+            
+            if st.button("💡 Extract Key Insights"):
+                if not show_precomputed_summary("Key Insights", "**Key Insights:**"):
+                    with st.spinner("Extracting insights..."):
+                        try:
+                            # Get document content
+                            qa = session_qa()
+                            docs = qa.retriever.invoke("insights")
+                            full_text = "\n\n".join([doc.page_content for doc in docs])
+                        
+                            prompt = SUMMARY_PROMPTS["Key Insights"].format(text=full_text)
+                        
+                            chunks = llm.stream(prompt)
+
+                            st.markdown("**Key Insights:**")
+                            insights = st.write_stream(chunks)
+                        
+                        except Exception as e:
+                            st.error(f"Error extracting insights: {str(e)}")
+        else:
+            st.info("Please upload and process a document first to extract insights.")
+
 # =====================
 # SUGGESTIVE PROMPTS
 # =====================
@@ -560,10 +622,10 @@ if 'suggested_prompt' in st.session_state:
     elif mode == "Summary" and st.session_state.vectorstore_loaded:
         # Process with RAG for summarization
         try:
-            qa = load_vectorstore_and_qa(persist_dir="data/processed/vectorstore")
-            answer, sources = qa.run_with_sources(st.session_state.suggested_prompt)
+            qa = session_qa()
+            sources, chunks = qa.stream(st.session_state.suggested_prompt)
             st.markdown("**Answer:**")
-            st.markdown(answer)
+            st.write_stream(chunks)
             del st.session_state.suggested_prompt
         except Exception as e:
             st.error(f"Error: {str(e)}")
@@ -571,7 +633,6 @@ if 'suggested_prompt' in st.session_state:
     elif mode == "Study":
         # Process with study-focused prompts
         try:
-            model = genai.GenerativeModel("models/gemini-1.5-flash")
             study_prompt = f"""
             You are a helpful study assistant. Please provide a comprehensive, educational answer to this study question:
             
@@ -585,9 +646,9 @@ if 'suggested_prompt' in st.session_state:
             
             Make it educational and easy to understand for learning purposes.
             """
-            response = model.generate_content(study_prompt)
+            chunks = llm.stream(study_prompt)
             st.markdown("**Study Answer:**")
-            st.markdown(response.text)
+            st.write_stream(chunks)
             del st.session_state.suggested_prompt
         except Exception as e:
             st.error(f"Error: {str(e)}")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Batch question answering for Intuitas AI
+
+Reads one JSON object per line with a "question" field (any other fields,
+e.g. an "id", are copied to the output) and writes one answer per line:
+
+    python ask_batch.py questions.jsonl answers.jsonl --doc <doc_id> --concurrency 8
+"""
+import argparse
+import json
+import sys
+
+
+def read_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer questions from a JSONL file against an indexed document")
+    parser.add_argument("questions", help="input JSONL, one {\"question\": ...} per line")
+    parser.add_argument("answers", help="output JSONL ('-' for stdout)")
+    parser.add_argument("--doc", action="append", dest="doc_ids",
+                        help="document id from the catalog (repeat for several documents)")
+    parser.add_argument("--persist-dir", default="data/processed/vectorstore",
+                        help="index directory, used when no --doc is given")
+    parser.add_argument("--concurrency", type=int, default=4, help="generation calls in flight")
+    parser.add_argument("--rpm", type=float, default=None, help="max generation requests per minute")
+    parser.add_argument("--retries", type=int, default=3, help="retries per question on generation errors")
+    args = parser.parse_args(argv)
+
+    from backend.rag_pipeline import answer_batch
+
+    records = read_questions(args.questions)
+    results = answer_batch(
+        [r["question"] for r in records],
+        concurrency=args.concurrency,
+        persist_dir=args.persist_dir,
+        doc_ids=args.doc_ids,
+        requests_per_minute=args.rpm,
+        max_retries=args.retries,
+    )
+
+    out = sys.stdout if args.answers == "-" else open(args.answers, "w", encoding="utf-8")
+    failed = 0
+    try:
+        for record, result in zip(records, results):
+            failed += "error" in result
+            out.write(json.dumps({**record, **result}, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"✅ Answered {len(records) - failed}/{len(records)} questions", file=sys.stderr)
+    if failed:
+        print(f"⚠️ {failed} questions failed after retries", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# backend/answer_cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query):
+    # "What are the key findings?" and "what are the  key findings" share an entry
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.rstrip("?.!").strip()
+
+
+class AnswerCache:
+    """
+    Answers keyed by index version + normalized query, persisted in SQLite.
+    With a semantic_threshold (opt-in, off at 0), a miss on the exact key may
+    still reuse an answer whose query embedding has cosine similarity >= the
+    threshold; a near-duplicate question then gets the other question's
+    answer and sources. Entries expire after ttl seconds; least recently used
+    ones are evicted past max_entries.
+    """
+
+    def __init__(self, path="data/processed/answer_cache.sqlite", ttl=24 * 3600,
+                 max_entries=1000, semantic_threshold=0.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (version, query) -> entry dict
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " version TEXT NOT NULL, query TEXT NOT NULL, answer TEXT NOT NULL,"
+            " sources TEXT NOT NULL, embedding BLOB, created REAL NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (version, query))"
+        )
+        self._conn.commit()
+        self._load()
+
+    @property
+    def semantic(self):
+        return bool(self.semantic_threshold)
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self._conn.execute("DELETE FROM answers WHERE created < ?", (cutoff,))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT version, query, answer, sources, embedding, created FROM answers ORDER BY last_used"
+        )
+        for version, query, answer, sources, blob, created in rows:
+            self._entries[(version, query)] = {
+                "answer": answer,
+                "sources": json.loads(sources),
+                "embedding": np.frombuffer(blob, dtype=np.float32) if blob else None,
+                "created": created,
+            }
+        self._evict()
+
+    def _evict(self):
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            evicted.append(key)
+        if evicted:
+            self._conn.executemany("DELETE FROM answers WHERE version = ? AND query = ?", evicted)
+            self._conn.commit()
+
+    def _expired(self, entry, now):
+        return now - entry["created"] > self.ttl
+
+    def _touch(self, key, now):
+        self._entries.move_to_end(key)
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE version = ? AND query = ?", (now, *key))
+        self._conn.commit()
+
+    def _semantic_lookup(self, version, embedding, now):
+        query_norm = np.linalg.norm(embedding)
+        if not query_norm:
+            return None
+        best_key, best_score = None, self.semantic_threshold
+        for key, entry in self._entries.items():
+            if key[0] != version or entry["embedding"] is None or self._expired(entry, now):
+                continue
+            norm = np.linalg.norm(entry["embedding"])
+            if not norm:
+                continue
+            score = float(np.dot(entry["embedding"], embedding) / (norm * query_norm))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, version, query, embedding=None):
+        """Return {"answer", "sources"} or None"""
+        key = (version, normalize_query(query))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is None and self.semantic and embedding is not None:
+                key = self._semantic_lookup(version, np.asarray(embedding, dtype=np.float32), now)
+                entry = self._entries.get(key) if key else None
+                if entry is not None:
+                    self.semantic_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key, now)
+            return {"answer": entry["answer"], "sources": entry["sources"]}
+
+    def put(self, version, query, answer, sources, embedding=None):
+        key = (version, normalize_query(query))
+        now = time.time()
+        vector = np.asarray(embedding, dtype=np.float32) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = {"answer": answer, "sources": sources, "embedding": vector, "created": now}
+            self._entries.move_to_end(key)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, answer, json.dumps(sources), vector.tobytes() if vector is not None else None, now, now),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def stats(self):
+        return {"hits": self.hits, "semantic_hits": self.semantic_hits, "misses": self.misses}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,28 +1,168 @@
 # backend/document_loader.py
 import os
-import uuid
+import json
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import pdfplumber
 import html2text
 from bs4 import BeautifulSoup
+from backend.utils import file_lock
 
+# Uploads are stored under the sha256 of their content, so byte-identical
+# re-uploads map to the same file. manifest.json maps original names to hashes
+# and records which vectorstores a file has already been processed into.
+# Updates hold file_lock() on it: the app and the ingest workers both write it.
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "manifest.json"
 
-def save_uploaded_file(uploaded_file, dest_folder="data/uploads"):
+
+def _manifest_path(dest_folder):
+    return os.path.join(dest_folder, MANIFEST_NAME)
+
+
+def load_manifest(dest_folder="data/uploads"):
+    try:
+        with open(_manifest_path(dest_folder), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"files": {}, "names": {}}
+
+
+def _save_manifest(manifest, dest_folder):
+    # Write to a temp file and rename so readers never see a partial manifest
+    fd, tmp_path = tempfile.mkstemp(dir=dest_folder, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(dest_folder))
+
+
+def store_uploaded_file(uploaded_file, dest_folder="data/uploads"):
+    """
+    Stream an upload to disk in chunks under its content hash.
+    Returns (path, content_hash, is_new); is_new is False for a duplicate upload.
+    """
     os.makedirs(dest_folder, exist_ok=True)
-    filename = f"{uuid.uuid4().hex}_{uploaded_file.name}"
-    path = os.path.join(dest_folder, filename)
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    ext = os.path.splitext(uploaded_file.name)[1].lower()
+    digest = hashlib.sha256()
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: uploaded_file.read(CHUNK_SIZE), b""):
+                digest.update(block)
+                f.write(block)
+        content_hash = digest.hexdigest()
+        path = os.path.join(dest_folder, f"{content_hash}{ext}")
+
+        with file_lock(_manifest_path(dest_folder)):
+            is_new = not os.path.exists(path)
+            if is_new:
+                os.replace(tmp_path, path)
+            manifest = load_manifest(dest_folder)
+            entry = manifest["files"].setdefault(
+                content_hash, {"path": path, "size": os.path.getsize(path), "names": [], "processed": []}
+            )
+            if uploaded_file.name not in entry["names"]:
+                entry["names"].append(uploaded_file.name)
+            manifest["names"][uploaded_file.name] = content_hash
+            _save_manifest(manifest, dest_folder)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path, content_hash, is_new
+
+
+def save_uploaded_file(uploaded_file, dest_folder="data/uploads"):
+    path, _, _ = store_uploaded_file(uploaded_file, dest_folder)
     return path
 
 
+def is_upload_processed(content_hash, persist_dir, dest_folder="data/uploads"):
+    """True if this content was already processed into the index at persist_dir"""
+    entry = load_manifest(dest_folder)["files"].get(content_hash)
+    if not entry or os.path.abspath(persist_dir) not in entry["processed"]:
+        return False
+    # index.faiss, or index.sparse.npz for TF-IDF stores (vectorstore_handler.has_index,
+    # not imported here to keep faiss out of app startup)
+    return any(os.path.exists(os.path.join(persist_dir, name)) for name in ("index.faiss", "index.sparse.npz"))
+
+
+def mark_upload_processed(content_hash, persist_dir, dest_folder="data/uploads"):
+    persist_dir = os.path.abspath(persist_dir)
+    with file_lock(_manifest_path(dest_folder)):
+        manifest = load_manifest(dest_folder)
+        entry = manifest["files"][content_hash]
+        if persist_dir not in entry["processed"]:
+            entry["processed"].append(persist_dir)
+        _save_manifest(manifest, dest_folder)
+
+
+# Pages handed to each extraction task; a task opens the PDF once per range
+PAGES_PER_TASK = 8
+
+
+def pdf_page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_page_range(path, start, stop):
+    with pdfplumber.open(path) as pdf:
+        return [(i + 1, pdf.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def iter_pdf_pages(path, workers=None, pages_per_task=PAGES_PER_TASK):
+    """
+    Yield (page_number, text) records in page order.
+    Page ranges are extracted in a process pool; at most two ranges per worker
+    are in flight, so memory stays bounded for long documents.
+    """
+    n_pages = pdf_page_count(path)
+    ranges = [(start, min(start + pages_per_task, n_pages)) for start in range(0, n_pages, pages_per_task)]
+    workers = workers or min(os.cpu_count() or 1, len(ranges))
+    if workers <= 1 or len(ranges) <= 1:
+        with pdfplumber.open(path) as pdf:
+            for i, page in enumerate(pdf.pages):
+                yield i + 1, page.extract_text() or ""
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        next_range = iter(ranges)
+        for start, stop in islice(next_range, workers * 2):
+            pending.append(pool.submit(_extract_page_range, path, start, stop))
+        while pending:
+            pages = pending.popleft().result()
+            for start, stop in islice(next_range, 1):
+                pending.append(pool.submit(_extract_page_range, path, start, stop))
+            yield from pages
+    finally:
+        # Also runs when the consumer stops early
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 def extract_text_from_pdf(path):
     text = []
+    for page_number, page_text in iter_pdf_pages(path):
+        # add small marker for page references
+        text.append(f"\n\n[Page {page_number}]\n" + page_text)
+    return "\n".join(text)
+
+
+def preview_pdf_text(path, max_chars=2000):
+    # Reads pages serially only until max_chars of text have been collected
+    text = ""
     with pdfplumber.open(path) as pdf:
         for i, page in enumerate(pdf.pages):
-            page_text = page.extract_text() or ""
-            # add small marker for page references
-            text.append(f"\n\n[Page {i+1}]\n" + page_text)
-    return "\n".join(text)
+            text += f"\n\n[Page {i+1}]\n" + (page.extract_text() or "")
+            if len(text) >= max_chars:
+                break
+    return text
 
 
 def extract_text_from_html(path):
@@ -0,0 +1,93 @@
+# backend/embedding_cache.py
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# SQLite has a limit on bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of float32 embeddings keyed by model name + sha256 of the text.
+    hits / misses count texts served from the cache vs. sent to the encoder.
+    """
+
+    def __init__(self, path="data/processed/embedding_cache.sqlite"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model, hashes):
+        """Return {hash: vector} for the hashes present in the cache"""
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """Store (hash, vector) pairs"""
+        rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def embed_with_cache(cache, model, texts, encode):
+    """
+    Embed texts, serving cached vectors and calling encode() once with the
+    distinct texts that are missing. Returns a float32 matrix in input order.
+    """
+    hashes = [text_hash(t) for t in texts]
+    vectors = cache.get_many(model, set(hashes))
+
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in vectors:
+            missing.setdefault(h, t)
+    n_hits = sum(1 for h in hashes if h in vectors)
+    cache.hits += n_hits
+    cache.misses += len(hashes) - n_hits
+
+    if missing:
+        encoded = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        new_items = list(zip(missing.keys(), encoded))
+        cache.put_many(model, new_items)
+        vectors.update(new_items)
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([vectors[h] for h in hashes])
@@ -0,0 +1,67 @@
+# backend/index_catalog.py
+import os
+import json
+import time
+import tempfile
+from backend.utils import file_lock
+
+# Each document gets its own index namespace under INDEX_ROOT; catalog.json is
+# the shared list of indexed documents and the sessions that uploaded them.
+# Updates hold file_lock(path), as the app and the ingest workers both write it.
+INDEX_ROOT = "data/processed/indexes"
+CATALOG_PATH = "data/processed/catalog.json"
+
+
+def namespace_dir(doc_id, root=INDEX_ROOT):
+    return os.path.join(root, doc_id)
+
+
+def load_catalog(path=CATALOG_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"documents": {}}
+
+
+def _save_catalog(catalog, path):
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def register_document(doc_id, name, persist_dir, session_id=None, path=CATALOG_PATH):
+    with file_lock(path):
+        catalog = load_catalog(path)
+        entry = catalog["documents"].setdefault(
+            doc_id, {"name": name, "persist_dir": persist_dir, "added": time.time(), "sessions": []}
+        )
+        entry["persist_dir"] = persist_dir
+        if session_id and session_id not in entry["sessions"]:
+            entry["sessions"].append(session_id)
+        _save_catalog(catalog, path)
+    return entry
+
+
+def unregister_document(doc_id, path=CATALOG_PATH):
+    with file_lock(path):
+        catalog = load_catalog(path)
+        entry = catalog["documents"].pop(doc_id, None)
+        _save_catalog(catalog, path)
+    return entry
+
+
+def list_documents(session_id=None, path=CATALOG_PATH):
+    """[(doc_id, entry)] newest first; only the session's own documents if session_id is given"""
+    documents = [
+        (doc_id, entry) for doc_id, entry in load_catalog(path)["documents"].items()
+        if session_id is None or session_id in entry["sessions"]
+    ]
+    return sorted(documents, key=lambda item: item[1]["added"], reverse=True)
+
+
+def get_document(doc_id, path=CATALOG_PATH):
+    return load_catalog(path)["documents"].get(doc_id)
@@ -0,0 +1,236 @@
+# backend/ingest_jobs.py
+import os
+import time
+import uuid
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Uploads are indexed by a pool of worker processes. The jobs table is the only
+# state the app and the workers share: the app queues jobs and polls their
+# state and progress, workers update them as they go.
+JOBS_PATH = "data/processed/ingest_jobs.sqlite"
+
+QUEUED, EXTRACTING, EMBEDDING, INDEXING, DONE, FAILED = (
+    "queued", "extracting", "embedding", "indexing", "done", "failed"
+)
+ACTIVE_STATES = (QUEUED, EXTRACTING, EMBEDDING, INDEXING)
+
+# Overall progress (percent) when each stage starts
+STAGE_PROGRESS = {QUEUED: 0, EXTRACTING: 0, EMBEDDING: 10, INDEXING: 80, DONE: 100}
+
+_COLUMNS = ("id", "doc_id", "name", "path", "session_id", "state", "progress", "error", "created", "updated")
+
+
+class JobStore:
+    """Ingestion jobs persisted in SQLite; safe to open from several processes"""
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL,"
+            " session_id TEXT, state TEXT NOT NULL, progress REAL NOT NULL, error TEXT,"
+            " created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _select(self, where="", params=()):
+        rows = self._conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs {where} ORDER BY created DESC", params)
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def create(self, doc_id, name, path, session_id=None):
+        """Queue a job for doc_id; returns (job, created), reusing the document's active job if it has one"""
+        marks = ", ".join("?" * len(ACTIVE_STATES))
+        with self._lock:
+            active = self._select(f"WHERE doc_id = ? AND state IN ({marks})", (doc_id, *ACTIVE_STATES))
+            if active:
+                return active[0], False
+            now = time.time()
+            job = dict(id=uuid.uuid4().hex, doc_id=doc_id, name=name, path=path, session_id=session_id,
+                       state=QUEUED, progress=0.0, error=None, created=now, updated=now)
+            self._conn.execute(f"INSERT INTO jobs VALUES ({', '.join('?' * len(_COLUMNS))})",
+                               [job[c] for c in _COLUMNS])
+            self._conn.commit()
+        return job, True
+
+    def update(self, job_id, state=None, progress=None, error=None):
+        if progress is None and state is not None:
+            progress = STAGE_PROGRESS.get(state)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = COALESCE(?, state), progress = COALESCE(?, progress),"
+                " error = COALESCE(?, error), updated = ? WHERE id = ?",
+                (state, progress, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            jobs = self._select("WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def jobs(self, session_id=None, active_only=False):
+        """Jobs newest first, optionally only one session's and only unfinished ones"""
+        where, params = [], []
+        if session_id is not None:
+            where.append("session_id = ?")
+            params.append(session_id)
+        if active_only:
+            where.append(f"state IN ({', '.join('?' * len(ACTIVE_STATES))})")
+            params.extend(ACTIVE_STATES)
+        with self._lock:
+            return self._select("WHERE " + " AND ".join(where) if where else "", params)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _track_pages(pages, n_pages, jobs, job_id):
+    """Pass (page_number, text) records through, reporting embedding progress by pages consumed"""
+    first, last = STAGE_PROGRESS[EMBEDDING], STAGE_PROGRESS[INDEXING]
+    reported = first
+    for done, page in enumerate(pages, start=1):
+        yield page
+        progress = first + (last - first) * done // max(n_pages, 1)
+        if progress > reported:
+            jobs.update(job_id, progress=progress)
+            reported = progress
+
+
+def run_job(job_id, path=JOBS_PATH):
+    """Extract, embed and index one upload; runs in a worker process"""
+    from backend.document_loader import extract_text_from_html, iter_pdf_pages, mark_upload_processed, pdf_page_count
+    from backend.rag_pipeline import build_document_index
+
+    jobs = JobStore(path)
+    job = jobs.get(job_id)
+    try:
+        jobs.update(job_id, EXTRACTING)
+        if job["path"].lower().endswith(".pdf"):
+            # PDF pages are extracted while earlier pages are embedded
+            content = _track_pages(iter_pdf_pages(job["path"]), pdf_page_count(job["path"]), jobs, job_id)
+        else:
+            content = extract_text_from_html(job["path"])
+        jobs.update(job_id, EMBEDDING)
+        persist_dir = build_document_index(job["doc_id"], content, job["name"], session_id=job["session_id"],
+                                           on_index=lambda: jobs.update(job_id, INDEXING))
+        mark_upload_processed(job["doc_id"], persist_dir, dest_folder=os.path.dirname(job["path"]))
+        jobs.update(job_id, DONE)
+        print(f"✅ Indexed {job['name']}")
+    except Exception as e:
+        print(f"❌ Ingestion of {job['name']} failed: {e}")
+        jobs.update(job_id, FAILED, error=str(e) or type(e).__name__)
+    finally:
+        jobs.close()
+
+
+def run_summaries(doc_id):
+    """Precompute an indexed document's summaries; queued after its ingestion job is done"""
+    from backend.index_catalog import namespace_dir
+    from backend.rag_pipeline import document_chunks, precompute_summaries
+
+    precompute_summaries(document_chunks(doc_id), namespace_dir(doc_id))
+
+
+class IngestQueue:
+    """
+    Runs ingestion jobs in a process pool of INGEST_WORKERS processes (default 1).
+    Uploads can be queued faster than they are processed; jobs left unfinished
+    by a previous run are queued again when the queue starts. Once a job is
+    done, the document's summaries are queued behind the uploads waiting so far.
+    A worker that dies (out of memory, a crash in a native parser) breaks the
+    whole pool: the jobs it took down are marked failed and a new pool is started.
+    """
+
+    def __init__(self, path=JOBS_PATH, workers=None):
+        self.path = path
+        self.jobs = JobStore(path)
+        self.workers = workers or int(os.getenv("INGEST_WORKERS", "1"))
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        self._pool = self._new_pool()
+        for job in reversed(self.jobs.jobs(active_only=True)):
+            self.jobs.update(job["id"], QUEUED)
+            self._start(job)
+
+    def _new_pool(self):
+        # spawn: the app process runs threads, which fork() would copy mid-state
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, broken):
+        with self._pool_lock:
+            if self._pool is broken and not self._closed:
+                print("⚠️ An ingestion worker process died; restarting the worker pool")
+                self._pool = self._new_pool()
+        broken.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        """(future, pool) for fn(*args), replacing the pool first if a dead worker broke it"""
+        pool = self._pool
+        try:
+            return pool.submit(fn, *args), pool
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            pool = self._pool
+            return pool.submit(fn, *args), pool
+
+    def _start(self, job):
+        future, pool = self._submit(run_job, job["id"], self.path)
+
+        def check(future):
+            # run_job records its own errors; this catches a worker that died
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                self.jobs.update(job["id"], FAILED, error="worker process died")
+                self._replace_pool(pool)
+            elif error is not None:
+                self.jobs.update(job["id"], FAILED, error=str(error) or "worker process failed")
+            elif self.jobs.get(job["id"])["state"] == DONE:
+                self._start_summaries(job["doc_id"])
+
+        future.add_done_callback(check)
+
+    def _start_summaries(self, doc_id):
+        try:
+            future, pool = self._submit(run_summaries, doc_id)
+        except RuntimeError:
+            return  # shutting down
+
+        def check(future):
+            if isinstance(future.exception(), BrokenProcessPool):
+                self._replace_pool(pool)
+
+        future.add_done_callback(check)
+
+    def submit(self, doc_id, name, path, session_id=None):
+        """Queue an upload for indexing and return its job (the running one if doc_id is already queued)"""
+        job, created = self.jobs.create(doc_id, name, path, session_id=session_id)
+        if created:
+            self._start(job)
+        return job
+
+    def shutdown(self, wait=True):
+        with self._pool_lock:
+            self._closed = True
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_ingest_queue():
+    """The process-wide ingestion queue, started on first use"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestQueue()
+        return _queue
@@ -0,0 +1,116 @@
+# backend/lexical_index.py
+import re
+import numpy as np
+from scipy import sparse
+
+# Saved next to index.faiss by IncrementalVectorStore.save()
+LEXICAL_FILE = "lexical.npz"
+
+# Words plus dotted / hyphenated terms such as "3.14", "f1-score" or "e=mc2"
+_TOKEN = re.compile(r"\w+(?:[.\-=']\w+)*")
+
+
+def tokenize(text):
+    """Lowercased terms; compound terms are kept whole and also split into their parts"""
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        term = match.group()
+        tokens.append(term)
+        if not term.isalnum():
+            tokens.extend(part for part in re.split(r"[.\-=']", term) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of chunks. The per-term BM25 weights are
+    precomputed into a sparse (chunks x vocabulary) matrix, so scoring a batch
+    of queries is one sparse matrix product.
+    """
+
+    def __init__(self, ids, weights, vocabulary):
+        # Imported here: rag_pipeline loads this module whether or not BM25 is used
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.ids = list(ids)
+        self.weights = weights.tocsr()
+        self.vocabulary = vocabulary
+        self._vectorizer = CountVectorizer(analyzer=tokenize, vocabulary=vocabulary, binary=True)
+
+    @classmethod
+    def build(cls, ids, texts, k1=1.5, b=0.75):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        ids, texts = list(ids), list(texts)
+        try:
+            counts = CountVectorizer(analyzer=tokenize, dtype=np.float32)
+            tf = counts.fit_transform(texts).tocsr()
+        except ValueError:
+            # No terms at all (empty or symbol-only chunks)
+            return cls(ids, sparse.csr_matrix((len(ids), 0), dtype=np.float32), {})
+
+        n = tf.shape[0]
+        lengths = np.asarray(tf.sum(axis=1), dtype=np.float32).ravel()
+        avg_length = lengths.mean() or 1.0
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        rows = np.repeat(np.arange(n), np.diff(tf.indptr))
+        norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+        weights = tf.copy()
+        weights.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+        vocabulary = {term: int(i) for term, i in counts.vocabulary_.items()}
+        return cls(ids, weights, vocabulary)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, queries):
+        """(queries x chunks) dense BM25 score matrix"""
+        if not self.vocabulary:
+            return np.zeros((len(queries), len(self.ids)), dtype=np.float32)
+        q = self._vectorizer.transform(queries).astype(np.float32)
+        return (q @ self.weights.T).toarray()
+
+    def search_batch(self, queries, k=20):
+        """[[(id, score)]] per query, best first; chunks sharing no term are left out"""
+        scores = self.scores(queries)
+        k = min(k, len(self.ids))
+        results = []
+        for row in scores:
+            if not k:
+                results.append([])
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind="stable")]
+            results.append([(self.ids[i], float(row[i])) for i in top if row[i] > 0])
+        return results
+
+    def search(self, query, k=20):
+        return self.search_batch([query], k)[0]
+
+    def save(self, f):
+        terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=str)
+        np.savez(
+            f, ids=np.array(self.ids, dtype=str), terms=terms, data=self.weights.data,
+            indices=self.weights.indices, indptr=self.weights.indptr, shape=np.array(self.weights.shape),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            weights = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+            vocabulary = {str(term): i for i, term in enumerate(data["terms"])}
+            return cls(data["ids"].tolist(), weights, vocabulary)
+
+
+def reciprocal_rank_fusion(rankings, k=4, rrf_k=60):
+    """
+    Fuse ranked lists of hashable keys: each key scores sum(1 / (rrf_k + rank)).
+    Returns the top-k keys, ties broken by first appearance.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda key: -scores[key])[:k]
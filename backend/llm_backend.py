@@ -0,0 +1,172 @@
+# backend/llm_backend.py
+import os
+import time
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_GEMINI_MODEL = "models/gemini-1.5-flash"
+
+
+def iter_response_text(response):
+    # Yields the text of each streamed chunk; chunks without text parts
+    # (e.g. the final finish-reason chunk) raise ValueError on .text
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if text:
+            yield text
+
+
+class GenerationBackend:
+    """
+    Text generation interface used by the QA pipeline, mindmaps and the app.
+    Subclasses implement generate(); stream() and agenerate() fall back to it.
+    """
+
+    name = "base"
+
+    @property
+    def model_id(self):
+        """Backend and model, part of the answer cache's version key"""
+        return self.name
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        yield self.generate(prompt)
+
+    async def agenerate(self, prompt):
+        return await asyncio.to_thread(self.generate, prompt)
+
+
+class GeminiBackend(GenerationBackend):
+    name = "gemini"
+
+    def __init__(self, model_name=DEFAULT_GEMINI_MODEL, api_key=None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY not found in .env file")
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model_id(self):
+        return f"{self.name}:{self.model_name}"
+
+    @property
+    def model(self):
+        # The Gemini SDK takes about a second to import; defer it to the first call
+        if self._model is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt):
+        yield from iter_response_text(self.model.generate_content(prompt, stream=True))
+
+    async def agenerate(self, prompt):
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class FakeBackend(GenerationBackend):
+    """
+    Deterministic local stand-in for offline tests and benchmarks.
+    reply is a fixed string or a function of the prompt; by default the reply
+    echoes the start of the prompt's context. first_token_latency and
+    token_latency (seconds) simulate provider time to first token and per chunk.
+    """
+
+    name = "fake"
+
+    def __init__(self, reply=None, first_token_latency=0.0, token_latency=0.0, chunk_size=16):
+        self.reply = reply
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.chunks_streamed = 0
+        self._lock = threading.Lock()
+
+    def _reply(self, prompt):
+        if callable(self.reply):
+            return self.reply(prompt)
+        if self.reply is not None:
+            return self.reply
+        context = prompt
+        if "Context:" in prompt:
+            context = prompt.split("Context:", 1)[1].split("Question:", 1)[0]
+        return "Based on the context: " + " ".join(context.split())[:300]
+
+    def _chunks(self, prompt):
+        text = self._reply(prompt)
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+
+    def _count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def generate(self, prompt):
+        self._count_call()
+        chunks = self._chunks(prompt)
+        time.sleep(self.first_token_latency + self.token_latency * (len(chunks) - 1))
+        return "".join(chunks)
+
+    def stream(self, prompt):
+        self._count_call()
+        for i, chunk in enumerate(self._chunks(prompt)):
+            time.sleep(self.first_token_latency if i == 0 else self.token_latency)
+            with self._lock:
+                self.chunks_streamed += 1
+            yield chunk
+
+    async def agenerate(self, prompt):
+        self._count_call()
+        chunks = self._chunks(prompt)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * (len(chunks) - 1))
+        return "".join(chunks)
+
+
+def create_llm_backend(name=None):
+    """Build the backend named by LLM_BACKEND (gemini | fake)"""
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend(os.getenv("GEMINI_MODEL", DEFAULT_GEMINI_MODEL))
+    if name == "fake":
+        return FakeBackend(
+            first_token_latency=float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "0")) / 1000,
+            token_latency=float(os.getenv("FAKE_LLM_TOKEN_MS", "0")) / 1000,
+        )
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+_llm_backend = None
+_llm_lock = threading.Lock()
+
+
+def get_llm_backend():
+    # Process-wide backend shared by every caller
+    global _llm_backend
+    with _llm_lock:
+        if _llm_backend is None:
+            _llm_backend = create_llm_backend()
+    return _llm_backend
+
+
+def set_llm_backend(backend):
+    """Swap the shared backend, e.g. for a FakeBackend in tests and benchmarks"""
+    global _llm_backend
+    with _llm_lock:
+        _llm_backend = backend
@@ -1,30 +1,19 @@
 # backend/mindmap_generator.py
-import json
-import google.generativeai as genai
-from dotenv import load_dotenv
 import os
+import re
+import json
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from backend.llm_backend import get_llm_backend
+from backend.outline_parser import OutlineParser
+from backend.summarizer import chunks_fingerprint, group_texts
 
-# Load environment variables and configure Gemini
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not found in .env file")
-
-# Configure Gemini with API key
-genai.configure(api_key=api_key)
+# Map-reduce mindmaps are cached next to the document's index, per mode
+MINDMAP_FILE = "mindmaps.json"
 
-def generate_mindmap_outline(text, model="models/gemini-1.5-flash"):
-    """
-    Generate a mindmap outline from document text using Gemini API
-    Returns a hierarchical JSON structure with "topic" and "children"
-    """
-    try:
-        # Initialize Gemini model
-        llm = genai.GenerativeModel(model)
-        
-        # Create prompt for mindmap generation
-        prompt = f"""
-        Analyze the following document and create a mindmap outline.
+MINDMAP_PROMPTS = {
+    "overview": """
+        Analyze the following part of a document and create a mindmap outline.
         Use a hierarchical JSON structure with "topic" and "children".
         The structure should be:
         {{
@@ -40,86 +29,19 @@ def generate_mindmap_outline(text, model="models/gemini-1.5-flash"):
                     ]
                 }},
                 {{
-                    "topic": "Subtopic 2", 
+                    "topic": "Subtopic 2",
                     "children": []
                 }}
             ]
         }}
 
         Document:
-        {text[:4000]}  # Keep to safe token limit
-        
-        Return ONLY the JSON structure, no additional text or explanations.
-        """
-        
-        response = llm.generate_content(prompt)
-        
-        # Try to parse the JSON response
-        try:
-            # Clean the response text to extract JSON
-            response_text = response.text.strip()
-            
-            # Remove any markdown formatting if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            outline = json.loads(response_text)
-            
-            # Validate the structure
-            if not isinstance(outline, dict) or "topic" not in outline:
-                raise ValueError("Invalid JSON structure")
-                
-            return outline
-            
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing failed: {e}")
-            print(f"Raw response: {response.text}")
-            
-            # Fallback: create a simple structure
-            return {
-                "topic": "Document Analysis",
-                "children": [
-                    {
-                        "topic": "Key Points",
-                        "children": [
-                            {
-                                "topic": response.text[:100] + "...",
-                                "children": []
-                            }
-                        ]
-                    }
-                ]
-            }
-            
-    except Exception as e:
-        print(f"Error generating mindmap: {e}")
-        # Return a fallback structure
-        return {
-            "topic": "Document",
-            "children": [
-                {
-                    "topic": "Analysis Error",
-                    "children": [
-                        {
-                            "topic": f"Could not generate mindmap: {str(e)}",
-                            "children": []
-                        }
-                    ]
-                }
-            ]
-        }
+        {text}
 
-def generate_study_mindmap(text, model="models/gemini-1.5-flash"):
-    """
-    Generate a study-focused mindmap outline from document text
-    """
-    try:
-        llm = genai.GenerativeModel(model)
-        
-        prompt = f"""
-        Analyze the following document and create a study-focused mindmap outline.
+        Return ONLY the JSON structure, no additional text or explanations.
+        """,
+    "study": """
+        Analyze the following part of a document and create a study-focused mindmap outline.
         Structure it for learning and memorization with clear topics, subtopics, and key concepts.
         Use this JSON format:
         {{
@@ -143,49 +65,229 @@ def generate_study_mindmap(text, model="models/gemini-1.5-flash"):
         }}
 
         Document:
-        {text[:4000]}
-        
+        {text}
+
         Focus on:
         - Main themes and topics
         - Key concepts and definitions
         - Important relationships
         - Study points and takeaways
-        
+
         Return ONLY the JSON structure.
-        """
-        
-        response = llm.generate_content(prompt)
-        
-        try:
-            response_text = response.text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-                
-            outline = json.loads(response_text)
-            
-            if not isinstance(outline, dict) or "topic" not in outline:
-                raise ValueError("Invalid JSON structure")
-                
-            return outline
-            
-        except json.JSONDecodeError:
-            return {
-                "topic": "Study Guide",
-                "children": [
-                    {
-                        "topic": "Key Learning Points",
-                        "children": [
-                            {
-                                "topic": response.text[:100] + "...",
-                                "children": []
-                            }
-                        ]
-                    }
-                ]
-            }
-            
+        """,
+}
+
+THEME_PROMPT = """
+The following topics come from consecutive parts of one document:
+
+{topics}
+
+Reply with a short title (at most six words) that covers all of them, and nothing else.
+"""
+
+
+def parse_outline(response_text):
+    """The {"topic", "children"} tree in a complete LLM reply, repaired if needed; raises ValueError if there is none"""
+    parser = OutlineParser()
+    parser.feed(response_text)
+    return parser.close()
+
+
+def topic_key(topic):
+    # "2. Key Findings:" and "key findings" are the same topic
+    key = re.sub(r"[^\w\s]", " ", topic.casefold())
+    return " ".join(re.sub(r"^\s*\d+\s*", "", key).split())
+
+
+def merge_topics(nodes, parent_key=None):
+    """
+    Merge sibling nodes with the same topic (ignoring case, punctuation and
+    numbering), recursively, keeping first-seen order. A child repeating its
+    parent's topic is replaced by its own children.
+    """
+    merged = {}
+    pending = list(nodes)
+    while pending:
+        node = pending.pop(0)
+        key = topic_key(node["topic"])
+        if not key:
+            continue
+        if key == parent_key:
+            pending[0:0] = node["children"]
+            continue
+        if key in merged:
+            merged[key]["children"] = merged[key]["children"] + node["children"]
+        else:
+            merged[key] = {"topic": node["topic"], "children": list(node["children"])}
+    for key, node in merged.items():
+        node["children"] = merge_topics(node["children"], key)
+    return list(merged.values())
+
+
+def outline_size(node):
+    return 1 + sum(outline_size(child) for child in node["children"])
+
+
+def limit_outline(node, max_depth, max_children):
+    """Cut the tree to max_depth levels and max_children per node (keeping the largest subtrees, in order)"""
+    children = node["children"] if max_depth > 1 else []
+    if len(children) > max_children:
+        largest = sorted(range(len(children)), key=lambda i: -outline_size(children[i]))[:max_children]
+        children = [children[i] for i in sorted(largest)]
+    return {"topic": node["topic"], "children": [limit_outline(c, max_depth - 1, max_children) for c in children]}
+
+
+def split_sections(text, max_chars):
+    """Consecutive paragraphs of text packed into sections of at most max_chars"""
+    paragraphs = []
+    for paragraph in text.split("\n\n"):
+        paragraphs.extend(paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars))
+    return group_texts([p for p in paragraphs if p.strip()], max_chars)
+
+
+def _theme(llm, nodes):
+    topics = "\n".join(f"- {node['topic']}" for node in nodes)
+    try:
+        title = llm.generate(THEME_PROMPT.format(topics=topics)).strip().splitlines()[0]
+        title = title.strip(" \"'*#`")
+    except Exception as e:
+        print(f"⚠️ Could not name mindmap group: {e}")
+        title = ""
+    return title[:80] or f"{nodes[0]['topic']} – {nodes[-1]['topic']}"
+
+
+def partial_mindmap(outlines):
+    """One tree over the section outlines parsed so far, for progressive display"""
+    outlines = merge_topics([o for o in outlines if o])
+    if len(outlines) == 1:
+        return outlines[0]
+    return {"topic": "Document", "children": outlines} if outlines else None
+
+
+def build_mindmap(chunks, llm=None, mode="overview", max_chars=4000, workers=4, max_depth=4, max_children=8,
+                  retries=1, on_progress=None, progress_interval=0.5):
+    """
+    Map-reduce mindmap of a whole document from its chunks (in document order).
+    Map: consecutive chunks are packed into sections of at most max_chars and
+    each section's subtree is generated in parallel, at most workers at a time.
+    Reduce: while there are more than max_children subtrees, each run of
+    max_children consecutive ones becomes a node named after their common
+    theme. Topics repeated across sections are merged (section roots first,
+    then within each theme), and the tree is cut to max_depth levels and
+    max_children children per node.
+
+    Section replies are streamed through OutlineParser, so a reply that is
+    fenced, malformed or cut off still yields its tree; a section is only
+    regenerated (up to retries times) when its reply holds no outline at all.
+    on_progress(tree), if given, is called from the calling thread every
+    progress_interval seconds with the sections parsed so far.
+    """
+    if max_children < 2:
+        raise ValueError("max_children must be at least 2")
+    llm = llm or get_llm_backend()
+    prompt = MINDMAP_PROMPTS[mode]
+
+    sections = group_texts(chunks, max_chars)
+    parsers = [None] * len(sections)
+
+    def map_section(i):
+        for _ in range(retries + 1):
+            parsers[i] = parser = OutlineParser()
+            try:
+                for chunk in llm.stream(prompt.format(text=sections[i])):
+                    parser.feed(chunk)
+            except Exception as e:
+                # Whatever arrived before the failure may still be a usable tree
+                print(f"⚠️ Mindmap section stream failed: {e}")
+            try:
+                return parser.close()
+            except ValueError as e:
+                print(f"⚠️ Unusable mindmap section reply: {e}")
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(map_section, i) for i in range(len(sections))]
+        pending = set(futures)
+        while on_progress and pending:
+            _, pending = wait(pending, timeout=progress_interval, return_when=FIRST_COMPLETED)
+            partial = partial_mindmap([p.outline() for p in parsers if p is not None])
+            if partial:
+                on_progress(limit_outline(partial, max_depth, max_children))
+        level = [tree for tree in (f.result() for f in futures) if tree]
+        if not level:
+            raise ValueError("No section produced a mindmap outline")
+        level = merge_topics(level)
+        while len(level) > max_children:
+            groups = [level[i:i + max_children] for i in range(0, len(level), max_children)]
+            titles = pool.map(lambda group: _theme(llm, group), groups)
+            level = [{"topic": t, "children": merge_topics(g, topic_key(t))} for t, g in zip(titles, groups)]
+        root = level[0] if len(level) == 1 else {"topic": _theme(llm, level), "children": level}
+    return limit_outline(root, max_depth, max_children)
+
+
+def save_mindmap(persist_dir, mode, entry):
+    os.makedirs(persist_dir, exist_ok=True)
+    cached = load_mindmaps(persist_dir)
+    cached[mode] = entry
+    fd, tmp_path = tempfile.mkstemp(dir=persist_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, os.path.join(persist_dir, MINDMAP_FILE))
+
+
+def load_mindmaps(persist_dir):
+    try:
+        with open(os.path.join(persist_dir, MINDMAP_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def cached_mindmap(persist_dir, chunks, mode="overview", llm=None, on_progress=None, **options):
+    """
+    build_mindmap() for one document, cached in persist_dir per mode; rebuilt
+    only when the document's chunks or the options change.
+    """
+    key = {"fingerprint": chunks_fingerprint(chunks), "options": options}
+    entry = load_mindmaps(persist_dir).get(mode)
+    if entry and all(entry.get(k) == v for k, v in key.items()):
+        return entry["outline"]
+    outline = build_mindmap(chunks, llm, mode, on_progress=on_progress, **options)
+    save_mindmap(persist_dir, mode, dict(key, outline=outline))
+    return outline
+
+
+def generate_mindmap_outline(text, llm=None):
+    """
+    Generate a mindmap outline from document text (map-reduce over all of it)
+    Returns a hierarchical JSON structure with "topic" and "children"
+    """
+    try:
+        return build_mindmap(split_sections(text, 4000), llm, "overview")
+    except Exception as e:
+        print(f"Error generating mindmap: {e}")
+        # Return a fallback structure
+        return {
+            "topic": "Document",
+            "children": [
+                {
+                    "topic": "Analysis Error",
+                    "children": [
+                        {
+                            "topic": f"Could not generate mindmap: {str(e)}",
+                            "children": []
+                        }
+                    ]
+                }
+            ]
+        }
+
+def generate_study_mindmap(text, llm=None):
+    """
+    Generate a study-focused mindmap outline from document text
+    """
+    try:
+        return build_mindmap(split_sections(text, 4000), llm, "study")
     except Exception as e:
         return {
             "topic": "Study Document",
@@ -0,0 +1,169 @@
+# backend/onnx_embeddings.py
+import os
+import json
+import argparse
+import numpy as np
+
+# Files of an exported model directory, next to the tokenizer files
+ONNX_CONFIG_FILE = "onnx_config.json"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+
+
+def _pooling_mode(pooling):
+    config = pooling.get_config_dict()
+    if "pooling_mode" in config:  # sentence-transformers >= 5
+        mode = config["pooling_mode"]
+        modes = [mode] if isinstance(mode, str) else list(mode)
+    else:
+        modes = [key[len("pooling_mode_"):] for key, on in config.items() if key.startswith("pooling_mode_") and on]
+    modes = ["mean" if m == "mean_tokens" else "cls" if m == "cls_token" else m for m in modes]
+    if modes not in (["mean"], ["cls"]):
+        raise ValueError(f"Unsupported pooling for ONNX export: {modes}")
+    return modes[0]
+
+
+def embedding_dimension(model):
+    """Vector size of a SentenceTransformer or OnnxEncoder"""
+    # sentence-transformers >= 5 renamed get_sentence_embedding_dimension
+    if hasattr(model, "get_embedding_dimension"):
+        return model.get_embedding_dimension()
+    return model.get_sentence_embedding_dimension()
+
+
+def export_onnx_model(model_name_or_path, out_dir, quantize=True, opset=17):
+    """
+    Export a Transformer -> Pooling [-> Normalize] SentenceTransformer to
+    out_dir: the transformer as model.onnx, its dynamically quantized int8
+    copy as model.int8.onnx, the tokenizer files and onnx_config.json (pooling,
+    normalization, max sequence length). OnnxEncoder loads the result offline.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name_or_path, device="cpu")
+    names = [type(module).__name__ for module in model]
+    if names not in (["Transformer", "Pooling"], ["Transformer", "Pooling", "Normalize"]):
+        raise ValueError(f"Unsupported SentenceTransformer modules for ONNX export: {names}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    auto_model = model[0].auto_model.eval()
+    input_names = list(model.tokenizer(["export"], return_tensors="pt").keys())
+
+    class LastHiddenState(torch.nn.Module):
+        # Keyword call: the positional order of forward() differs across transformers versions
+        def __init__(self):
+            super().__init__()
+            self.model = auto_model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    sample = model.tokenizer(["an export sample", "a second, longer export sample"], padding=True, return_tensors="pt")
+    axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    model_path = os.path.join(out_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(), tuple(sample[name] for name in input_names), model_path,
+            input_names=input_names, output_names=["last_hidden_state"], dynamic_axes=axes,
+            opset_version=opset, dynamo=False,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+
+        # Shape inference + graph fusion first, so more MatMuls get int8 kernels
+        prepared_path = os.path.join(out_dir, "model.prepared.onnx")
+        quant_pre_process(model_path, prepared_path, skip_symbolic_shape=True)
+        try:
+            quantize_dynamic(prepared_path, os.path.join(out_dir, ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+        finally:
+            os.remove(prepared_path)
+
+    model.tokenizer.save_pretrained(out_dir)
+    config = {
+        "model": str(model_name_or_path),
+        "dim": embedding_dimension(model),
+        "max_seq_length": model.max_seq_length,
+        "pooling": _pooling_mode(model[1]),
+        "normalize": names[-1] == "Normalize",
+        "inputs": input_names,
+    }
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"✅ Exported {model_name_or_path} to {out_dir}")
+    return config
+
+
+class OnnxEncoder:
+    """
+    Sentence embeddings from a directory written by export_onnx_model(), run
+    with onnxruntime and the fast tokenizer; no torch and no network access.
+    quantized picks the int8 model. encode() takes the arguments of
+    SentenceTransformer.encode(); the ones that do not apply here (pool,
+    show_progress_bar, ...) are ignored.
+
+    The fp32 model reproduces the torch vectors to ~1e-6; int8 vectors keep a
+    cosine similarity of at least 0.99 to them (0.9999 with the MiniLM-shaped
+    model of benchmarks/bench_onnx_embeddings.py), so either can query
+    indexes built with torch.
+    """
+
+    def __init__(self, model_dir, quantized=True, threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        model_path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No {os.path.basename(model_path)} in {model_dir}")
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.quantized = quantized
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.config["max_seq_length"])
+
+    def get_embedding_dimension(self):
+        return self.config["dim"]
+
+    def _run(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        length = max(len(e.ids) for e in encodings)
+        feeds = {name: np.zeros((len(texts), length), dtype=np.int64) for name in self.config["inputs"]}
+        fields = {"input_ids": "ids", "attention_mask": "attention_mask", "token_type_ids": "type_ids"}
+        for row, encoding in enumerate(encodings):
+            for name, array in feeds.items():
+                values = getattr(encoding, fields[name])
+                array[row, :len(values)] = values
+        hidden = self.session.run(None, feeds)[0]
+        if self.config["pooling"] == "cls":
+            return hidden[:, 0]
+        mask = feeds["attention_mask"][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        """float32 (n, dim) matrix; texts are batched by length to keep padding low"""
+        vectors = np.zeros((len(texts), self.config["dim"]), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._run([texts[i] for i in rows])
+        if self.config["normalize"] or normalize_embeddings:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a SentenceTransformer for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2", help="hub name or local path")
+    parser.add_argument("--out", default="models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 model")
+    args = parser.parse_args()
+    export_onnx_model(args.model, args.out, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
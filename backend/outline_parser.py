@@ -0,0 +1,205 @@
+# backend/outline_parser.py
+import threading
+
+# Accepted spellings of a node's topic and children, matched case-insensitively
+TOPIC_KEYS = ("topic", "title", "name", "label", "text")
+CHILDREN_KEYS = ("children", "subtopics", "nodes", "items", "branches")
+
+_WORD_CHARS = "_-.+"
+_LITERALS = {"true": True, "false": False, "null": None, "none": None}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class OutlineParser:
+    """
+    Incremental, forgiving parser for {"topic", "children"} outlines as LLMs
+    write them. feed() takes response chunks as they arrive; outline() is the
+    tree built from everything complete so far, for progressive rendering;
+    close() repairs what is left and returns the final tree.
+
+    Text before the first { or [ (prose, a ```json fence) and after the outline
+    closes is ignored. Inside it, the parser accepts single-quoted strings,
+    unquoted keys, Python literals, missing or trailing commas, mismatched
+    closing brackets and a response cut off anywhere: close() keeps a
+    truncated last string and closes every open bracket. Nodes may spell
+    their fields title/name/subtopics/..., give children as plain strings, or
+    come as {"Topic": [children]}. Several root nodes go under a "Document"
+    root. Safe to call outline() from another thread while feeding.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = None
+        self._stack = []  # [container, pending object key]
+        self._string = None  # chars of the string being read
+        self._quote = None
+        self._escape = None  # None, "" after a backslash, or "u" + hex digits
+        self._word = None  # chars of an unquoted token
+        self._done = False
+
+    def feed(self, chunk):
+        with self._lock:
+            for ch in chunk:
+                self._consume(ch)
+
+    def outline(self):
+        """The tree parsed so far, or None"""
+        with self._lock:
+            return outline_from_value(self._root)
+
+    def close(self):
+        """The final, repaired tree; raises ValueError if the response holds none"""
+        with self._lock:
+            if self._stack:
+                if self._string is not None:
+                    self._end_string()
+                elif self._word is not None:
+                    self._end_word()
+            outline = outline_from_value(self._root)
+        if outline is None:
+            raise ValueError("No outline in response")
+        return outline
+
+    def _consume(self, ch):
+        if self._done:
+            return
+        if self._string is not None:
+            self._string_char(ch)
+            return
+        if self._word is not None:
+            if ch.isalnum() or ch in _WORD_CHARS:
+                self._word.append(ch)
+                return
+            self._end_word()
+        if not self._stack:
+            if ch in "{[":
+                self._open(ch)
+        elif ch in "\"'":
+            self._string, self._quote = [], ch
+        elif ch in "{[":
+            self._open(ch)
+        elif ch in "}]":
+            self._close(ch)
+        elif ch == ",":
+            # A key without a value (e.g. {"a", ...}) is dropped
+            self._stack[-1][1] = None
+        elif ch.isalnum() or ch in _WORD_CHARS:
+            self._word = [ch]
+        # Colons are implied by key/value alternation; anything else is noise
+
+    def _string_char(self, ch):
+        if self._escape is not None:
+            if self._escape.startswith("u"):
+                self._escape += ch
+                if len(self._escape) == 5:
+                    try:
+                        self._string.append(chr(int(self._escape[1:], 16)))
+                    except ValueError:
+                        pass
+                    self._escape = None
+            elif ch == "u":
+                self._escape = "u"
+            else:
+                self._string.append(_ESCAPES.get(ch, ch))
+                self._escape = None
+        elif ch == "\\":
+            self._escape = ""
+        elif ch == self._quote:
+            self._end_string()
+        else:
+            self._string.append(ch)
+
+    def _end_string(self):
+        value = "".join(self._string)
+        self._string = self._escape = None
+        try:
+            # Join 😀-style surrogate pairs
+            value = value.encode("utf-16", "surrogatepass").decode("utf-16")
+        except UnicodeError:
+            pass
+        self._scalar(value)
+
+    def _end_word(self):
+        token = "".join(self._word)
+        self._word = None
+        if token.lower() in _LITERALS:
+            self._scalar(_LITERALS[token.lower()])
+            return
+        for number in (int, float):
+            try:
+                self._scalar(number(token))
+                return
+            except ValueError:
+                pass
+        self._scalar(token)
+
+    def _scalar(self, value):
+        frame = self._stack[-1]
+        container, key = frame
+        if isinstance(container, list):
+            container.append(value)
+        elif key is None:
+            frame[1] = str(value)
+        else:
+            container[key] = value
+            frame[1] = None
+
+    def _open(self, ch):
+        new = {} if ch == "{" else []
+        if not self._stack:
+            self._root = new
+        else:
+            frame = self._stack[-1]
+            container, key = frame
+            if isinstance(container, list):
+                container.append(new)
+            elif key is not None:
+                container[key] = new
+                frame[1] = None
+            # else: a value without a key; parsed to keep brackets balanced, then dropped
+        self._stack.append([new, None])
+
+    def _close(self, ch):
+        kind = dict if ch == "}" else list
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if isinstance(self._stack[depth][0], kind):
+                del self._stack[depth:]
+                break
+        if not self._stack:
+            if outline_from_value(self._root) is None:
+                # Braces in prose ("{note}") before the outline: keep looking
+                self._root = None
+            else:
+                self._done = True
+
+
+def _topic(value):
+    return " ".join(str(value).split())
+
+
+def _nodes(value):
+    """Outline nodes for a parsed value: several for lists and {"Topic": children} objects"""
+    if isinstance(value, list):
+        return [node for item in value for node in _nodes(item)]
+    if isinstance(value, dict):
+        fields = {str(k).lower(): v for k, v in value.items()}
+        topic = next((fields[k] for k in TOPIC_KEYS if isinstance(fields.get(k), (str, int, float))
+                      and not isinstance(fields[k], bool) and _topic(fields[k])), None)
+        children = next((fields[k] for k in CHILDREN_KEYS if k in fields), [])
+        if topic is not None:
+            return [{"topic": _topic(topic), "children": _nodes(children)}]
+        if any(k in fields for k in TOPIC_KEYS + CHILDREN_KEYS):
+            # Topic missing (or not streamed yet): keep the children
+            return _nodes(children)
+        return [{"topic": _topic(k), "children": _nodes(v)} for k, v in value.items() if _topic(k)]
+    if isinstance(value, str) and _topic(value):
+        return [{"topic": _topic(value), "children": []}]
+    return []
+
+
+def outline_from_value(value):
+    """A single-rooted {"topic", "children"} tree from a parsed JSON value, or None"""
+    nodes = _nodes(value)
+    if not nodes:
+        return None
+    return nodes[0] if len(nodes) == 1 else {"topic": "Document", "children": nodes}
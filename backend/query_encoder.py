@@ -0,0 +1,121 @@
+# backend/query_encoder.py
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call. The first
+    caller of a batch runs fn on every pending item and hands each caller its
+    own result. While another batch is running it first waits up to window
+    seconds (less once max_batch items are pending) so more callers can join;
+    a call on an idle batcher runs at once. No background thread is involved.
+    """
+
+    def __init__(self, fn, window=0.005, max_batch=64):
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending = []  # [(item, Future)]
+        self._running = 0
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        future = Future()
+        with self._lock:
+            self._pending.append((item, future))
+            leader = len(self._pending) == 1
+            busy = self._running > 0
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+        if leader:
+            if busy:
+                self._full.wait(self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._full.clear()
+                self._running += 1
+                self.batches += 1
+                self.items += len(batch)
+            try:
+                results = self.fn([item for item, _ in batch])
+            except Exception as e:
+                for _, waiter in batch:
+                    waiter.set_exception(e)
+            else:
+                for (_, waiter), result in zip(batch, results):
+                    waiter.set_result(result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        return future.result()
+
+
+class QueryEncoder:
+    """
+    Query embeddings for one encoder (texts -> float32 matrix). Vectors are
+    kept in an in-process LRU of max_entries queries; single queries that
+    miss it are micro-batched with concurrent ones into one encoder call.
+    """
+
+    def __init__(self, encode, max_entries=1024, window=0.005, max_batch=64):
+        self.encode = encode
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # query text -> vector
+        self._lock = threading.Lock()
+        self._batcher = MicroBatcher(self._encode_misses, window, max_batch) if window > 0 else None
+
+    def _lookup(self, texts):
+        with self._lock:
+            found = {}
+            for text in texts:
+                vector = self._entries.get(text)
+                if vector is not None:
+                    self._entries.move_to_end(text)
+                    found[text] = vector
+            self.hits += sum(text in found for text in texts)
+            self.misses += sum(text not in found for text in texts)
+            return found
+
+    def _encode_misses(self, texts):
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, np.asarray(self.encode(unique), dtype=np.float32)))
+        with self._lock:
+            for text, vector in vectors.items():
+                vector.setflags(write=False)
+                self._entries[text] = vector
+                self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return [vectors[text] for text in texts]
+
+    def embed(self, text):
+        """One query's vector (read-only; copy before modifying)"""
+        vector = self._lookup([text]).get(text)
+        if vector is not None:
+            return vector
+        if self._batcher is None:
+            return self._encode_misses([text])[0]
+        return self._batcher.submit(text)
+
+    def embed_many(self, texts):
+        """(n, dim) matrix for a batch of queries; misses go to the encoder in one call"""
+        found = self._lookup(texts)
+        missing = [text for text in texts if text not in found]
+        if missing:
+            found.update(zip(missing, self._encode_misses(missing)))
+        return np.vstack([found[text] for text in texts]) if texts else np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self):
+        batcher = self._batcher
+        return {
+            "hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+            "batches": batcher.batches if batcher else 0, "batched_queries": batcher.items if batcher else 0,
+        }
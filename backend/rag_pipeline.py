@@ -1,27 +1,47 @@
 # backend/rag_pipeline.py
 import os
-import google.generativeai as genai
+import time
+import random
+import atexit
+import inspect
+import asyncio
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from sentence_transformers import SentenceTransformer
+import faiss
+from backend.vectorstore_handler import (
+    CHUNK_INDEX_FILE,
+    CHUNK_META_FILE,
+    CHUNK_TEXT_FILE,
+    ChunkStore,
+    IncrementalVectorStore,
+    chunk_hash,
+    has_index,
+    load_lexical_index,
+    open_vectorstore,
+    store_lock,
+)
+from backend.sparse_embeddings import SPARSE_INDEX_FILE
+from backend.lexical_index import reciprocal_rank_fusion
+from backend.embedding_cache import EmbeddingCache, embed_with_cache
+from backend.query_encoder import QueryEncoder
+from backend.index_catalog import namespace_dir, register_document
+from backend.llm_backend import get_llm_backend
+from backend.answer_cache import AnswerCache
+from backend.summarizer import chunks_fingerprint, load_summaries, save_summaries, summaries_complete, summarize_document
+from backend.mindmap_generator import cached_mindmap
 
-# Load environment variables and configure Gemini
+# Load environment variables
 load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY not found in .env file")
-
-# Configure Gemini with API key
-genai.configure(api_key=api_key)
 
 # Use SentenceTransformers for embeddings (no cloud credentials needed)
 from langchain.embeddings.base import Embeddings
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 import ssl
 
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
 class LocalEmbeddings(Embeddings):
     _instance = None
     _initialized = False
@@ -33,150 +53,795 @@ class LocalEmbeddings(Embeddings):
     
     def __init__(self):
         if not self._initialized:
-            try:
-                # Try to load the model with proper parameters
-                ssl._create_default_https_context = ssl._create_unverified_context
-                
-                # First try to load from Hugging Face with proper parameters
-                self.model = SentenceTransformer(
-                    "sentence-transformers/all-MiniLM-L6-v2",
-                    trust_remote_code=True
-                )
-                print("✅ SentenceTransformer model loaded successfully from Hugging Face")
-            except Exception as e:
-                print(f"⚠️ Failed to load from Hugging Face: {e}")
+            # EMBEDDING_BACKEND=onnx: the int8 ONNX export of the same model (see backend.onnx_embeddings)
+            self.backend = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+            self.model = self._load_onnx() if self.backend == "onnx" else None
+            if self.model is None:
+                self.backend = "torch"
                 try:
-                    # Try to load from local cache if available
-                    local_model = r"C:\Users\PREETHI H M\.cache\huggingface\hub\models--sentence-transformers--all-MiniLM-L6-v2"
+                    # torch and sentence-transformers take seconds to import; only pay for them here
+                    from sentence_transformers import SentenceTransformer
+
+                    # Try to load the model with proper parameters
+                    ssl._create_default_https_context = ssl._create_unverified_context
+                
+                    # First try to load from Hugging Face with proper parameters
                     self.model = SentenceTransformer(
-                        local_model,
+                        EMBEDDING_MODEL_NAME,
                         trust_remote_code=True
                     )
-                    print("✅ SentenceTransformer model loaded successfully from local cache")
-                except Exception as e2:
-                    print(f"⚠️ Failed to load from local cache: {e2}")
-                    print("🔄 Falling back to simple TF-IDF embeddings...")
-                    self.model = None
-                    self._init_tfidf()
-            
+                    print("✅ SentenceTransformer model loaded successfully from Hugging Face")
+                except Exception as e:
+                    print(f"⚠️ Failed to load from Hugging Face: {e}")
+                    try:
+                        # Try to load from local cache if available
+                        local_model = r"C:\Users\PREETHI H M\.cache\huggingface\hub\models--sentence-transformers--all-MiniLM-L6-v2"
+                        self.model = SentenceTransformer(
+                            local_model,
+                            trust_remote_code=True
+                        )
+                        print("✅ SentenceTransformer model loaded successfully from local cache")
+                    except Exception as e2:
+                        print(f"⚠️ Failed to load from local cache: {e2}")
+                        print("🔄 Falling back to simple TF-IDF embeddings...")
+                        self.model = None
+                        self._init_tfidf()
+
+            # Encoding options; normalized vectors make L2 search rank by cosine
+            self.batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+            self.normalize = os.getenv("EMBED_NORMALIZE", "false").lower() == "true"
+            self.workers = int(os.getenv("EMBED_WORKERS", "0"))
+            self._pool = None
+
+            # Query vectors: an LRU shared by every session, and concurrent
+            # queries coalesced into one encoder call within a few milliseconds
+            self.queries = QueryEncoder(
+                self._encode,
+                max_entries=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+                window=float(os.getenv("QUERY_BATCH_WINDOW_MS", "5")) / 1000,
+                max_batch=self.batch_size,
+            ) if self.model else None
+
+            # Chunk embeddings persist across runs, keyed by model + chunk hash
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH", "data/processed/embedding_cache.sqlite")
+            self.cache = EmbeddingCache(cache_path) if cache_path else None
             self._initialized = True
     
+    def _load_onnx(self):
+        model_dir = os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx")
+        quantized = os.getenv("EMBEDDING_ONNX_QUANTIZED", "true").lower() == "true"
+        try:
+            from backend.onnx_embeddings import OnnxEncoder
+
+            model = OnnxEncoder(model_dir, quantized=quantized)
+            print(f"✅ ONNX {'int8' if quantized else 'fp32'} embedding model loaded from {model_dir}")
+            return model
+        except Exception as e:
+            print(f"⚠️ Failed to load ONNX model from {model_dir}: {e}")
+            print("🔄 Falling back to the SentenceTransformer...")
+            return None
+
     def _init_tfidf(self):
         """Fallback to TF-IDF if SentenceTransformer fails"""
-        self.tfidf = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.fitted = False
+        # Hashed vocabulary: nothing to fit, so it is the same after a restart
+        from backend.sparse_embeddings import TfidfEmbeddings
+
+        self.sparse = TfidfEmbeddings(int(os.getenv("TFIDF_FEATURES", str(2 ** 14))))
     
+    def _encode(self, texts):
+        """Encode with the SentenceTransformer (or ONNX model) into a float32 matrix, batch by batch"""
+        if self.backend == "torch" and self.workers > 1 and len(texts) >= self.batch_size * self.workers:
+            if self._pool is None:
+                # Many-core CPU hosts: one encoder process per worker
+                self._pool = self.model.start_multi_process_pool(["cpu"] * self.workers)
+                atexit.register(self.stop_pool)
+            if "pool" in inspect.signature(self.model.encode).parameters:
+                vectors = self.model.encode(
+                    texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=self.normalize,
+                    pool=self._pool,
+                )
+            else:
+                # sentence-transformers < 5: encode() takes no pool
+                vectors = self.model.encode_multi_process(
+                    texts, self._pool, batch_size=self.batch_size, normalize_embeddings=self.normalize
+                )
+        else:
+            vectors = self.model.encode(
+                texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=self.normalize
+            )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def stop_pool(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    @property
+    def vector_space(self):
+        # Normalized and raw vectors are different spaces
+        return EMBEDDING_MODEL_NAME + ("|normalized" if self.normalize else "")
+
+    @property
+    def cache_model_key(self):
+        # ONNX vectors are close to the torch ones but not equal: cache them apart
+        if self.backend == "onnx":
+            return self.vector_space + ("|onnx-int8" if self.model.quantized else "|onnx")
+        return self.vector_space
+
+    @property
+    def is_sparse(self):
+        # The TF-IDF fallback produces sparse document vectors (see IncrementalVectorStore)
+        return self.model is None
+
+    @property
+    def embedder_info(self):
+        """Name and dimension recorded with every index built from these embeddings"""
+        if self.model is None:
+            return self.sparse.embedder_info
+        # Shared by both backends: ONNX queries can search indexes built with torch
+        from backend.onnx_embeddings import embedding_dimension
+
+        return {"name": self.vector_space, "dim": embedding_dimension(self.model)}
+
+    def embed_documents_array(self, texts):
+        """Embed texts as a float32 (n, dim) matrix, ready for faiss without list round-trips"""
+        if self.model:
+            if self.cache is not None:
+                return embed_with_cache(self.cache, self.cache_model_key, texts, self._encode)
+            return self._encode(texts)
+        # TF-IDF fallback: a sparse matrix
+        return self.sparse.embed_documents_array(texts)
+
     def embed_documents(self, texts):
+        # LangChain interface expects lists of floats
+        if self.model is None:
+            return self.sparse.embed_documents(texts)
+        return self.embed_documents_array(texts).tolist()
+
+    def cache_stats(self):
+        """Embedding cache hit/miss counters since startup"""
+        if self.cache is None:
+            return {"hits": 0, "misses": 0}
+        return self.cache.stats()
+
+    def embed_queries_array(self, texts):
+        """Embed many queries; the ones not in the query LRU go to the encoder in one call"""
         if self.model:
-            return self.model.encode(texts).tolist()
-        else:
-            # TF-IDF fallback
-            if not self.fitted:
-                self.tfidf.fit(texts)
-                self.fitted = True
-            return self.tfidf.transform(texts).toarray().tolist()
-    
+            return self.queries.embed_many(texts)
+        return self.sparse.embed_queries_array(texts)
+
     def embed_query(self, text):
         if self.model:
-            return self.model.encode([text]).tolist()[0]
-        else:
-            # TF-IDF fallback
-            if not self.fitted:
-                return [0.0] * 1000
-            return self.tfidf.transform([text]).toarray().tolist()[0]
+            return self.queries.embed(text).tolist()
+        return self.sparse.embed_query(text)
 
 # Create a global embeddings instance to avoid multiple initializations
 _embeddings = None
+_singleton_lock = threading.Lock()
 
 def get_embeddings():
     global _embeddings
-    if _embeddings is None:
-        _embeddings = LocalEmbeddings()
+    with _singleton_lock:
+        if _embeddings is None:
+            _embeddings = LocalEmbeddings()
     return _embeddings
 
-def build_and_persist_vectorstore(texts, persist_dir="data/processed/vectorstore"):
-    os.makedirs(persist_dir, exist_ok=True)
-    # Chunk
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = []
-    for t in texts:
-        docs.extend(splitter.split_text(t))
+_answer_cache = None
+
+def get_answer_cache():
+    # Shared answer cache; ANSWER_CACHE_PATH="" turns it off
+    global _answer_cache
+    path = os.getenv("ANSWER_CACHE_PATH", "data/processed/answer_cache.sqlite")
+    if not path:
+        return None
+    with _singleton_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(
+                path,
+                ttl=float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600))),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+                semantic_threshold=float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0")),
+            )
+    return _answer_cache
+
+def open_store(persist_dir, embeddings):
+    # FAISS_INDEX_TYPE applies to new stores; existing ones keep their stored type
+    params = {"min_train": int(os.getenv("FAISS_MIN_TRAIN", "1000"))}
+    if os.getenv("FAISS_NLIST"):
+        params["nlist"] = int(os.getenv("FAISS_NLIST"))
+    return IncrementalVectorStore(persist_dir, embeddings, index_type=os.getenv("FAISS_INDEX_TYPE", "flat"),
+                                  index_params=params)
+
+
+def _add_documents(texts, persist_dir, doc_ids, on_index=None):
+    if doc_ids is None:
+        doc_ids = [chunk_hash(t) for t in texts]
 
     # Use local embeddings to avoid cloud credentials
     embeddings = get_embeddings()
-    vs = FAISS.from_texts(docs, embeddings)
-    vs.save_local(persist_dir)
+    with store_lock(persist_dir):
+        store = open_store(persist_dir, embeddings)
+        for doc_id, t in zip(doc_ids, texts):
+            store.add_document(doc_id, t)
+        if on_index:
+            on_index()
+        store.save()
+    _index_registry.invalidate(persist_dir)
+    return store
+
+
+def build_and_persist_vectorstore(texts, persist_dir="data/processed/vectorstore", doc_ids=None):
+    # Adds each text as a document of the persistent store; documents already in
+    # the index are kept, and re-adding one only embeds its changed chunks.
+    # A text may also be a stream of (page_number, text) records from
+    # iter_pdf_pages(). doc_ids defaults to the sha256 of each text.
+    _add_documents(texts, persist_dir, doc_ids)
     return persist_dir
 
 
-def load_vectorstore_and_qa(persist_dir="data/processed/vectorstore"):
-    # Loads FAISS vectorstore and returns a tiny QA wrapper with Gemini
+def remove_document_from_vectorstore(doc_id, persist_dir="data/processed/vectorstore"):
+    with store_lock(persist_dir):
+        store = open_store(persist_dir, get_embeddings())
+        removed = store.remove_document(doc_id)
+        if removed:
+            store.save()
+    _index_registry.invalidate(persist_dir)
+    return removed
+
+
+def format_chunk(doc):
+    # Page numbers live in chunk metadata; show them to the model for citations
+    page = doc.metadata.get("page")
+    return f"[Page {page}]\n{doc.page_content}" if page is not None else doc.page_content
+
+
+# Custom QA wrapper: retrieval + one call to the generation backend
+class DirectGeminiQA:
+    def __init__(self, llm, retriever):
+        self.llm = llm
+        self.retriever = retriever
+
+    def build_prompt(self, query, docs):
+        context = "\n\n".join([format_chunk(doc) for doc in docs])
+
+        return f"""
+        Based on the following context, please answer the question. If the answer is not in the context, say so.
+
+        Context:
+        {context}
+
+        Question: {query}
+
+        Answer:
+        """
+
+    def answer_from_docs(self, query, docs):
+        # Generation only; callers that already retrieved pass their docs in
+        return self.llm.generate(self.build_prompt(query, docs))
+
+    def run(self, query):
+        docs = self.retriever.invoke(query)
+        return self.answer_from_docs(query, docs)
+
+    def run_with_sources(self, query):
+        # One retrieval feeds both the prompt and the returned sources
+        docs = self.retriever.invoke(query)
+        answer = self.answer_from_docs(query, docs)
+        return answer, docs_to_sources(docs)
+
+    def stream(self, query):
+        """
+        Retrieve, then stream the answer. Returns (sources, chunks): the sources
+        are ready before the first token; chunks yields text as it is generated.
+        """
+        docs = self.retriever.invoke(query)
+        return docs_to_sources(docs), self.stream_from_docs(query, docs)
+
+    def stream_from_docs(self, query, docs):
+        return self.llm.stream(self.build_prompt(query, docs))
+
+
+def docs_to_sources(docs):
+    return [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+
+# Small helper that returns answer + raw sources when needed
+class QAWrapper:
+    def __init__(self, chain, retriever, vectorstore=None, cache=None, index_version=None, lexical=None):
+        self.chain = chain
+        self.retriever = retriever
+        self.vectorstore = vectorstore
+        self.lexical = lexical
+        # Optional AnswerCache in front of retrieval + generation
+        self.cache = cache
+        self.index_version = index_version
+
+    def run(self, query):
+        if self.cache is None:
+            return self.chain.run(query)
+        return self.run_with_sources(query)[0]
+
+    def _lookup(self, query):
+        # The query embedding serves both the semantic cache tier and retrieval
+        vector = embed_query_for(self.retriever, query) if self.cache.semantic else None
+        return self.cache.get(self.index_version, query, vector), vector
+
+    def _retrieve(self, query, vector):
+        if vector is None:
+            return self.retriever.invoke(query)
+        return retrieve_by_vector(self.retriever, vector, query)
+
+    def run_with_sources(self, query):
+        if self.cache is None:
+            return self.chain.run_with_sources(query)
+        hit, vector = self._lookup(query)
+        if hit is not None:
+            return hit["answer"], hit["sources"]
+        docs = self._retrieve(query, vector)
+        answer = self.chain.answer_from_docs(query, docs)
+        sources = docs_to_sources(docs)
+        self.cache.put(self.index_version, query, answer, sources, vector)
+        return answer, sources
+
+    def stream(self, query):
+        if self.cache is None:
+            return self.chain.stream(query)
+        hit, vector = self._lookup(query)
+        if hit is not None:
+            return hit["sources"], iter([hit["answer"]])
+        docs = self._retrieve(query, vector)
+        sources = docs_to_sources(docs)
+        return sources, self._cache_when_done(query, vector, sources, self.chain.stream_from_docs(query, docs))
+
+    def _cache_when_done(self, query, vector, sources, chunks):
+        # Only a fully streamed answer is cached
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.cache.put(self.index_version, query, "".join(parts), sources, vector)
+
+
+def embed_query_for(retriever, query):
+    embeddings = getattr(retriever, "embeddings", None) or retriever.vectorstore.embeddings
+    return embeddings.embed_query(query)
+
+
+def embed_queries_for(retriever, queries):
+    embeddings = getattr(retriever, "embeddings", None) or retriever.vectorstore.embeddings
+    if hasattr(embeddings, "embed_queries_array"):
+        return embeddings.embed_queries_array(queries)
+    return np.asarray([embeddings.embed_query(q) for q in queries], dtype=np.float32)
+
+
+def search_batch(vs, vectors, k):
+    """One faiss search for a matrix of query vectors; [[(doc, distance)]] per row"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if getattr(vs, "_normalize_L2", False):
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    distances, ids = vs.index.search(vectors, k)
+    results = []
+    for row_distances, row_ids in zip(distances, ids):
+        hits = []
+        for distance, i in zip(row_distances, row_ids):
+            if i == -1:
+                continue
+            hits.append((vs.docstore.search(vs.index_to_docstore_id[int(i)]), float(distance)))
+        results.append(hits)
+    return results
+
+
+def retrieve_batch_by_vectors(retriever, vectors, queries):
+    if hasattr(retriever, "invoke_batch_by_vectors"):
+        return retriever.invoke_batch_by_vectors(vectors, queries)
+    k = retriever.search_kwargs.get("k", 4)
+    return [[doc for doc, _ in hits] for hits in search_batch(retriever.vectorstore, vectors, k)]
+
+
+def retrieve_by_vector(retriever, vector, query):
+    # Our retrievers search by vector themselves (the hybrid one also needs the
+    # query text); LangChain retrievers go via their store
+    if hasattr(retriever, "invoke_by_vector"):
+        return retriever.invoke_by_vector(vector, query)
+    return retriever.vectorstore.similarity_search_by_vector(vector, **retriever.search_kwargs)
+
+
+# Files of a saved store (index.pkl only in the old layout, index.sparse.npz
+# instead of index.faiss for TF-IDF stores); their stat() is the index version stamp
+INDEX_FILES = ("index.faiss", SPARSE_INDEX_FILE, CHUNK_TEXT_FILE, CHUNK_INDEX_FILE, CHUNK_META_FILE, "index.pkl")
+
+
+def index_files(persist_dir):
+    if not has_index(persist_dir):
+        raise FileNotFoundError(f"No index in {persist_dir}")
+    return [name for name in INDEX_FILES if os.path.exists(os.path.join(persist_dir, name))]
+
+
+def index_version(persist_dir):
+    """Return a version stamp for the index in persist_dir (mtime + size of each file)"""
+    stamp = []
+    for name in index_files(persist_dir):
+        st = os.stat(os.path.join(persist_dir, name))
+        stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+class IndexRegistry:
+    """
+    Process-wide, thread-safe cache of loaded FAISS indexes and their QA wrappers.
+    An entry is reused until the index files on disk change; the least recently
+    used entries are evicted once max_entries or max_bytes is exceeded. The byte
+    budget is approximate: it counts the index files' size on disk, and a
+    memory-mapped index is only partly resident.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # persist_dir -> (version, nbytes, qa)
+        self._load_locks = {}  # persist_dir -> [lock, threads loading], only while a load runs
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, version):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            return entry[2]
+        return None
+
+    def get(self, persist_dir, loader):
+        key = os.path.abspath(persist_dir)
+        version = index_version(key)
+        with self._lock:
+            qa = self._lookup(key, version)
+            if qa is not None:
+                return qa
+            load_lock = self._load_locks.setdefault(key, [threading.Lock(), 0])
+            load_lock[1] += 1
+
+        # One loader per index; requests for other indexes are not blocked
+        try:
+            with load_lock[0]:
+                with self._lock:
+                    qa = self._lookup(key, version)
+                    if qa is not None:
+                        return qa
+                qa = loader(key)
+                nbytes = sum(os.path.getsize(os.path.join(key, name)) for name in index_files(key))
+                with self._lock:
+                    self._entries[key] = (version, nbytes, qa)
+                    self._entries.move_to_end(key)
+                    self._evict()
+        finally:
+            # The last thread out drops the lock, so evicted indexes leave none behind
+            with self._lock:
+                load_lock[1] -= 1
+                if not load_lock[1]:
+                    del self._load_locks[key]
+        return qa
+
+    def invalidate(self, persist_dir=None):
+        with self._lock:
+            if persist_dir is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(persist_dir), None)
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry[1] for entry in self._entries.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        total = sum(entry[1] for entry in self._entries.values())
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or total > self.max_bytes
+        ):
+            _, (_, nbytes, _) = self._entries.popitem(last=False)
+            total -= nbytes
+
+
+_index_registry = IndexRegistry(
+    max_entries=int(os.getenv("INDEX_CACHE_MAX_ENTRIES", "8")),
+    max_bytes=int(os.getenv("INDEX_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+)
+
+
+def _load_qa(persist_dir):
     # Use local embeddings to avoid cloud credentials
     embeddings = get_embeddings()
-    vs = FAISS.load_local(persist_dir, embeddings, allow_dangerous_deserialization=True)
-    retriever = vs.as_retriever(search_kwargs={"k": 4})
+    vs = open_vectorstore(persist_dir, embeddings, mmap_vectors=os.getenv("INDEX_MMAP", "true").lower() == "true")
+    lexical = None
+    if hybrid_enabled():
+        lexical = load_lexical_index(persist_dir, vs)
+        retriever = HybridRetriever([vs], [lexical], embeddings)
+    else:
+        retriever = vs.as_retriever(search_kwargs={"k": 4})
+    llm = get_llm_backend()
+    qa_chain = DirectGeminiQA(llm, retriever)
+    # Cached answers are only reused for the same index and the same model
+    version = f"{persist_dir}@{index_version(persist_dir)}@{llm.model_id}"
+    return QAWrapper(qa_chain, retriever, vectorstore=vs, cache=get_answer_cache(),
+                     index_version=version, lexical=lexical)
 
-    # Chat model (Gemini) - using direct SDK
-    model = genai.GenerativeModel("models/gemini-1.5-flash")
-    
-    # Custom QA wrapper for direct Gemini integration
-    class DirectGeminiQA:
-        def __init__(self, model, retriever):
-            self.model = model
-            self.retriever = retriever
-        
-        def run(self, query):
-            docs = self.retriever.invoke(query)
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            prompt = f"""
-            Based on the following context, please answer the question. If the answer is not in the context, say so.
-            
-            Context:
-            {context}
-            
-            Question: {query}
-            
-            Answer:
-            """
-            
-            response = self.model.generate_content(prompt)
-            return response.text
-        
-        def run_with_sources(self, query):
-            docs = self.retriever.invoke(query)
-            context = "\n\n".join([doc.page_content for doc in docs])
-            
-            prompt = f"""
-            Based on the following context, please answer the question. If the answer is not in the context, say so.
-            
-            Context:
-            {context}
-            
-            Question: {query}
-            
-            Answer:
-            """
-            
-            response = self.model.generate_content(prompt)
-            sources = [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
-            return response.text, sources
-    
-    qa_chain = DirectGeminiQA(model, retriever)
 
-    # Small helper that returns answer + raw sources when needed
-    class QAWrapper:
-        def __init__(self, chain, retriever):
-            self.chain = chain
-            self.retriever = retriever
+def hybrid_enabled():
+    # RETRIEVAL_MODE=dense turns the BM25 side off
+    return os.getenv("RETRIEVAL_MODE", "hybrid").lower() == "hybrid"
 
-        def run(self, query):
-            return self.chain.run(query)
 
-        def run_with_sources(self, query):
-            docs = self.retriever.invoke(query)
-            answer = self.chain.run(query)
-            sources = [getattr(d, 'metadata', {}) for d in docs]
-            return answer, sources
+class MultiIndexRetriever:
+    """
+    Retriever over several document namespaces: the query is embedded once,
+    each index is searched with that vector, and the merged top-k by distance
+    is returned.
+    """
+
+    def __init__(self, vectorstores, embeddings, k=4):
+        self.vectorstores = vectorstores
+        self.embeddings = embeddings
+        self.k = k
+
+    def invoke(self, query):
+        return self.invoke_by_vector(self.embeddings.embed_query(query), query)
+
+    def invoke_by_vector(self, vector, query=None):
+        hits = []
+        for vs in self.vectorstores:
+            hits.extend(vs.similarity_search_with_score_by_vector(vector, k=self.k))
+        hits.sort(key=lambda hit: hit[1])
+        return [doc for doc, _ in hits[:self.k]]
+
+    def invoke_batch_by_vectors(self, vectors, queries=None):
+        # One batched search per index, merged per query
+        merged = [[] for _ in range(len(vectors))]
+        for vs in self.vectorstores:
+            for row, hits in zip(merged, search_batch(vs, vectors, self.k)):
+                row.extend(hits)
+        return [[doc for doc, _ in sorted(row, key=lambda hit: hit[1])[:self.k]] for row in merged]
+
+
+def _doc_key(doc):
+    return doc.metadata.get("doc_id"), doc.metadata.get("chunk"), doc.page_content
+
+
+class HybridRetriever:
+    """
+    Dense + BM25 retrieval over one or more document indexes. Each side
+    ranks `candidates` chunks (HYBRID_CANDIDATES, default 20) and the two
+    rankings are fused with reciprocal rank fusion down to k, so exact-term
+    matches reach the top-k without raising k, and chunks ranked lower by
+    both sides can win on agreement. Dense hits are merged across indexes by
+    distance; BM25 scores depend on each index's own IDF, so the lexical
+    rankings of several indexes are merged by rank (RRF) instead of by score.
+    """
+
+    def __init__(self, vectorstores, lexical_indexes, embeddings, k=4, candidates=None, rrf_k=60):
+        self.vectorstores = vectorstores
+        self.lexical_indexes = lexical_indexes
+        self.embeddings = embeddings
+        self.k = k
+        self.rrf_k = rrf_k
+        candidates = candidates or int(os.getenv("HYBRID_CANDIDATES", "20"))
+        self.dense = MultiIndexRetriever(vectorstores, embeddings, k=max(candidates, k))
+
+    def invoke(self, query):
+        return self.invoke_by_vector(self.embeddings.embed_query(query), query)
+
+    def invoke_by_vector(self, vector, query):
+        return self.invoke_batch_by_vectors(np.asarray([vector], dtype=np.float32), [query])[0]
+
+    def lexical_batch(self, queries):
+        """BM25 candidates per query across all indexes, best first"""
+        depth = self.dense.k
+        per_index = [
+            [[vs.docstore.search(i) for i, _ in hits] for hits in lexical.search_batch(queries, depth)]
+            for vs, lexical in zip(self.vectorstores, self.lexical_indexes)
+        ]
+        if len(per_index) == 1:
+            return per_index[0]
+        results = []
+        for rankings in zip(*per_index):
+            docs = {_doc_key(doc): doc for ranking in rankings for doc in ranking}
+            keys = reciprocal_rank_fusion([[_doc_key(d) for d in ranking] for ranking in rankings], depth, self.rrf_k)
+            results.append([docs[key] for key in keys])
+        return results
+
+    def invoke_batch_by_vectors(self, vectors, queries):
+        results = []
+        dense = self.dense.invoke_batch_by_vectors(vectors)
+        for dense_docs, lexical_docs in zip(dense, self.lexical_batch(queries)):
+            docs = {}
+            for doc in dense_docs + lexical_docs:
+                docs.setdefault(_doc_key(doc), doc)
+            rankings = [[_doc_key(d) for d in dense_docs], [_doc_key(d) for d in lexical_docs]]
+            results.append([docs[key] for key in reciprocal_rank_fusion(rankings, self.k, self.rrf_k)])
+        return results
+
+
+class RateLimiter:
+    """Spaces request starts at least 60 / requests_per_minute seconds apart"""
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _generate_with_retry(llm, prompt, semaphore, limiter, max_retries, backoff):
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            await limiter.wait()
+            try:
+                return await llm.agenerate(prompt)
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                # Exponential backoff with jitter, e.g. for provider 429s
+                await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+async def aanswer_batch(questions, qa, concurrency=4, requests_per_minute=None, max_retries=3, backoff=1.0):
+    """
+    Async generator over {"question", "answer", "sources"} dicts in input order
+    (with "error" instead of "answer" if generation kept failing).
+    All questions are embedded in one call and searched in one batched faiss
+    query; generation runs concurrently, at most `concurrency` calls at a time.
+    """
+    questions = list(questions)
+    if not questions:
+        return
+    vectors = embed_queries_for(qa.retriever, questions)
+
+    cached = [None] * len(questions)
+    if qa.cache is not None:
+        cached = [qa.cache.get(qa.index_version, q, v if qa.cache.semantic else None)
+                  for q, v in zip(questions, vectors)]
+    misses = [i for i, hit in enumerate(cached) if hit is None]
+    docs = dict(zip(misses, retrieve_batch_by_vectors(qa.retriever, vectors[misses], [questions[i] for i in misses]))) if misses else {}
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(requests_per_minute)
+    tasks = {
+        i: asyncio.create_task(_generate_with_retry(
+            qa.chain.llm, qa.chain.build_prompt(questions[i], docs[i]), semaphore, limiter, max_retries, backoff
+        ))
+        for i in misses
+    }
+
+    try:
+        for i, question in enumerate(questions):
+            if cached[i] is not None:
+                yield {"question": question, "answer": cached[i]["answer"], "sources": cached[i]["sources"]}
+                continue
+            sources = docs_to_sources(docs[i])
+            try:
+                answer = await tasks[i]
+            except Exception as e:
+                yield {"question": question, "error": str(e), "sources": sources}
+                continue
+            if qa.cache is not None:
+                qa.cache.put(qa.index_version, question, answer, sources, vectors[i])
+            yield {"question": question, "answer": answer, "sources": sources}
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+def answer_batch(questions, concurrency=4, persist_dir="data/processed/vectorstore", doc_ids=None,
+                 qa=None, requests_per_minute=None, max_retries=3, backoff=1.0):
+    """
+    Answer many questions against one index (or the given documents).
+    Blocking generator over the results of aanswer_batch(), in input order;
+    each result is yielded as soon as it and all earlier ones are done.
+    """
+    qa = qa or load_vectorstore_and_qa(persist_dir, doc_ids=doc_ids)
+    results = aanswer_batch(questions, qa, concurrency=concurrency, requests_per_minute=requests_per_minute,
+                            max_retries=max_retries, backoff=backoff)
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+
+
+def load_vectorstore_and_qa(persist_dir="data/processed/vectorstore", doc_ids=None):
+    # Returns a tiny QA wrapper with Gemini over the FAISS vectorstore.
+    # Loaded indexes are shared across requests until the files on disk change.
+    # With doc_ids, queries fan out over those documents' namespaces instead.
+    if doc_ids is None:
+        return _index_registry.get(persist_dir, _load_qa)
+    if not doc_ids:
+        raise ValueError("No documents selected")
+    if len(doc_ids) == 1:
+        return _index_registry.get(namespace_dir(doc_ids[0]), _load_qa)
+
+    members = [_index_registry.get(namespace_dir(d), _load_qa) for d in doc_ids]
+    vectorstores = [qa.vectorstore for qa in members]
+    if hybrid_enabled():
+        retriever = HybridRetriever(vectorstores, [qa.lexical for qa in members], get_embeddings())
+    else:
+        retriever = MultiIndexRetriever(vectorstores, get_embeddings())
+    version = "|".join(sorted(qa.index_version for qa in members))
+    return QAWrapper(DirectGeminiQA(get_llm_backend(), retriever), retriever,
+                     cache=get_answer_cache(), index_version=version)
+
+
+def build_document_index(doc_id, content, name, session_id=None, on_index=None):
+    # One index namespace per document, recorded in the shared catalog.
+    # on_index() is called once every chunk is embedded, before the index is written.
+    # The document is selectable as soon as its index is saved; summaries are
+    # a separate follow-up (precompute_summaries).
+    persist_dir = namespace_dir(doc_id)
+    _add_documents([content], persist_dir, [doc_id], on_index=on_index)
+    register_document(doc_id, name, persist_dir, session_id=session_id)
+    return persist_dir
+
+
+def precompute_summaries(chunks, persist_dir):
+    # Map-reduce summaries stored next to the index; skipped when the chunks
+    # are unchanged and every part was generated. A partial run is saved and
+    # the next one only redoes the sections that failed. Failures only cost
+    # the fast path, not the ingest.
+    if not chunks:
+        return None
+    fingerprint = chunks_fingerprint(chunks)
+    existing = load_summaries(persist_dir)
+    sections = None
+    if existing and existing.get("fingerprint") == fingerprint:
+        if summaries_complete(existing):
+            return existing
+        sections = existing["levels"][0]
+    try:
+        data = summarize_document(
+            chunks, get_llm_backend(), workers=int(os.getenv("SUMMARY_WORKERS", "4")), sections=sections
+        )
+    except Exception as e:
+        print(f"⚠️ Could not precompute summaries: {e}")
+        return None
+    data["fingerprint"] = fingerprint
+    save_summaries(persist_dir, data)
+    return data
+
+
+def document_chunks(doc_id):
+    """The document's chunk texts in document order; [] if its index predates the compact chunk store"""
+    persist_dir = namespace_dir(doc_id)
+    if not os.path.exists(os.path.join(persist_dir, CHUNK_META_FILE)):
+        return []
+    return ChunkStore(persist_dir).document_texts(doc_id)
+
 
-    return QAWrapper(qa_chain, retriever)
+def document_mindmap(doc_id, mode="overview", on_progress=None):
+    """
+    Map-reduce mindmap over every chunk of the document, built on first use
+    and cached next to its index per mode. None if the chunks are not available.
+    on_progress(tree) receives partial trees while it is being built.
+    """
+    chunks = document_chunks(doc_id)
+    if not chunks:
+        return None
+    return cached_mindmap(
+        namespace_dir(doc_id), chunks, mode, get_llm_backend(), on_progress=on_progress,
+        workers=int(os.getenv("MINDMAP_WORKERS", "4")),
+        max_depth=int(os.getenv("MINDMAP_MAX_DEPTH", "4")),
+        max_children=int(os.getenv("MINDMAP_MAX_CHILDREN", "8")),
+    )
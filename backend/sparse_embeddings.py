@@ -0,0 +1,135 @@
+# backend/sparse_embeddings.py
+import numpy as np
+from scipy import sparse
+from langchain_core.embeddings import Embeddings
+from backend.lexical_index import tokenize
+
+# Saved in place of index.faiss by stores built with sparse embeddings
+SPARSE_INDEX_FILE = "index.sparse.npz"
+
+TFIDF_EMBEDDER = "tfidf-hashing"
+
+
+class TfidfEmbeddings(Embeddings):
+    """
+    Sparse TF-IDF embeddings over a hashed vocabulary of n_features terms.
+    Hashing makes the vector space independent of the corpus, so every store
+    and every query share it and nothing has to be fitted first; the IDF
+    weights come from the chunks in each SparseIndex and are saved with it.
+    Document vectors are sublinear term counts in a CSR matrix.
+    """
+
+    is_sparse = True
+
+    def __init__(self, n_features=2 ** 14):
+        # Imported here: vectorstore_handler loads this module for SparseIndex
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.n_features = n_features
+        self._vectorizer = HashingVectorizer(
+            analyzer=tokenize, n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32
+        )
+
+    @property
+    def embedder_info(self):
+        return {"name": TFIDF_EMBEDDER, "dim": self.n_features}
+
+    def embed_documents_array(self, texts):
+        """(n, n_features) CSR matrix of 1 + log(term count)"""
+        tf = self._vectorizer.transform(texts).tocsr()
+        tf.data = 1 + np.log(tf.data)
+        return tf
+
+    def embed_queries_array(self, texts):
+        # Dense rows, like every other embedder's queries; SparseIndex re-sparsifies them
+        return self.embed_documents_array(texts).toarray()
+
+    def embed_documents(self, texts):
+        return self.embed_queries_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_queries_array([text])[0].tolist()
+
+
+class SparseIndex:
+    """
+    Exact cosine search over sparse TF-IDF vectors, with the subset of the
+    faiss index interface the stores use (d, ntotal, add_with_ids,
+    remove_ids, search). Rows hold term counts keyed by int64 chunk ids; IDF
+    is recomputed from them whenever the rows change. Distances are squared
+    L2 between unit vectors (2 - 2 cos), so they rank and merge like
+    IndexFlatL2 results.
+    """
+
+    def __init__(self, d, ids=None, tf=None):
+        self.d = d
+        self.ids = np.zeros(0, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.tf = sparse.csr_matrix((0, d), dtype=np.float32) if tf is None else tf.tocsr()
+        self._prepared = None
+
+    @property
+    def ntotal(self):
+        return len(self.ids)
+
+    def add_with_ids(self, vectors, ids):
+        vectors = sparse.csr_matrix(vectors, dtype=np.float32)
+        self.tf = sparse.vstack([self.tf, vectors], format="csr")
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self._prepared = None
+
+    def remove_ids(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        removed = int((~keep).sum())
+        self.tf, self.ids = self.tf[keep], self.ids[keep]
+        self._prepared = None
+        return removed
+
+    def idf(self):
+        df = np.bincount(self.tf.indices, minlength=self.d)
+        return (np.log((1 + self.ntotal) / (1 + df)) + 1).astype(np.float32)
+
+    def _prepare(self):
+        # (unit-length TF-IDF rows, idf), rebuilt after adds and removes
+        if self._prepared is None:
+            idf = self.idf()
+            self._prepared = _normalize_rows(self.tf @ sparse.diags(idf)), idf
+        return self._prepared
+
+    def search(self, x, k, subset=None):
+        """(distances, ids) of the k nearest rows per query, -1 padded; subset limits the candidate ids"""
+        weights, idf = self._prepare()
+        ids = self.ids
+        if subset is not None:
+            rows = np.flatnonzero(np.isin(ids, np.asarray(subset, dtype=np.int64)))
+            weights, ids = weights[rows], ids[rows]
+        queries = _normalize_rows(sparse.csr_matrix(x, dtype=np.float32) @ sparse.diags(idf))
+        scores = (queries @ weights.T).toarray()
+        k_found = min(k, len(ids))
+        distances = np.full((scores.shape[0], k), np.inf, dtype=np.float32)
+        labels = np.full((scores.shape[0], k), -1, dtype=np.int64)
+        for row, row_scores in enumerate(scores):
+            if not k_found:
+                continue
+            top = np.argpartition(-row_scores, k_found - 1)[:k_found]
+            top = top[np.argsort(-row_scores[top], kind="stable")]
+            distances[row, :k_found] = 2 - 2 * row_scores[top]
+            labels[row, :k_found] = ids[top]
+        return distances, labels
+
+    def save(self, f):
+        np.savez(f, d=np.array(self.d), ids=self.ids, data=self.tf.data, indices=self.tf.indices,
+                 indptr=self.tf.indptr)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            d = int(data["d"])
+            tf = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=(len(data["ids"]), d))
+            return cls(d, data["ids"], tf)
+
+
+def _normalize_rows(matrix):
+    matrix = matrix.tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).astype(np.float32) @ matrix
@@ -0,0 +1,164 @@
+# backend/summarizer.py
+import os
+import json
+import time
+import random
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from backend.index_catalog import namespace_dir
+
+# Hierarchical summaries are written next to the document's index
+SUMMARY_FILE = "summaries.json"
+
+MAP_PROMPT = """
+Summarize the following part of a document. Keep names, numbers, definitions and conclusions.
+
+{text}
+
+Summary:
+"""
+
+REDUCE_PROMPT = """
+Combine the following consecutive section summaries into one shorter summary that keeps every main point.
+
+{text}
+
+Combined summary:
+"""
+
+# Final artifacts produced from the top level, one per Summary / Insights view
+SUMMARY_PROMPTS = {
+    "Executive Summary": "Create a concise executive summary of the following document:\n\n{text}",
+    "Key Points": "Extract the key points from the following document:\n\n{text}",
+    "Detailed Summary": "Create a detailed summary of the following document:\n\n{text}",
+    "Bullet Points": "Summarize the following document in bullet points:\n\n{text}",
+    "Key Insights": """
+Analyze the following document and extract key insights, important findings, and notable information:
+
+{text}
+
+Please provide:
+1. Main themes and topics
+2. Key findings or conclusions
+3. Important statistics or data points
+4. Notable quotes or statements
+5. Action items or recommendations (if any)
+""",
+}
+
+
+def group_texts(texts, max_chars):
+    """Pack consecutive texts into groups of at most max_chars (a longer text stays alone)"""
+    groups, current, size = [], [], 0
+    for text in texts:
+        if current and size + len(text) > max_chars:
+            groups.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+def generate_with_retry(llm, prompt, retries=3, backoff=1.0):
+    """llm.generate(prompt), retried with exponential backoff and jitter (e.g. on provider 429s)"""
+    for attempt in range(retries + 1):
+        try:
+            return llm.generate(prompt)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+def summarize_document(chunks, llm, max_chars=8000, workers=4, retries=3, backoff=1.0, sections=None):
+    """
+    Map-reduce summarization of a document's chunks (in document order).
+    Map: groups of consecutive chunks are summarized in parallel.
+    Reduce: summaries are combined level by level until they fit in one
+    prompt, then every SUMMARY_PROMPTS view is generated from the top level.
+    Returns {"levels": [[section summaries], ...], "summaries": {view: text}}.
+
+    Every call is retried with backoff; a call that still fails only costs its
+    own part: a section summary is left None, a reduce group keeps its input
+    and a view is left out. sections (levels[0] of an earlier run over the same
+    chunks) supplies the section summaries that already succeeded.
+    """
+    generate = lambda prompt: generate_with_retry(llm, prompt, retries, backoff)
+
+    def map_group(i, group):
+        if sections and i < len(sections) and sections[i]:
+            return sections[i]
+        try:
+            return generate(MAP_PROMPT.format(text=group))
+        except Exception as e:
+            print(f"⚠️ Could not summarize section {i + 1}: {e}")
+            return None
+
+    def reduce_group(group):
+        try:
+            return generate(REDUCE_PROMPT.format(text=group))
+        except Exception as e:
+            print(f"⚠️ Could not combine section summaries: {e}")
+            return group
+
+    def view_text(view):
+        try:
+            return generate(SUMMARY_PROMPTS[view].format(text=combined))
+        except Exception as e:
+            print(f"⚠️ Could not generate {view}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        groups = group_texts(chunks, max_chars)
+        levels = [list(pool.map(map_group, range(len(groups)), groups))]
+        level = [summary for summary in levels[0] if summary]
+        if not level:
+            raise ValueError("No section of the document could be summarized")
+        while len(level) > 1 and sum(len(s) for s in level) > max_chars:
+            groups = group_texts(level, max_chars)
+            if len(groups) == len(level):
+                # Each summary alone is over budget; merge pairwise to guarantee progress
+                groups = ["\n\n".join(level[i:i + 2]) for i in range(0, len(level), 2)]
+            level = list(pool.map(reduce_group, groups))
+            levels.append(level)
+
+        combined = "\n\n".join(level)
+        views = list(SUMMARY_PROMPTS)
+        summaries = {view: text for view, text in zip(views, pool.map(view_text, views)) if text is not None}
+    return {"levels": levels, "summaries": summaries}
+
+
+def summaries_complete(data):
+    """True if every section summary and every view was generated"""
+    return all(data["levels"][0]) and set(data["summaries"]) == set(SUMMARY_PROMPTS)
+
+
+def chunks_fingerprint(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(hashlib.sha256(chunk.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def save_summaries(persist_dir, data):
+    os.makedirs(persist_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=persist_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, os.path.join(persist_dir, SUMMARY_FILE))
+
+
+def load_summaries(persist_dir):
+    try:
+        with open(os.path.join(persist_dir, SUMMARY_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def document_summaries(doc_ids):
+    """Precomputed summaries for each document, or None for documents without them"""
+    return {doc_id: load_summaries(namespace_dir(doc_id)) for doc_id in doc_ids}
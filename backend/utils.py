@@ -1,5 +1,15 @@
 # backend/utils.py
+import os
 import re
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so file_lock only serializes threads
+    fcntl = None
+
+_local_lock = threading.Lock()
 
 
 def clean_text(s: str) -> str:
@@ -12,5 +22,28 @@ def format_sources_for_display(sources):
     out = []
     for i, meta in enumerate(sources):
         snippet = meta.get('text', '') if isinstance(meta, dict) else str(meta)
-        out.append(f"Source {i+1}: {snippet[:200]}")
+        out.append(f"{source_label(meta, i)}: {snippet[:200]}")
     return "\n".join(out)
+
+
+def source_label(source, i):
+    # "Source 2 (page 14)" when the chunk came from a known page
+    page = source.get('metadata', {}).get('page') if isinstance(source, dict) else None
+    return f"Source {i+1} (page {page})" if page is not None else f"Source {i+1}"
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock for read-modify-write of a shared file, held across threads
+    and processes (the app and the ingest workers): flock on <path>.lock.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fcntl is None:
+        with _local_lock:
+            yield
+        return
+    # Each holder opens its own file description, so threads exclude each other too
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
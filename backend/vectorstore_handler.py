@@ -1,6 +1,20 @@
 # backend/vectorstore_handler.py
 import os
-from langchain.vectorstores import FAISS
+import re
+import json
+import mmap
+import hashlib
+import tempfile
+import threading
+from collections.abc import Mapping
+import numpy as np
+import faiss
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from backend.lexical_index import LEXICAL_FILE, BM25Index
+from backend.sparse_embeddings import SPARSE_INDEX_FILE, SparseIndex
 
 
 def save_faiss_local(vectorstore, persist_dir):
@@ -9,4 +23,751 @@ def save_faiss_local(vectorstore, persist_dir):
 
 
 def load_faiss_local(persist_dir, embeddings):
-    return FAISS.load_local(persist_dir, embeddings)
+    # Legacy layout (index.pkl); stores saved by IncrementalVectorStore use open_vectorstore()
+    return FAISS.load_local(persist_dir, embeddings, allow_dangerous_deserialization=True)
+
+
+# Compact chunk store: chunk texts in one UTF-8 blob, an (n, 3) int64 table of
+# [chunk id, byte offset, byte length] sorted by chunk id, and metadata columns
+# aligned with that table (plus the document table and the index config)
+CHUNK_TEXT_FILE = "chunks.txt"
+CHUNK_INDEX_FILE = "chunks.idx.npy"
+CHUNK_META_FILE = "chunks.meta.npz"
+
+# Column sentinels: no page key (legacy chunks) / page None / no start offset
+_NO_PAGE, _PAGE_NONE, _NO_START = -2, -1, -1
+
+
+def chunk_document(text, doc_id, position, entry, doc_metadata=None):
+    """The Document for one manifest chunk entry, as add_document() built it"""
+    meta = dict(doc_metadata or {}, doc_id=doc_id, chunk=position)
+    if "page" in entry:
+        meta["page"] = entry["page"]
+    if "start" in entry:
+        meta["start"] = entry["start"]
+        meta["end"] = entry["start"] + len(text)
+    return Document(page_content=text, metadata=meta)
+
+
+class ChunkStore:
+    """
+    Read-only view of a saved chunk store. Opening it loads the small metadata
+    columns and maps the text blob and offset table without reading them; a
+    chunk is decoded into a Document only when it is fetched by id. Mapped
+    pages are shared through the OS cache by every process that opens the store.
+    mmap_text=False reads the blob into memory instead, for writers that are
+    about to replace the files.
+    """
+
+    def __init__(self, persist_dir, mmap_text=True):
+        self.offsets = np.load(os.path.join(persist_dir, CHUNK_INDEX_FILE), mmap_mode="r")
+        with open(os.path.join(persist_dir, CHUNK_TEXT_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if mmap_text and size:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._blob = f.read()
+        with np.load(os.path.join(persist_dir, CHUNK_META_FILE), allow_pickle=False) as meta:
+            self.doc = meta["doc"]
+            self.position = meta["position"]
+            self.page = meta["page"]
+            self.start = meta["start"]
+            self.doc_ids = meta["doc_ids"].tolist()
+            self.doc_metadata = [json.loads(m) if m else None for m in meta["doc_metadata"].tolist()]
+            self.index_config = json.loads(str(meta["index"]))
+            self.embedder = json.loads(str(meta["embedder"])) if "embedder" in meta else None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def ids(self):
+        return self.offsets[:, 0] if len(self.offsets) else np.zeros(0, dtype=np.int64)
+
+    def _row(self, chunk_id):
+        row = int(np.searchsorted(self.ids(), chunk_id))
+        if row == len(self.offsets) or self.offsets[row, 0] != chunk_id:
+            raise KeyError(chunk_id)
+        return row
+
+    def text(self, chunk_id):
+        _, offset, length = self.offsets[self._row(chunk_id)]
+        return bytes(self._blob[offset:offset + length]).decode("utf-8")
+
+    def document_texts(self, doc_id):
+        """The document's chunk texts in document order"""
+        if doc_id not in self.doc_ids:
+            return []
+        rows = np.flatnonzero(self.doc == self.doc_ids.index(doc_id))
+        rows = rows[np.argsort(self.position[rows], kind="stable")]
+        return [bytes(self._blob[offset:offset + length]).decode("utf-8") for _, offset, length in self.offsets[rows]]
+
+    def document(self, chunk_id):
+        row = self._row(chunk_id)
+        _, offset, length = self.offsets[row]
+        text = bytes(self._blob[offset:offset + length]).decode("utf-8")
+        entry = {}
+        if self.page[row] != _NO_PAGE:
+            entry["page"] = None if self.page[row] == _PAGE_NONE else int(self.page[row])
+        if self.start[row] != _NO_START:
+            entry["start"] = int(self.start[row])
+        doc = int(self.doc[row])
+        return chunk_document(text, self.doc_ids[doc], int(self.position[row]), entry, self.doc_metadata[doc])
+
+
+def write_chunk_files(manifest, text_of, write_atomic):
+    """Write the chunks listed in the manifest (texts from text_of(chunk id)) as a compact chunk store"""
+    doc_ids = list(manifest["documents"])
+    rows = []
+    for d, doc_id in enumerate(doc_ids):
+        for position, entry in enumerate(manifest["documents"][doc_id]["chunks"]):
+            page = entry.get("page", _NO_PAGE)
+            rows.append((entry["id"], d, position, _PAGE_NONE if page is None else page, entry.get("start", _NO_START)))
+    rows.sort()
+    offsets = np.zeros((len(rows), 3), dtype=np.int64)
+
+    def write_text(path):
+        offset = 0
+        with open(path, "wb") as f:
+            for row, (chunk_id, *_) in enumerate(rows):
+                data = text_of(chunk_id).encode("utf-8")
+                f.write(data)
+                offsets[row] = (chunk_id, offset, len(data))
+                offset += len(data)
+
+    def write_offsets(path):
+        with open(path, "wb") as f:
+            np.save(f, offsets)
+
+    def write_meta(path):
+        columns = np.array([row[1:] for row in rows], dtype=np.int64).reshape(len(rows), 4)
+        doc_metadata = [json.dumps(manifest["documents"][d].get("metadata")) if manifest["documents"][d].get("metadata")
+                        else "" for d in doc_ids]
+        with open(path, "wb") as f:
+            np.savez(
+                f, doc=columns[:, 0].astype(np.int32), position=columns[:, 1].astype(np.int32),
+                page=columns[:, 2].astype(np.int32), start=columns[:, 3],
+                doc_ids=np.array(doc_ids, dtype=str), doc_metadata=np.array(doc_metadata, dtype=str),
+                index=np.array(json.dumps(manifest.get("index", {"type": "flat"}))),
+                embedder=np.array(json.dumps(manifest.get("embedder"))),
+            )
+
+    write_atomic(CHUNK_TEXT_FILE, write_text)
+    write_atomic(CHUNK_INDEX_FILE, write_offsets)
+    write_atomic(CHUNK_META_FILE, write_meta)
+
+
+class ChunkDocstore(Docstore):
+    """
+    LangChain docstore keyed by str(chunk id): the saved ChunkStore (if any),
+    fetched lazily, overlaid with chunks put or deleted since it was opened.
+    """
+
+    def __init__(self, base=None):
+        self.base = base
+        self.added = {}
+        self.removed = set()
+
+    def search(self, search):
+        try:
+            chunk_id = int(search)
+            if chunk_id in self.added:
+                return self.added[chunk_id]
+            if self.base is None or chunk_id in self.removed:
+                raise KeyError(chunk_id)
+            return self.base.document(chunk_id)
+        except (KeyError, ValueError):
+            return f"ID {search} not found."
+
+    def text(self, chunk_id):
+        if chunk_id in self.added:
+            return self.added[chunk_id].page_content
+        return self.base.text(chunk_id)
+
+    def put(self, chunk_id, doc):
+        self.added[chunk_id] = doc
+
+    def add(self, texts):
+        for docstore_id, doc in texts.items():
+            self.put(int(docstore_id), doc)
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.added.pop(int(chunk_id), None)
+            self.removed.add(int(chunk_id))
+
+    def ids(self):
+        saved = [] if self.base is None else [
+            i for i in self.base.ids().tolist() if i not in self.removed and i not in self.added
+        ]
+        return saved + list(self.added)
+
+    def __len__(self):
+        if not self.added and not self.removed:
+            return len(self.base) if self.base is not None else 0
+        return len(self.ids())
+
+
+class ChunkIdMap(Mapping):
+    """index_to_docstore_id for chunk-id indexes: faiss id -> str(id), without a dict per chunk"""
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, chunk_id):
+        return str(int(chunk_id))
+
+    def __iter__(self):
+        return iter(self.docstore.ids())
+
+    def __len__(self):
+        return len(self.docstore)
+
+
+def has_index(persist_dir):
+    """True if persist_dir holds a saved dense (index.faiss) or sparse index"""
+    return any(os.path.exists(os.path.join(persist_dir, name)) for name in ("index.faiss", SPARSE_INDEX_FILE))
+
+
+def read_index(persist_dir, index_type="flat", mmap_vectors=False):
+    sparse_path = os.path.join(persist_dir, SPARSE_INDEX_FILE)
+    if os.path.exists(sparse_path):
+        return SparseIndex.load(sparse_path)
+    path = os.path.join(persist_dir, "index.faiss")
+    if not mmap_vectors:
+        return faiss.read_index(path)
+    # IVF inverted lists and flat / HNSW vector storage map with different flags
+    flag = faiss.IO_FLAG_MMAP if index_type.startswith("ivf") else faiss.IO_FLAG_MMAP_IFC
+    return faiss.read_index(path, flag)
+
+
+def open_vectorstore(persist_dir, embeddings, mmap_vectors=True):
+    """
+    Open a saved store for querying. Vectors are memory-mapped (read-only)
+    and chunks are fetched lazily from the compact chunk store; no pickle is
+    loaded. Directories in the old index.pkl layout use FAISS.load_local.
+    Raises ValueError if embeddings are not the embedder the index was built with.
+    """
+    if not os.path.exists(os.path.join(persist_dir, CHUNK_META_FILE)):
+        vs = load_faiss_local(persist_dir, embeddings)
+        check_embedder(None, embeddings, vs.index.d, persist_dir)
+        return vs
+    chunks = ChunkStore(persist_dir)
+    index = read_index(persist_dir, chunks.index_config["type"], mmap_vectors)
+    check_embedder(chunks.embedder, embeddings, index.d, persist_dir)
+    apply_search_params(index, chunks.index_config)
+    docstore = ChunkDocstore(chunks)
+    return FAISS(embeddings, index, docstore, ChunkIdMap(docstore))
+
+
+def build_lexical_index(vectorstore):
+    """BM25 index over every chunk of a LangChain FAISS store, keyed by docstore id"""
+    ids = list(vectorstore.index_to_docstore_id.values())
+    return BM25Index.build(ids, [vectorstore.docstore.search(i).page_content for i in ids])
+
+
+def load_lexical_index(persist_dir, vectorstore):
+    # Indexes saved before the lexical index existed get one built in memory
+    path = os.path.join(persist_dir, LEXICAL_FILE)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    return build_lexical_index(vectorstore)
+
+
+# One lock per persist_dir so concurrent builds in this process don't interleave
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+
+def store_lock(persist_dir):
+    with _store_locks_guard:
+        return _store_locks.setdefault(os.path.abspath(persist_dir), threading.Lock())
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+PAGE_MARKER = re.compile(r"\[Page (\d+)\]\n")
+
+
+def split_page_markers(text):
+    """
+    Split text produced by extract_text_from_pdf back into (page_number, text)
+    records; text without markers is a single record with page None.
+    """
+    parts = PAGE_MARKER.split(text)
+    if len(parts) == 1:
+        return [(None, text)]
+    pages = [(None, parts[0])] if parts[0].strip() else []
+    for number, page_text in zip(parts[1::2], parts[2::2]):
+        pages.append((int(number), page_text))
+    return pages
+
+
+def embedder_info(embeddings):
+    """{"name", "dim"} of an embedder, as recorded with the indexes it builds (dim None if unknown)"""
+    info = getattr(embeddings, "embedder_info", None)
+    return dict(info) if info else {"name": type(embeddings).__name__, "dim": None}
+
+
+def check_embedder(recorded, embeddings, index_dim, persist_dir):
+    """
+    Refuse to pair an index with an embedder that did not build it: queries
+    would be compared against vectors from another space. Stores saved before
+    the embedder was recorded are checked by dimension only.
+    """
+    current = embedder_info(embeddings)
+    if recorded and recorded["name"] != current["name"]:
+        raise ValueError(
+            f"The index in {persist_dir} was built with {recorded['name']} embeddings but the current "
+            f"embedder is {current['name']}; rebuild the index or restore that embedder"
+        )
+    if current["dim"] is not None and index_dim != current["dim"]:
+        raise ValueError(
+            f"Index dimension {index_dim} in {persist_dir} does not match the {current['dim']}-d "
+            f"{current['name']} embeddings; rebuild the index"
+        )
+
+
+def embed_as_array(embeddings, texts):
+    # LocalEmbeddings hands back float32 directly (sparse embedders a CSR matrix);
+    # other Embeddings return lists
+    if hasattr(embeddings, "embed_documents_array"):
+        return embeddings.embed_documents_array(texts)
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+
+# faiss index types for the build path; ANN types are trained once the store
+# holds min_train chunks, before that the store stays exact (flat)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+def _auto_nlist(n):
+    # ~4 sqrt(n) lists, with at least 39 training points per centroid
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+def _auto_pq_m(dim):
+    # Sub-quantizers of >= 4 dimensions each; m must divide dim
+    return max(m for m in range(1, dim + 1) if dim % m == 0 and dim // m >= 4) if dim >= 4 else 1
+
+
+def create_ann_index(config, vectors, seed=0):
+    """
+    Build an empty index of config["type"] for vectors of this dimension,
+    training it on a sample of vectors. Resolved parameters (nlist, pq_m,
+    hnsw_m) are written back into config. All types take add_with_ids().
+    """
+    dim = vectors.shape[1]
+    kind = config["type"]
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if kind == "hnsw":
+        config.setdefault("hnsw_m", 32)
+        hnsw = faiss.IndexHNSWFlat(dim, config["hnsw_m"])
+        hnsw.hnsw.efConstruction = config.setdefault("ef_construction", 80)
+        return faiss.IndexIDMap2(hnsw)
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {kind} (expected one of {', '.join(INDEX_TYPES)})")
+
+    n = len(vectors)
+    nlist = config.get("nlist") or _auto_nlist(n)
+    config["nlist"] = nlist
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        config["pq_m"] = config.get("pq_m") or _auto_pq_m(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, config["pq_m"], 8)
+    # Hashtable direct map: our int64 chunk ids, removable and reconstructable
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    sample_size = min(n, max(nlist, 256) * 64)
+    sample = vectors[np.random.default_rng(seed).choice(n, sample_size, replace=False)]
+    index.train(np.ascontiguousarray(sample))
+    return index
+
+
+def apply_search_params(index, config):
+    """Query-time knobs: FAISS_NPROBE / FAISS_EF_SEARCH, else the stored config"""
+    if isinstance(index, SparseIndex):
+        return
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(int(os.getenv("FAISS_NPROBE", config.get("nprobe", 8))), ivf.nlist)
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = int(os.getenv("FAISS_EF_SEARCH", config.get("ef_search", 64)))
+
+
+def index_ids(index):
+    """The chunk ids held by an IndexIDMap2, an IVF index with a direct map or a SparseIndex"""
+    if isinstance(index, SparseIndex):
+        return index.ids
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    invlists = faiss.extract_index_ivf(index).invlists
+    lists = [faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+             for l in range(invlists.nlist) if invlists.list_size(l)]
+    return np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+
+
+def load_index_config(persist_dir):
+    """The index type and parameters stored in a store's manifest ({"type": "flat"} if none)"""
+    try:
+        with open(os.path.join(persist_dir, IncrementalVectorStore.MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("index", {"type": "flat"})
+    except FileNotFoundError:
+        return {"type": "flat"}
+
+
+class IncrementalVectorStore:
+    """
+    Append-only FAISS store with per-document add and remove.
+    Vectors live in an IndexIDMap2 keyed by int64 chunk ids, and manifest.json
+    records each document's chunk ids and hashes, so re-adding a document only
+    embeds the chunks that changed. On disk: index.faiss, chunks.txt +
+    chunks.idx.npy (see open_vectorstore), manifest.json and lexical.npz.
+    Sparse embedders (is_sparse, e.g. the TF-IDF fallback) get a SparseIndex
+    saved as index.sparse.npz instead of index.faiss. The embedder is recorded
+    in the manifest and checked when the store is reopened.
+
+    index_type picks an approximate index for large corpora (see INDEX_TYPES);
+    the store is exact until it holds min_train chunks, then save() trains the
+    ANN index on the vectors so far. The type is kept in the manifest and wins
+    over index_type when an existing store is reopened. HNSW graphs cannot drop
+    nodes, so removals from a trained HNSW index are batched: the graph is
+    rebuilt once, when the store is saved or its vectorstore is next read.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, persist_dir, embeddings, chunk_size=500, chunk_overlap=50,
+                 index_type="flat", index_params=None):
+        self.persist_dir = persist_dir
+        self.embeddings = embeddings
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+        )
+        self._vectorstore = None
+        self._removed = set()  # chunk ids still in a trained HNSW graph, see _compact
+        if getattr(embeddings, "is_sparse", False) and index_type != "flat":
+            print(f"⚠️ {index_type} index needs dense embeddings; using exact search over sparse vectors")
+            index_type = "flat"
+        index_config = dict(index_params or {}, type=index_type, trained=index_type == "flat")
+        self.manifest = {"next_id": 0, "documents": {}, "index": index_config}
+        if has_index(persist_dir):
+            self._load()
+        self.manifest.setdefault("index", index_config)
+        self.manifest["embedder"] = embedder_info(embeddings)
+        if self.manifest["index"]["type"] not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {self.manifest['index']['type']}")
+
+    @property
+    def index_config(self):
+        return self.manifest["index"]
+
+    @property
+    def vectorstore(self):
+        """The LangChain FAISS store over the index, with pending HNSW removals applied"""
+        self._compact()
+        return self._vectorstore
+
+    def _load(self):
+        manifest_path = os.path.join(self.persist_dir, self.MANIFEST_NAME)
+        if os.path.exists(os.path.join(self.persist_dir, CHUNK_META_FILE)):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            config = self.manifest.get("index", {"type": "flat"})
+            # A writable index; saved chunks stay on disk until save() rewrites them
+            index = read_index(self.persist_dir, config["type"])
+            check_embedder(self.manifest.get("embedder"), self.embeddings, index.d, self.persist_dir)
+            apply_search_params(index, config)
+            saved_chunks = ChunkStore(self.persist_dir, mmap_text=False)
+            self._set_vectorstore(index, saved_chunks)
+            self._reconcile(saved_chunks)
+            return
+
+        vs = load_faiss_local(self.persist_dir, self.embeddings)
+        check_embedder(None, self.embeddings, vs.index.d, self.persist_dir)
+        if os.path.exists(manifest_path):
+            # Saved in the index.pkl layout; the next save() converts it
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            self._set_vectorstore(vs.index)
+            for doc in self.manifest["documents"].values():
+                for entry in doc["chunks"]:
+                    chunk = vs.docstore.search(str(entry["id"]))
+                    if chunk.metadata.get("start") is not None:
+                        entry["start"] = chunk.metadata["start"]
+                    self._put_chunk(entry["id"], chunk)
+            apply_search_params(vs.index, self.manifest.get("index", {}))
+        else:
+            self._adopt_legacy(vs)
+
+    def _reconcile(self, saved_chunks):
+        # manifest.json is renamed into place last, so after an interrupted save() the
+        # index and chunk files may hold chunks it does not list, or lack some it does.
+        # Documents with missing chunks are dropped (re-adding them embeds them in
+        # full) and vectors no document owns are removed.
+        in_index = index_ids(self._vectorstore.index)
+        present = set(in_index.tolist()) & set(saved_chunks.ids().tolist())
+        for doc_id, entry in list(self.manifest["documents"].items()):
+            if any(chunk["id"] not in present for chunk in entry["chunks"]):
+                print(f"⚠️ {doc_id} is incomplete in {self.persist_dir} (interrupted save?); dropping it")
+                del self.manifest["documents"][doc_id]
+        listed = {chunk["id"] for entry in self.manifest["documents"].values() for chunk in entry["chunks"]}
+        self._drop_chunks([i for i in in_index.tolist() if i not in listed])
+        if len(in_index):
+            self.manifest["next_id"] = max(self.manifest["next_id"], int(in_index.max()) + 1)
+
+    def _adopt_legacy(self, vs):
+        # Index written by FAISS.from_texts: positional ids, no manifest.
+        # Keep its vectors under a single "legacy" document.
+        n = vs.index.ntotal
+        vectors = vs.index.reconstruct_n(0, n) if n else np.zeros((0, vs.index.d), dtype=np.float32)
+        self._new_vectorstore(vs.index.d)
+        chunks = []
+        for i in range(n):
+            doc = vs.docstore.search(vs.index_to_docstore_id[i])
+            chunks.append({"id": i, "hash": chunk_hash(doc.page_content)})
+            self._put_chunk(i, Document(page_content=doc.page_content, metadata={"doc_id": "legacy", "chunk": i}))
+        if n:
+            self._vectorstore.index.add_with_ids(vectors, np.arange(n, dtype=np.int64))
+            self.manifest["documents"]["legacy"] = {"chunks": chunks}
+        self.manifest["next_id"] = n
+
+    def _set_vectorstore(self, index, saved_chunks=None):
+        docstore = ChunkDocstore(saved_chunks)
+        self._vectorstore = FAISS(self.embeddings, index, docstore, ChunkIdMap(docstore))
+
+    def _new_vectorstore(self, dim):
+        if getattr(self.embeddings, "is_sparse", False):
+            self._set_vectorstore(SparseIndex(dim))
+        else:
+            self._set_vectorstore(faiss.IndexIDMap2(faiss.IndexFlatL2(dim)))
+
+    def _put_chunk(self, chunk_id, doc):
+        self._vectorstore.docstore.put(chunk_id, doc)
+
+    def _index_contents(self):
+        """(ids, vectors) currently in a flat or HNSW IndexIDMap2, in insertion order"""
+        index = self._vectorstore.index
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        return ids, vectors
+
+    def _drop_chunks(self, chunk_ids):
+        if not chunk_ids:
+            return
+        if self.index_config["type"] == "hnsw" and self.index_config["trained"]:
+            # HNSW graphs cannot remove nodes: the graph is rebuilt once for all
+            # pending removals, before the index is next read (see _compact)
+            self._removed.update(chunk_ids)
+        else:
+            self._vectorstore.index.remove_ids(np.array(chunk_ids, dtype=np.int64))
+        self._vectorstore.docstore.delete(chunk_ids)
+
+    def _compact(self):
+        # Rebuild the HNSW graph without the chunks removed since the last rebuild
+        if not self._removed:
+            return
+        ids, vectors = self._index_contents()
+        keep = ~np.isin(ids, np.fromiter(self._removed, dtype=np.int64))
+        index = create_ann_index(self.index_config, vectors)
+        index.add_with_ids(vectors[keep], ids[keep])
+        apply_search_params(index, self.index_config)
+        self._vectorstore.index = index
+        self._removed = set()
+
+    def document_ids(self):
+        return list(self.manifest["documents"])
+
+    def _iter_chunks(self, content):
+        # Each page (or the whole text, if it has no pages) is split on its own,
+        # so a chunk never spans pages; yields (text, page, start offset in page)
+        pages = split_page_markers(content) if isinstance(content, str) else content
+        for page_number, page_text in pages:
+            for doc in self.splitter.create_documents([page_text]):
+                yield doc.page_content, page_number, doc.metadata["start_index"]
+
+    def _embed_chunks(self, chunks, entries, positions):
+        vectors = embed_as_array(self.embeddings, [chunks[p] for p in positions])
+        if self._vectorstore is None:
+            self._new_vectorstore(vectors.shape[1])
+        elif vectors.shape[1] != self._vectorstore.index.d:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match index dimension "
+                f"{self._vectorstore.index.d} in {self.persist_dir}"
+            )
+        ids = np.arange(self.manifest["next_id"], self.manifest["next_id"] + len(positions), dtype=np.int64)
+        self.manifest["next_id"] += len(positions)
+        self._vectorstore.index.add_with_ids(vectors, ids)
+        for position, chunk_id in zip(positions, ids.tolist()):
+            entries[position] = {"id": chunk_id, "hash": chunk_hash(chunks[position])}
+
+    def add_document(self, doc_id, content, metadata=None, embed_batch=256):
+        """
+        Add or update a document. content is the document text or an iterable of
+        (page_number, text) records, e.g. from iter_pdf_pages(); pages are chunked
+        and embedded as they arrive. Unchanged chunks keep their vectors; only new
+        chunk texts are embedded. Returns the number of chunks embedded.
+        """
+        old_chunks = self.manifest["documents"].get(doc_id, {"chunks": []})["chunks"]
+        reusable = {}
+        for chunk in old_chunks:
+            reusable.setdefault(chunk["hash"], []).append(chunk["id"])
+
+        chunks, spans, entries, pending = [], [], [], []
+        n_embedded = 0
+        for chunk, page, start in self._iter_chunks(content):
+            h = chunk_hash(chunk)
+            if reusable.get(h):
+                entries.append({"id": reusable[h].pop(0), "hash": h})
+            else:
+                entries.append(None)
+                pending.append(len(chunks))
+            chunks.append(chunk)
+            spans.append((page, start))
+            if len(pending) >= embed_batch:
+                self._embed_chunks(chunks, entries, pending)
+                n_embedded += len(pending)
+                pending = []
+        if pending:
+            self._embed_chunks(chunks, entries, pending)
+            n_embedded += len(pending)
+
+        # Chunks that disappeared from the document
+        self._drop_chunks([i for ids in reusable.values() for i in ids])
+
+        for position, entry in enumerate(entries):
+            entry["page"], entry["start"] = spans[position]
+            self._put_chunk(entry["id"], chunk_document(chunks[position], doc_id, position, entry, metadata))
+        self.manifest["documents"][doc_id] = {"chunks": entries}
+        if metadata:
+            self.manifest["documents"][doc_id]["metadata"] = metadata
+        return n_embedded
+
+    def document_chunks(self, doc_id):
+        """The document's chunk texts in document order"""
+        entry = self.manifest["documents"].get(doc_id, {"chunks": []})
+        return [self._vectorstore.docstore.search(str(chunk["id"])).page_content for chunk in entry["chunks"]]
+
+    def select_chunk_ids(self, doc_ids=None, pages=None):
+        """Chunk ids of the given documents, optionally within an inclusive (first, last) page range"""
+        selected = []
+        for doc_id, entry in self.manifest["documents"].items():
+            if doc_ids is not None and doc_id not in doc_ids:
+                continue
+            for chunk in entry["chunks"]:
+                page = chunk.get("page")
+                if pages is not None and (page is None or not pages[0] <= page <= pages[1]):
+                    continue
+                selected.append(chunk["id"])
+        return selected
+
+    def search(self, query, k=4, doc_ids=None, pages=None):
+        """
+        Similarity search restricted to some documents / pages. The restriction
+        is resolved from the manifest and applied inside faiss with an id selector
+        (exact index) or by exact search over the selected vectors (ANN indexes,
+        whose probed lists / graph walk may hold none of them).
+        Returns [(Document, distance)].
+        """
+        if self._vectorstore is None:
+            return []
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        index = self.vectorstore.index
+        params = None
+        if doc_ids is not None or pages is not None:
+            ids = self.select_chunk_ids(doc_ids, pages)
+            if not ids:
+                return []
+            ids = np.array(ids, dtype=np.int64)
+            if isinstance(index, SparseIndex):
+                return self._results(*index.search(vector, k, subset=ids))
+            if self.index_config["type"] != "flat" and self.index_config["trained"]:
+                distances = ((self._vectorstore.index.reconstruct_batch(ids) - vector) ** 2).sum(axis=1)
+                top = np.argsort(distances, kind="stable")[:k]
+                return [(self._vectorstore.docstore.search(str(ids[i])), float(distances[i])) for i in top]
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+        if params is None:
+            return self._results(*index.search(vector, k))
+        return self._results(*index.search(vector, k, params=params))
+
+    def _results(self, distances, ids):
+        return [
+            (self._vectorstore.docstore.search(str(i)), float(d))
+            for d, i in zip(distances[0], ids[0]) if i != -1
+        ]
+
+    def _maybe_train(self):
+        # Swap the exact index for the configured ANN index once there is enough data
+        config = self.index_config
+        min_train = max(config.get("min_train", 1000), 256 if config["type"] == "ivf_pq" else 1)
+        if config["trained"] or self._vectorstore.index.ntotal < min_train:
+            return
+        ids, vectors = self._index_contents()
+        index = create_ann_index(config, vectors)
+        index.add_with_ids(vectors, ids)
+        apply_search_params(index, config)
+        self._vectorstore.index = index
+        config["trained"] = True
+
+    def remove_document(self, doc_id):
+        entry = self.manifest["documents"].pop(doc_id, None)
+        if entry is None:
+            return False
+        self._drop_chunks([chunk["id"] for chunk in entry["chunks"]])
+        return True
+
+    def save(self):
+        """
+        Write the vector index, the BM25 index, the chunk files and manifest.json
+        to temp files and rename them into place, so a crash mid-save never
+        leaves a truncated file. The manifest goes last: if the save stops
+        before it, the next writer to open the store drops whatever the old
+        manifest does not account for (see _reconcile). Readers that mapped
+        the old files keep them until they reopen the store.
+        """
+        if self._vectorstore is None:
+            raise ValueError("Nothing to save: the store has no documents")
+        self._compact()
+        self._maybe_train()
+        os.makedirs(self.persist_dir, exist_ok=True)
+
+        def write_atomic(name, write):
+            fd, tmp_path = tempfile.mkstemp(dir=self.persist_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, os.path.join(self.persist_dir, name))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        def write_manifest(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+
+        def write_lexical(path):
+            with open(path, "wb") as f:
+                build_lexical_index(self._vectorstore).save(f)
+
+        def write_sparse(path):
+            with open(path, "wb") as f:
+                self._vectorstore.index.save(f)
+
+        index = self._vectorstore.index
+        if isinstance(index, SparseIndex):
+            write_atomic(SPARSE_INDEX_FILE, write_sparse)
+        else:
+            write_atomic("index.faiss", lambda path: faiss.write_index(index, path))
+        write_atomic(LEXICAL_FILE, write_lexical)
+        write_chunk_files(self.manifest, self._vectorstore.docstore.text, write_atomic)
+        # The commit point: reopening reconciles the other files with the manifest
+        write_atomic(self.MANIFEST_NAME, write_manifest)
+        # Converted from the pickle layout
+        legacy_pickle = os.path.join(self.persist_dir, "index.pkl")
+        if os.path.exists(legacy_pickle):
+            os.remove(legacy_pickle)
+        return self.persist_dir
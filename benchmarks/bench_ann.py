@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+ANN index benchmark: recall@k against the exact flat index, query latency,
+build time and serialized size for every index type in INDEX_TYPES.
+Runs on synthetic clustered vectors shaped like MiniLM embeddings (384-d),
+so it needs neither the model nor a large document library.
+
+Usage: python -m benchmarks.bench_ann [--n 100000] [--dim 384] [--queries 500] [--k 4]
+                                      [--nprobe 4,8,32] [--ef-search 32,64,128]
+"""
+import os
+import time
+import argparse
+
+import faiss
+import numpy as np
+from backend.vectorstore_handler import INDEX_TYPES, apply_search_params, create_ann_index
+
+
+def clustered_vectors(n, dim, rng, clusters=200):
+    # Document chunks cluster by topic; uniform noise would flatter IVF and PQ less realistically
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors.astype(np.float32)
+
+
+def search_timed(index, queries, k):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) / len(queries)
+
+
+def recall(ids, truth):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(ids, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", default="4,8,32")
+    parser.add_argument("--ef-search", default="32,64,128")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.n + args.queries, args.dim, rng)
+    vectors, queries = vectors[:args.n], vectors[args.n:]
+    ids = np.arange(args.n, dtype=np.int64)
+    print(f"📐 {args.n} x {args.dim} vectors, {args.queries} queries, k={args.k}")
+
+    truth = None
+    for index_type in INDEX_TYPES:
+        config = {"type": index_type}
+        start = time.perf_counter()
+        index = create_ann_index(config, vectors)
+        index.add_with_ids(vectors, ids)
+        build = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        extra = f"nlist={config['nlist']}" if "nlist" in config else ""
+        if "pq_m" in config:
+            extra += f" pq_m={config['pq_m']}"
+        print(f"\n{index_type:<9} build {build:7.2f}s  size {size_mb:8.1f} MB  {extra}")
+
+        if index_type == "flat":
+            truth, latency = search_timed(index, queries, args.k)
+            print(f"  exact              recall@{args.k} 1.000  {latency * 1000:7.3f} ms/query")
+            continue
+
+        knob, values = ("FAISS_NPROBE", args.nprobe) if index_type != "hnsw" else ("FAISS_EF_SEARCH", args.ef_search)
+        for value in values.split(","):
+            os.environ[knob] = value
+            apply_search_params(index, config)
+            found, latency = search_timed(index, queries, args.k)
+            print(f"  {knob.split('_', 1)[1].lower():<9}={value:<8} recall@{args.k} {recall(found, truth):.3f}  "
+                  f"{latency * 1000:7.3f} ms/query")
+        os.environ.pop(knob)
+
+
+if __name__ == "__main__":
+    main()
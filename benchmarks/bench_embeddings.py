@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark: list-of-floats path vs. float32 batched path.
+Chunks every distinct PDF in data/uploads and indexes it both ways.
+
+Usage: python -m benchmarks.bench_embeddings [--batch-sizes 32,64,128] [--workers 4]
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+# Measure the encoder itself, not the on-disk cache
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+import faiss
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from backend.document_loader import extract_text_from_pdf
+from backend.onnx_embeddings import embedding_dimension
+from backend.rag_pipeline import get_embeddings
+
+
+def load_chunks(upload_dir="data/uploads"):
+    seen = set()
+    chunks = []
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    for name in sorted(os.listdir(upload_dir)):
+        path = os.path.join(upload_dir, name)
+        if not name.lower().endswith(".pdf"):
+            continue
+        digest = hashlib.sha256(open(path, "rb").read()).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        chunks.extend(splitter.split_text(extract_text_from_pdf(path)))
+    return chunks
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def index_vectors(vectors):
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", default="32,64,128")
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    embeddings = get_embeddings()
+    if embeddings.model is None:
+        print("❌ SentenceTransformer model not available; nothing to benchmark")
+        sys.exit(1)
+
+    chunks = load_chunks()
+    print(f"📄 {len(chunks)} chunks from data/uploads")
+
+    # Previous path: encode -> Python lists -> back to numpy for faiss
+    def list_path():
+        as_lists = embeddings.model.encode(chunks).tolist()
+        return index_vectors(np.array(as_lists, dtype=np.float32))
+
+    seconds, _ = time_it(list_path)
+    print(f"list path            {seconds:8.2f}s  {len(chunks) / seconds:8.1f} chunks/s")
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        embeddings.batch_size = batch_size
+        seconds, _ = time_it(lambda: index_vectors(embeddings.embed_documents_array(chunks)))
+        print(f"float32 batch={batch_size:<4}    {seconds:8.2f}s  {len(chunks) / seconds:8.1f} chunks/s")
+
+    if args.workers > 1:
+        embeddings.workers = args.workers
+        # First call starts the pool; time the steady state
+        embeddings.embed_documents_array(chunks[: embeddings.batch_size * args.workers])
+        seconds, _ = time_it(lambda: index_vectors(embeddings.embed_documents_array(chunks)))
+        print(f"pool workers={args.workers:<4}    {seconds:8.2f}s  {len(chunks) / seconds:8.1f} chunks/s")
+        embeddings.stop_pool()
+
+    dim = embedding_dimension(embeddings.model)
+    print(f"💾 vectors as float32: {len(chunks) * dim * 4 / 1e6:.1f} MB; "
+          f"as Python floats: ~{len(chunks) * dim * 32 / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Index open cost: the old pickle layout (FAISS.load_local of index.pkl) vs.
+open_vectorstore() over memory-mapped index.faiss + the compact chunk store,
+plus reopening the store for ingest (IncrementalVectorStore).
+Builds a synthetic store of N chunks with 384-d vectors, then opens it in a
+fresh process per case and reports open time, first-query (or add) time and
+private (anonymous) vs. file-backed resident memory.
+
+Usage: python -m benchmarks.bench_index_load [--chunks 10000] [--dim 384]
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+WORDS = ("model data index query vector chunk page document answer search retrieval "
+         "embedding token score memory latency cache batch summary section").split()
+
+
+class HashEmbeddings(Embeddings):
+    """Random vectors seeded by the text; stands in for the encoder"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _vector(self, text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=self.dim).astype(np.float32)
+
+    def embed_documents(self, texts):
+        return [self._vector(t).tolist() for t in texts]
+
+    def embed_documents_array(self, texts):
+        return np.vstack([self._vector(t) for t in texts])
+
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+
+def build(persist_dir, legacy_dir, n_chunks, dim):
+    from backend.vectorstore_handler import IncrementalVectorStore
+
+    rng = np.random.default_rng(0)
+    store = IncrementalVectorStore(persist_dir, HashEmbeddings(dim))
+    per_doc = 100
+    for d in range(n_chunks // per_doc):
+        pages = [(p, " ".join(rng.choice(WORDS, 55)) + f" doc {d} page {p}.") for p in range(1, per_doc + 1)]
+        store.add_document(f"doc{d}", pages)
+    store.save()
+    store.vectorstore.save_local(legacy_dir)  # the pre-mmap layout: index.faiss + index.pkl
+    return store.vectorstore.index.ntotal
+
+
+PROBE = r"""
+import json, sys, time
+def rss():
+    fields = {}
+    for line in open("/proc/self/status"):
+        key, _, value = line.partition(":")
+        fields[key] = value.strip()
+    kb = lambda key: int(fields.get(key, "0 kB").split()[0])
+    return {"anon": kb("RssAnon"), "file": kb("RssFile")}
+
+from benchmarks.bench_index_load import HashEmbeddings
+from backend.vectorstore_handler import IncrementalVectorStore, load_faiss_local, open_vectorstore
+layout, path, dim = sys.argv[1], sys.argv[2], int(sys.argv[3])
+embeddings = HashEmbeddings(dim)
+before = rss()
+start = time.perf_counter()
+if layout == "pickle":
+    vs = load_faiss_local(path, embeddings)
+elif layout == "mmap":
+    vs = open_vectorstore(path, embeddings)
+else:
+    # Ingest path: reopen the store to add one more document
+    store = IncrementalVectorStore(path, embeddings)
+opened = time.perf_counter() - start
+start = time.perf_counter()
+if layout == "builder":
+    store.add_document("extra", "one more small document")
+else:
+    vs.similarity_search("document answer page", k=4)
+first_query = time.perf_counter() - start
+after = rss()
+print(json.dumps({"open": opened, "first_query": first_query,
+                  "anon_mb": (after["anon"] - before["anon"]) / 1024,
+                  "file_mb": (after["file"] - before["file"]) / 1024}))
+"""
+
+
+def probe(layout, path, dim):
+    result = subprocess.run([sys.executable, "-c", PROBE, layout, path, str(dim)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def dir_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_index_load_")
+    persist_dir, legacy_dir = os.path.join(root, "mmap"), os.path.join(root, "pickle")
+    n = build(persist_dir, legacy_dir, args.chunks, args.dim)
+    print(f"📦 {n} chunks x {args.dim}-d  (pickle layout {dir_mb(legacy_dir):.1f} MB on disk, "
+          f"mmap layout {dir_mb(persist_dir):.1f} MB)")
+
+    for layout, path, action in (("pickle", legacy_dir, "first query"), ("mmap", persist_dir, "first query"),
+                                 ("builder", persist_dir, "add one doc")):
+        r = probe(layout, path, args.dim)
+        print(f"{layout:<8} open {r['open'] * 1000:8.1f} ms  {action} {r['first_query'] * 1000:7.1f} ms  "
+              f"private +{r['anon_mb']:6.1f} MB  shared file pages +{r['file_mb']:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
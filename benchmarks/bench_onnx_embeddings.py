@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Embedding backends on CPU: the torch SentenceTransformer vs. its ONNX export
+(fp32 and int8) run by onnxruntime (backend.onnx_embeddings). Each backend
+runs in a fresh process that loads the model, embeds the PDF chunks of
+data/uploads and then single queries; reported are load time, chunk
+throughput, query latency, RSS after load and peak RSS, and how close the
+ONNX vectors are to the torch ones (cosine, and top-k neighbour overlap).
+
+The model is MiniLM when it can be loaded; otherwise a randomly initialized
+model of the same shape (6 layers, 384-d, 12 heads, 30522-token vocabulary)
+with a word-level vocabulary from the corpus, so the cost profile matches.
+
+Usage: python -m benchmarks.bench_onnx_embeddings [--chunks 512] [--batch-size 64] [--threads 0] [--onnx-dir DIR]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+import numpy as np
+
+BACKENDS = ["torch", "onnx-fp32", "onnx-int8"]
+
+CHILD = r"""
+import json, os, sys, time
+import numpy as np
+
+backend, model_dir, onnx_dir, chunks_path, out_path, batch_size, threads = sys.argv[1:]
+batch_size, threads = int(batch_size), int(threads)
+chunks = json.load(open(chunks_path))
+
+def rss_mb(field="VmRSS"):
+    # VmHWM is the peak; ru_maxrss would include the parent's, as it survives exec
+    for line in open("/proc/self/status"):
+        if line.startswith(field + ":"):
+            return int(line.split()[1]) / 1024
+
+start = time.perf_counter()
+if backend == "torch":
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_dir, device="cpu")
+else:
+    from backend.onnx_embeddings import OnnxEncoder
+    model = OnnxEncoder(onnx_dir, quantized=backend == "onnx-int8", threads=threads)
+load = time.perf_counter() - start
+loaded_rss = rss_mb()
+
+encode = lambda texts: np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+encode(chunks[:batch_size])  # warm-up
+start = time.perf_counter()
+vectors = encode(chunks)
+seconds = time.perf_counter() - start
+latencies = []
+for text in chunks[:50]:
+    t = time.perf_counter()
+    encode([text[:120]])
+    latencies.append(time.perf_counter() - t)
+latencies.sort()
+np.save(out_path, vectors)
+print(json.dumps({"load": load, "per_second": len(chunks) / seconds, "query_ms": latencies[len(latencies) // 2] * 1000,
+                  "rss": loaded_rss, "peak_rss": rss_mb("VmHWM")}))
+"""
+
+
+def minilm_shaped_model(path, chunks):
+    """A random MiniLM-shaped SentenceTransformer saved at path, word-level vocab from chunks"""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    specials = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+    letters = [chr(c) for c in range(33, 127)]
+    pieces = specials + letters + ["##" + c for c in letters]
+    words = Counter(w for chunk in chunks for w in chunk.lower().split() if w.isalpha())
+    vocab = pieces + [w for w, _ in words.most_common(30522 - len(pieces)) if w not in pieces]
+    vocab += [f"[unused{i}]" for i in range(30522 - len(vocab))]
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                        intermediate_size=1536, max_position_embeddings=512)
+    BertModel(config).save_pretrained(path)
+    transformer = Transformer(path, max_seq_length=256)
+    SentenceTransformer(modules=[transformer, Pooling(384), Normalize()], device="cpu").save(path)
+    return path
+
+
+def load_model(workdir, chunks):
+    from sentence_transformers import SentenceTransformer
+    from backend.rag_pipeline import EMBEDDING_MODEL_NAME
+
+    try:
+        path = os.path.join(workdir, "minilm")
+        SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu").save(path)
+        return path, "MiniLM"
+    except Exception:
+        return minilm_shaped_model(os.path.join(workdir, "random"), chunks), \
+            "MiniLM-shaped random model (MiniLM unavailable)"
+
+
+def neighbour_overlap(a, b, k=10):
+    """Mean share of each vector's top-k neighbours (by cosine) that agree between a and b"""
+    top = lambda v: np.argsort(-(v @ v.T), axis=1)[:, 1:k + 1]
+    ta, tb = top(a), top(b)
+    return float(np.mean([len(set(x) & set(y)) / k for x, y in zip(ta, tb)]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=512, help="PDF chunks to embed")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0 = library default)")
+    parser.add_argument("--onnx-dir", default=None, help="an existing export of the same model")
+    args = parser.parse_args()
+
+    from benchmarks.bench_embeddings import load_chunks
+    from backend.onnx_embeddings import export_onnx_model
+
+    chunks = load_chunks()[:args.chunks]
+    workdir = tempfile.mkdtemp(prefix="bench_onnx_")
+    model_dir, name = load_model(workdir, chunks)
+    onnx_dir = args.onnx_dir or os.path.join(workdir, "onnx")
+    if not args.onnx_dir:
+        export_onnx_model(model_dir, onnx_dir)
+    chunks_path = os.path.join(workdir, "chunks.json")
+    with open(chunks_path, "w", encoding="utf-8") as f:
+        json.dump(chunks, f)
+    sizes = {f: os.path.getsize(os.path.join(onnx_dir, f)) / 2 ** 20 for f in ("model.onnx", "model.int8.onnx")}
+    print(f"🧮 model: {name}; {len(chunks)} chunks, batch {args.batch_size}; "
+          f"onnx {sizes['model.onnx']:.0f} MB fp32, {sizes['model.int8.onnx']:.0f} MB int8")
+
+    vectors = {}
+    for backend in BACKENDS:
+        out_path = os.path.join(workdir, f"{backend}.npy")
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD, backend, model_dir, onnx_dir, chunks_path, out_path,
+             str(args.batch_size), str(args.threads)],
+            capture_output=True, text=True, env=dict(os.environ, HF_HUB_OFFLINE="1"),
+        )
+        if result.returncode:
+            raise RuntimeError(result.stderr[-2000:])
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        vectors[backend] = np.load(out_path)
+        print(f"  {backend:<10} load {r['load']:5.1f}s  {r['per_second']:7.1f} chunks/s  query p50 "
+              f"{r['query_ms']:6.1f} ms  RSS {r['rss']:6.0f} MB loaded, {r['peak_rss']:6.0f} MB peak")
+
+    print("\n📐 agreement with torch vectors")
+    unit = {b: v / np.linalg.norm(v, axis=1, keepdims=True) for b, v in vectors.items()}
+    for backend in BACKENDS[1:]:
+        cosine = (unit[backend] * unit["torch"]).sum(axis=1)
+        print(f"  {backend:<10} cosine min {cosine.min():.4f} mean {cosine.mean():.4f}  "
+              f"top-10 neighbour overlap {neighbour_overlap(unit[backend], unit['torch']):.1%}")
+
+
+if __name__ == "__main__":
+    main()
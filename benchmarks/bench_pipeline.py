@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Offline load test of retrieval + generation with the FakeBackend.
+Indexes the distinct text files in data/uploads into a temp namespace, then
+fires concurrent questions and separates our own overhead from the
+simulated provider latency.
+
+Usage: python -m benchmarks.bench_pipeline [--queries 200] [--concurrency 8] [--first-token-ms 300]
+"""
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.llm_backend import FakeBackend, set_llm_backend
+from backend.rag_pipeline import build_and_persist_vectorstore, load_vectorstore_and_qa
+
+QUESTIONS = [
+    "What is the main subject of the document?",
+    "Who painted the picture?",
+    "Why did he stop painting?",
+    "Summarize the main points of this document",
+    "What are the key findings?",
+]
+
+
+def load_texts(upload_dir="data/uploads"):
+    texts = {}
+    for name in sorted(os.listdir(upload_dir)):
+        if name.endswith(".txt"):
+            data = open(os.path.join(upload_dir, name), "rb").read()
+            texts.setdefault(hashlib.sha256(data).hexdigest(), data.decode("utf-8", errors="ignore"))
+    return list(texts.values())
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    llm = FakeBackend(first_token_latency=args.first_token_ms / 1000, token_latency=args.token_ms / 1000)
+    set_llm_backend(llm)
+
+    persist_dir = os.path.join(tempfile.mkdtemp(), "vs")
+    start = time.perf_counter()
+    build_and_persist_vectorstore(load_texts(), persist_dir=persist_dir)
+    print(f"🏗️  index built in {time.perf_counter() - start:.2f}s")
+
+    qa = load_vectorstore_and_qa(persist_dir=persist_dir)
+
+    def one(i):
+        query = QUESTIONS[i % len(QUESTIONS)]
+        t0 = time.perf_counter()
+        docs = qa.retriever.invoke(query)
+        t1 = time.perf_counter()
+        answer = qa.chain.answer_from_docs(query, docs)
+        t2 = time.perf_counter()
+        n_chunks = max(1, -(-len(answer) // llm.chunk_size))
+        simulated = llm.first_token_latency + llm.token_latency * (n_chunks - 1)
+        return t1 - t0, t2 - t0, t2 - t0 - simulated
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.queries)))
+    wall = time.perf_counter() - start
+
+    retrieval, total, overhead = zip(*results)
+    print(f"📊 {args.queries} queries, concurrency {args.concurrency}: {args.queries / wall:.1f} q/s")
+    for label, values in (("retrieval", retrieval), ("end-to-end", total), ("our overhead", overhead)):
+        print(f"   {label:<13} p50 {percentile(values, 0.5) * 1000:8.1f} ms   "
+              f"p95 {percentile(values, 0.95) * 1000:8.1f} ms   mean {statistics.mean(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Query embedding under concurrent load: one encoder call per query vs. the
+query LRU vs. LRU + micro-batching (backend.query_encoder.QueryEncoder).
+Each simulated user asks a mix of canned prompts (the app's fixed retrieval
+strings and suggestions) and unique questions.
+
+The encoder is MiniLM when it can be loaded; otherwise a randomly initialized
+transformer of the same shape (6 layers, 384-d, 12 heads) on CPU, which has
+the same per-call and per-token cost profile.
+
+Usage: python -m benchmarks.bench_query_embedding [--users 1,8,32] [--queries 20] [--window-ms 5]
+"""
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+import numpy as np
+
+CANNED = [
+    "summary", "insights", "mindmap", "study",
+    "Summarize the main points of this document", "What are the key findings?",
+    "Generate an executive summary", "Extract key insights", "Create bullet points",
+]
+WORDS = ("model data index query vector chunk page document answer search retrieval "
+         "embedding token score memory latency cache batch summary section").split()
+
+
+def minilm_shaped_encoder():
+    import torch
+
+    torch.manual_seed(0)
+    vocab, dim = 30522, 384
+    embed = torch.nn.Embedding(vocab, dim)
+    layer = torch.nn.TransformerEncoderLayer(dim, nhead=12, dim_feedforward=1536, batch_first=True)
+    encoder = torch.nn.TransformerEncoder(layer, num_layers=6).eval()
+
+    def encode(texts):
+        tokens = [[int(hashlib.md5(w.encode()).hexdigest()[:6], 16) % vocab for w in t.lower().split()][:128] or [0]
+                  for t in texts]
+        length = max(len(t) for t in tokens)
+        ids = torch.tensor([t + [0] * (length - len(t)) for t in tokens])
+        mask = torch.tensor([[False] * len(t) + [True] * (length - len(t)) for t in tokens])
+        with torch.inference_mode():
+            hidden = encoder(embed(ids), src_key_padding_mask=mask)
+            keep = (~mask).unsqueeze(-1).float()
+            return ((hidden * keep).sum(1) / keep.sum(1)).numpy().astype(np.float32)
+
+    return encode
+
+
+def load_encoder():
+    from backend.rag_pipeline import get_embeddings
+
+    embeddings = get_embeddings()
+    if embeddings.model is not None:
+        return embeddings._encode, "MiniLM"
+    return minilm_shaped_encoder(), "MiniLM-shaped random transformer (model unavailable)"
+
+
+def workload(users, per_user, seed):
+    rng = random.Random(seed)
+    return [[rng.choice(CANNED) if rng.random() < 0.3 else " ".join(rng.choices(WORDS, k=rng.randint(5, 14))) + "?"
+             for _ in range(per_user)] for _ in range(users)]
+
+
+def run(embed, queries):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(queries))
+
+    def user(own):
+        barrier.wait()
+        for query in own:
+            start = time.perf_counter()
+            embed(query)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=user, args=(q,)) for q in queries]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], len(latencies) / wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", default="1,8,32")
+    parser.add_argument("--queries", type=int, default=20, help="queries per user")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from backend.query_encoder import QueryEncoder
+
+    encode, name = load_encoder()
+    encode(["warm up"])
+    print(f"🧮 encoder: {name}")
+
+    for users in [int(u) for u in args.users.split(",")]:
+        queries = workload(users, args.queries, args.seed)
+        print(f"\n👥 {users} concurrent users x {args.queries} queries")
+        variants = [
+            ("encode per query", lambda: (lambda q: encode([q])[0]), None),
+            ("lru", lambda: QueryEncoder(encode, window=0).embed, None),
+            (f"lru + batch {args.window_ms:g}ms", lambda: QueryEncoder(encode, window=args.window_ms / 1000), True),
+        ]
+        for label, make, batched in variants:
+            target = make()
+            embed = target.embed if batched else target
+            p50, p95, qps = run(embed, queries)
+            extra = ""
+            if batched:
+                stats = target.stats()
+                extra = f"  hits {stats['hits']}, {stats['batched_queries']} misses in {stats['batches']} encoder calls"
+            print(f"  {label:<20} p50 {p50 * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms  {qps:7.1f} q/s{extra}")
+
+
+if __name__ == "__main__":
+    main()
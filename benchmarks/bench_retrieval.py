@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval quality and latency: dense only vs. BM25 only vs. hybrid (RRF).
+Indexes the distinct documents in data/uploads into a temp store, then asks
+two sets of questions about randomly sampled chunks: exact-term questions
+built from a chunk's two rarest words, and reworded questions built from one
+of its sentences with the rare words dropped and the rest shuffled, where
+dense retrieval should carry hybrid. A question is answered if its source
+chunk is in the top-k.
+
+Usage: python -m benchmarks.bench_retrieval [--queries 200] [--k 4] [--candidates N] [--seed 0]
+"""
+import os
+import re
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+
+import numpy as np
+from backend.document_loader import extract_text_from_pdf
+from backend.lexical_index import tokenize
+from backend.rag_pipeline import HybridRetriever, get_embeddings, search_batch
+from backend.vectorstore_handler import IncrementalVectorStore, load_lexical_index
+
+TEMPLATES = [
+    "What does the document say about {} and {}?",
+    "Where is {} mentioned together with {}?",
+    "Explain {} in the context of {}",
+]
+
+
+def load_documents(upload_dir="data/uploads"):
+    documents = {}
+    for name in sorted(os.listdir(upload_dir)):
+        path = os.path.join(upload_dir, name)
+        data = open(path, "rb").read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in documents:
+            continue
+        if name.lower().endswith(".pdf"):
+            documents[digest] = extract_text_from_pdf(path)
+        elif name.lower().endswith((".txt", ".md")):
+            documents[digest] = data.decode("utf-8", errors="ignore")
+    return documents
+
+
+def document_frequencies(chunks):
+    df = {}
+    for _, text in chunks:
+        for term in set(tokenize(text)):
+            df[term] = df.get(term, 0) + 1
+    return df
+
+
+def make_queries(chunks, n, rng):
+    """(query, target chunk key) pairs from the two rarest words of sampled chunks"""
+    df = document_frequencies(chunks)
+    queries = []
+    for key, text in rng.sample(chunks, min(n, len(chunks))):
+        terms = sorted({t for t in tokenize(text) if t.isalpha() and len(t) > 3}, key=lambda t: (df[t], t))
+        if len(terms) >= 2:
+            queries.append((rng.choice(TEMPLATES).format(terms[0], terms[1]), key))
+    return queries
+
+
+def make_reworded_queries(chunks, n, rng):
+    """
+    (query, target chunk key) pairs that share no rare term with their chunk:
+    the words of its longest sentence minus the rarest third, shuffled
+    """
+    df = document_frequencies(chunks)
+    queries = []
+    for key, text in rng.sample(chunks, min(n, len(chunks))):
+        sentence = max(re.split(r"(?<=[.!?])\s+", text), key=len)
+        words = list(dict.fromkeys(t for t in tokenize(sentence) if t.isalpha() and len(t) > 3))
+        common = sorted(words, key=lambda t: (-df[t], t))[:len(words) - len(words) // 3]
+        if len(common) >= 4:
+            rng.shuffle(common)
+            queries.append(("What is said about " + " ".join(common[:8]) + "?", key))
+    return queries
+
+
+def evaluate(name, retrieve, queries, k):
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for query, target in queries:
+        start = time.perf_counter()
+        docs = retrieve(query)
+        latencies.append(time.perf_counter() - start)
+        keys = [(d.metadata["doc_id"], d.metadata["chunk"]) for d in docs[:k]]
+        if target in keys:
+            hits += 1
+            reciprocal_ranks.append(1 / (keys.index(target) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+    latencies.sort()
+    print(f"{name:<16} hit@{k} {hits / len(queries):6.1%}  MRR {statistics.mean(reciprocal_ranks):.3f}  "
+          f"p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=None,
+                        help="per-side depth fused by RRF (default HYBRID_CANDIDATES or 20)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    documents = load_documents()
+    embeddings = get_embeddings()
+    persist_dir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    store = IncrementalVectorStore(persist_dir, embeddings)
+    if embeddings.model is None:
+        print("⚠️ SentenceTransformer not available; dense results use the TF-IDF fallback")
+
+    start = time.perf_counter()
+    for doc_id, text in documents.items():
+        store.add_document(doc_id, text)
+    store.save()
+    print(f"📄 {len(documents)} documents, {store.vectorstore.index.ntotal} chunks, "
+          f"indexed in {time.perf_counter() - start:.1f}s")
+
+    vs = store.vectorstore
+    lexical = load_lexical_index(persist_dir, vs)
+    chunks = [((d.metadata["doc_id"], d.metadata["chunk"]), d.page_content)
+              for d in (vs.docstore.search(i) for i in vs.index_to_docstore_id.values())]
+    queries = make_queries(chunks, args.queries, random.Random(args.seed))
+    reworded = make_reworded_queries(chunks, args.queries, random.Random(args.seed + 1))
+
+    def dense(query, k=args.k):
+        vector = np.asarray([embeddings.embed_query(query)], dtype=np.float32)
+        return [doc for doc, _ in search_batch(vs, vector, k)[0]]
+
+    def bm25(query):
+        return [vs.docstore.search(i) for i, _ in lexical.search(query, args.k)]
+
+    hybrid = HybridRetriever([vs], [lexical], embeddings, k=args.k, candidates=args.candidates)
+    shallow = HybridRetriever([vs], [lexical], embeddings, k=args.k, candidates=args.k)
+
+    for title, question_set in [("exact-term", queries), ("reworded", reworded)]:
+        print(f"\n❓ {len(question_set)} {title} questions")
+        evaluate("dense", dense, question_set, args.k)
+        evaluate(f"dense k={args.k * 2}", lambda q: dense(q, args.k * 2), question_set, args.k * 2)
+        evaluate("bm25", bm25, question_set, args.k)
+        evaluate(f"hybrid c={args.k}", shallow.invoke, question_set, args.k)
+        evaluate(f"hybrid c={hybrid.dense.k}", hybrid.invoke, question_set, args.k)
+
+    # Batched path used by answer_batch
+    texts = [q for q, _ in queries]
+    vectors = np.asarray([embeddings.embed_query(q) for q in texts], dtype=np.float32)
+    start = time.perf_counter()
+    hybrid.invoke_batch_by_vectors(vectors, texts)
+    seconds = time.perf_counter() - start
+    print(f"\nhybrid batch     {len(texts)} queries in {seconds * 1000:.1f} ms "
+          f"({seconds / len(texts) * 1000:.2f} ms/query, embedding excluded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup cost: import time of every module app.py imports (each in a fresh
+process, via python -X importtime), the first run of the app script, and
+which heavy libraries that run pulled in. Also times the embedding warm-up
+that app.py starts in a background thread, which is off the request path.
+
+Usage: python -m benchmarks.bench_startup [--skip-warmup]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Direct imports of app.py, then the heavy libraries that should stay out of startup
+APP_MODULES = [
+    "streamlit", "backend.document_loader", "backend.summarizer", "backend.llm_backend",
+    "backend.index_catalog", "backend.ingest_jobs", "backend.mindmap_generator",
+    "backend.utils", "frontend.components",
+]
+HEAVY_MODULES = [
+    "torch", "sentence_transformers", "langchain", "langchain_community", "faiss", "sklearn",
+    "google.generativeai", "graphviz", "backend.rag_pipeline",
+]
+
+APP_RUN = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=300).run()
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "exceptions": len(at.exception),
+                  "loaded": [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+WARMUP = r"""
+import json, time
+start = time.perf_counter()
+from backend.rag_pipeline import get_embeddings
+imported = time.perf_counter() - start
+embeddings = get_embeddings()
+print(json.dumps({"import": imported, "total": time.perf_counter() - start,
+                  "model": embeddings.model is not None}))
+"""
+
+
+def run(args, env=None):
+    result = subprocess.run([sys.executable, *args], capture_output=True, text=True,
+                            env=dict(os.environ, **(env or {})))
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return result
+
+
+def import_seconds(module):
+    """Cumulative import time of module in a fresh process"""
+    stderr = run(["-X", "importtime", "-c", f"import {module}"]).stderr
+    for line in reversed(stderr.splitlines()):
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            return int(line.split("|")[1]) / 1e6
+    return 0.0
+
+
+def last_json(stdout):
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skip-warmup", action="store_true", help="don't time the embedding warm-up")
+    args = parser.parse_args()
+
+    print("⏱️ import time per module (fresh process each)")
+    for module in APP_MODULES + HEAVY_MODULES:
+        marker = "  (heavy)" if module in HEAVY_MODULES else ""
+        print(f"  {module:<28} {import_seconds(module) * 1000:8.1f} ms{marker}")
+
+    r = last_json(run(["-c", APP_RUN, *HEAVY_MODULES], env={"EMBEDDING_WARMUP": "false"}).stdout)
+    print(f"\n🚀 app.py first run {r['seconds'] * 1000:.0f} ms, {r['exceptions']} exceptions")
+    print(f"   heavy modules loaded: {', '.join(r['loaded']) or 'none'}")
+
+    if not args.skip_warmup:
+        r = last_json(run(["-c", WARMUP]).stdout)
+        kind = "MiniLM" if r["model"] else "TF-IDF fallback (model unavailable)"
+        print(f"\n🔥 background warm-up: pipeline import {r['import']:.1f}s, "
+              f"embeddings ready after {r['total']:.1f}s [{kind}]")
+
+
+if __name__ == "__main__":
+    main()
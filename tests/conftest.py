@@ -0,0 +1,105 @@
+# tests/conftest.py
+import ssl
+import sys
+
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+
+from backend import llm_backend
+from backend.llm_backend import FakeBackend
+
+
+def pytest_addoption(parser):
+    parser.addoption("--live", action="store_true", help="also run tests that call Gemini and the HuggingFace hub")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "live: calls Gemini and the HuggingFace hub; run with --live")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--live"):
+        return
+    skip = pytest.mark.skip(reason="live model test; run with --live")
+    for item in items:
+        if "live" in item.keywords:
+            item.add_marker(skip)
+
+
+class LetterEmbeddings(Embeddings):
+    """Deterministic letter-count embeddings that count what they embed"""
+
+    def __init__(self):
+        self.embedded = 0
+        self.query_calls = 0
+        self.batch_calls = 0
+
+    def _vector(self, text):
+        return [float(text.lower().count(c)) for c in "abcdefghijklmnopqrstuvwxyz"]
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self._vector(text)
+
+    def embed_queries_array(self, texts):
+        self.batch_calls += 1
+        return np.asarray([self._vector(t) for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def embeddings():
+    """Letter-count embeddings, fresh for each test so its counters start at zero"""
+    return LetterEmbeddings()
+
+
+def _reset_embeddings(monkeypatch):
+    from backend import rag_pipeline
+
+    monkeypatch.setattr(rag_pipeline, "_embeddings", None)
+    monkeypatch.setattr(rag_pipeline.LocalEmbeddings, "_instance", None)
+    monkeypatch.setattr(rag_pipeline.LocalEmbeddings, "_initialized", False)
+
+
+@pytest.fixture
+def fresh_embeddings(monkeypatch):
+    """get_embeddings() builds new LocalEmbeddings from the environment the test sets, without a cache"""
+    _reset_embeddings(monkeypatch)
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+    # LocalEmbeddings turns off HTTPS certificate checks before loading a model
+    monkeypatch.setattr(ssl, "_create_default_https_context", ssl._create_default_https_context)
+
+
+@pytest.fixture(scope="session")
+def embedding_cache_path(tmp_path_factory):
+    # The shared embeddings (and their cache) live for the whole session
+    return str(tmp_path_factory.mktemp("caches") / "embedding_cache.sqlite")
+
+
+@pytest.fixture(autouse=True)
+def cache_paths(tmp_path, monkeypatch, embedding_cache_path):
+    """Answer and embedding caches under tmp_path instead of data/processed"""
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", embedding_cache_path)
+    monkeypatch.setenv("ANSWER_CACHE_PATH", str(tmp_path / "answer_cache.sqlite"))
+    if "backend.rag_pipeline" in sys.modules:
+        monkeypatch.setattr(sys.modules["backend.rag_pipeline"], "_answer_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def hermetic(request, monkeypatch):
+    """Offline by default: a FakeBackend for generation and no HuggingFace hub access"""
+    if "live" in request.keywords:
+        # Fresh embeddings: an offline test may have left the TF-IDF fallback behind
+        _reset_embeddings(monkeypatch)
+        return
+    from huggingface_hub import constants
+
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    # huggingface_hub reads the variable once, at import
+    monkeypatch.setattr(constants, "HF_HUB_OFFLINE", True)
+    monkeypatch.setattr(llm_backend, "_llm_backend", FakeBackend())
@@ -0,0 +1,71 @@
+# tests/test_answer_cache.py
+import time
+
+from langchain_community.vectorstores import FAISS
+
+from backend.answer_cache import AnswerCache
+from backend.llm_backend import FakeBackend
+from backend.rag_pipeline import DirectGeminiQA, QAWrapper, build_and_persist_vectorstore, load_vectorstore_and_qa
+
+
+def test_exact_and_semantic_hits(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), semantic_threshold=0.9)
+    cache.put("v1", "What are the key findings?", "findings", [], embedding=[1.0, 0.0])
+
+    assert cache.get("v1", "  what are the KEY findings ")["answer"] == "findings"
+    assert cache.get("v2", "What are the key findings?") is None
+    assert cache.get("v1", "Main results?", embedding=[0.99, 0.05])["answer"] == "findings"
+    assert cache.get("v1", "Something else?", embedding=[0.0, 1.0]) is None
+    assert cache.stats() == {"hits": 2, "semantic_hits": 1, "misses": 2}
+
+
+def test_ttl_lru_and_persistence(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    cache = AnswerCache(path, max_entries=2, semantic_threshold=0)
+    cache.put("v", "a", "A", [])
+    cache.put("v", "b", "B", [{"text": "t", "metadata": {"page": 1}}])
+    cache.get("v", "a")
+    cache.put("v", "c", "C", [])  # evicts b
+    assert cache.get("v", "b") is None
+    cache.close()
+
+    reopened = AnswerCache(path, max_entries=2, semantic_threshold=0)
+    assert reopened.get("v", "a")["answer"] == "A"
+    assert len(reopened) == 2
+
+    short = AnswerCache(str(tmp_path / "short.sqlite"), ttl=0.01)
+    short.put("v", "a", "A", [])
+    time.sleep(0.02)
+    assert short.get("v", "a") is None
+
+
+def test_cached_wrapper_skips_generation_and_embeds_once(tmp_path, embeddings):
+    vs = FAISS.from_texts(["alpha text", "beta text"], embeddings)
+    retriever = vs.as_retriever(search_kwargs={"k": 1})
+    llm = FakeBackend(reply="cached answer")
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+    qa = QAWrapper(DirectGeminiQA(llm, retriever), retriever, cache=cache, index_version="v")
+
+    first = qa.run_with_sources("alpha?")
+    assert embeddings.query_calls == 1
+    assert qa.run_with_sources("Alpha") == first
+    assert llm.calls == 1
+
+    sources, chunks = qa.stream("beta")
+    assert "".join(chunks) == "cached answer"
+    sources, chunks = qa.stream("beta")
+    assert list(chunks) == ["cached answer"]
+    assert llm.calls == 2
+
+
+def test_semantic_tier_is_opt_in(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+    cache.put("v", "What are the key findings?", "findings", [], embedding=[1.0, 0.0])
+    assert not cache.semantic
+    assert cache.get("v", "Main results?", embedding=[1.0, 0.0]) is None
+
+
+def test_cache_version_includes_the_model(tmp_path):
+    persist_dir = str(tmp_path / "vs")
+    build_and_persist_vectorstore(["Supervised learning uses labels."], persist_dir=persist_dir)
+    assert load_vectorstore_and_qa(persist_dir=persist_dir).index_version.endswith("@fake")
@@ -0,0 +1,83 @@
+# tests/test_document_loader.py
+import io
+import os
+
+from backend.document_loader import (
+    extract_text_from_pdf,
+    iter_pdf_pages,
+    is_upload_processed,
+    load_manifest,
+    mark_upload_processed,
+    store_uploaded_file,
+)
+
+
+class FakeUpload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def test_reupload_is_deduplicated(tmp_path):
+    dest = str(tmp_path / "uploads")
+    path, content_hash, is_new = store_uploaded_file(FakeUpload(b"same bytes", "a.txt"), dest)
+    again, again_hash, again_new = store_uploaded_file(FakeUpload(b"same bytes", "b.txt"), dest)
+
+    assert is_new and not again_new
+    assert again == path and again_hash == content_hash
+    assert sorted(os.listdir(dest)) == sorted([os.path.basename(path), "manifest.json", "manifest.json.lock"])
+    manifest = load_manifest(dest)
+    assert manifest["names"] == {"a.txt": content_hash, "b.txt": content_hash}
+    assert manifest["files"][content_hash]["names"] == ["a.txt", "b.txt"]
+
+
+def test_processed_marker_requires_index(tmp_path):
+    dest = str(tmp_path / "uploads")
+    persist_dir = tmp_path / "vs"
+    _, content_hash, _ = store_uploaded_file(FakeUpload(b"doc", "doc.txt"), dest)
+    assert not is_upload_processed(content_hash, str(persist_dir), dest)
+
+    persist_dir.mkdir()
+    (persist_dir / "index.faiss").write_bytes(b"")
+    mark_upload_processed(content_hash, str(persist_dir), dest)
+    assert is_upload_processed(content_hash, str(persist_dir), dest)
+
+
+def _write_pdf(path, page_texts):
+    """Write a minimal text-only PDF with one page per string"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(out)
+
+
+def test_parallel_pdf_pages_keep_order(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    _write_pdf(pdf_path, [f"Text of page {i}" for i in range(1, 8)])
+
+    serial = list(iter_pdf_pages(str(pdf_path), workers=1))
+    parallel = list(iter_pdf_pages(str(pdf_path), workers=2, pages_per_task=2))
+
+    assert parallel == serial
+    assert [n for n, _ in parallel] == list(range(1, 8))
+    assert parallel[2][1] == "Text of page 3"
+    text = extract_text_from_pdf(str(pdf_path))
+    assert text.index("[Page 2]") < text.index("[Page 7]")
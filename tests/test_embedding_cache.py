@@ -0,0 +1,35 @@
+# tests/test_embedding_cache.py
+import numpy as np
+
+from backend.embedding_cache import EmbeddingCache, embed_with_cache
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(t), t.count("a")] for t in texts], dtype=np.float32)
+
+
+def test_only_misses_are_encoded_and_persisted(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    encode = FakeEncoder()
+    cache = EmbeddingCache(path)
+    first = embed_with_cache(cache, "m", ["aa", "b", "aa"], encode)
+    assert encode.batches == [["aa", "b"]]
+    assert first.dtype == np.float32 and first.shape == (3, 2)
+    assert cache.stats() == {"hits": 0, "misses": 3}
+    cache.close()
+
+    # A new process reuses the stored vectors and encodes only the new chunk
+    cache = EmbeddingCache(path)
+    second = embed_with_cache(cache, "m", ["b", "aa", "new"], encode)
+    assert encode.batches[-1] == ["new"]
+    assert np.array_equal(second[:2], first[[1, 0]])
+    assert cache.stats() == {"hits": 2, "misses": 1}
+
+    # Vectors are keyed by model name as well
+    embed_with_cache(cache, "other-model", ["b"], encode)
+    assert encode.batches[-1] == ["b"]
@@ -0,0 +1,31 @@
+# tests/test_index_catalog.py
+import multiprocessing
+
+from backend.index_catalog import get_document, list_documents, register_document, unregister_document
+
+
+def test_catalog_is_shared_and_filters_by_session(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    register_document("d1", "one.pdf", "indexes/d1", session_id="s1", path=path)
+    register_document("d2", "two.pdf", "indexes/d2", session_id="s2", path=path)
+    register_document("d1", "one.pdf", "indexes/d1", session_id="s2", path=path)
+
+    assert {doc_id for doc_id, _ in list_documents(path=path)} == {"d1", "d2"}
+    assert [doc_id for doc_id, _ in list_documents("s1", path=path)] == ["d1"]
+    assert get_document("d1", path=path)["sessions"] == ["s1", "s2"]
+
+    unregister_document("d1", path=path)
+    assert get_document("d1", path=path) is None
+
+
+def _register_many(args):
+    path, worker = args
+    for i in range(20):
+        register_document(f"w{worker}-{i}", "doc.pdf", "indexes/doc", session_id="s", path=path)
+
+
+def test_concurrent_processes_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.map(_register_many, [(path, worker) for worker in range(4)])
+    assert len(list_documents(path=path)) == 80
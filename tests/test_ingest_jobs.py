@@ -0,0 +1,107 @@
+# tests/test_ingest_jobs.py
+import io
+import os
+import time
+
+from backend import rag_pipeline
+from backend.document_loader import is_upload_processed, store_uploaded_file
+from backend.index_catalog import get_document, namespace_dir
+from backend.ingest_jobs import (
+    DONE, EMBEDDING, EXTRACTING, FAILED, INDEXING, QUEUED, IngestQueue, JobStore, run_job, run_summaries,
+)
+from backend.llm_backend import FakeBackend, set_llm_backend
+from backend.summarizer import load_summaries
+
+
+class FakeUpload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def test_job_store_tracks_state_and_reuses_active_jobs(tmp_path):
+    jobs = JobStore(str(tmp_path / "jobs.sqlite"))
+    job, created = jobs.create("doc", "a.pdf", "uploads/doc.pdf", session_id="s1")
+    assert created and job["state"] == QUEUED and job["progress"] == 0
+
+    # A second upload of the same document joins the queued job
+    again, created = jobs.create("doc", "copy.pdf", "uploads/doc.pdf", session_id="s2")
+    assert not created and again["id"] == job["id"]
+
+    jobs.update(job["id"], EMBEDDING)
+    jobs.update(job["id"], progress=42)
+    assert (jobs.get(job["id"])["state"], jobs.get(job["id"])["progress"]) == (EMBEDDING, 42)
+    # Other processes see the same table
+    assert JobStore(jobs.path).get(job["id"])["progress"] == 42
+
+    jobs.update(job["id"], FAILED, error="boom")
+    assert jobs.jobs(active_only=True) == []
+    retry, created = jobs.create("doc", "a.pdf", "uploads/doc.pdf", session_id="s1")
+    assert created and retry["id"] != job["id"]
+    assert [j["id"] for j in jobs.jobs(session_id="s1")] == [retry["id"], job["id"]]
+
+
+def test_run_job_indexes_upload(tmp_path, monkeypatch, embeddings):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rag_pipeline, "get_embeddings", lambda: embeddings)
+    llm = FakeBackend(reply="summary")
+    set_llm_backend(llm)
+    try:
+        path, content_hash, _ = store_uploaded_file(FakeUpload(b"zebras run fast. apples are red.", "notes.txt"))
+        jobs = JobStore()
+        job, _ = jobs.create(content_hash, "notes.txt", path, session_id="s1")
+
+        states = []
+        update = JobStore.update
+
+        def record(self, job_id, state=None, **kwargs):
+            states.append(state)
+            update(self, job_id, state, **kwargs)
+
+        monkeypatch.setattr(JobStore, "update", record)
+        run_job(job["id"])
+
+        assert [s for s in states if s] == [EXTRACTING, EMBEDDING, INDEXING, DONE]
+        assert (jobs.get(job["id"])["state"], jobs.get(job["id"])["progress"]) == (DONE, 100)
+        assert is_upload_processed(content_hash, namespace_dir(content_hash))
+        assert get_document(content_hash)["sessions"] == ["s1"]
+
+        # Summaries are a follow-up job: the upload was done without any LLM call
+        assert llm.calls == 0 and load_summaries(namespace_dir(content_hash)) is None
+        run_summaries(content_hash)
+        assert load_summaries(namespace_dir(content_hash))["summaries"]["Key Points"] == "summary"
+    finally:
+        set_llm_backend(None)
+
+
+def test_run_job_records_failure(tmp_path):
+    jobs = JobStore(str(tmp_path / "jobs.sqlite"))
+    job, _ = jobs.create("doc", "gone.txt", str(tmp_path / "gone.txt"))
+    run_job(job["id"], jobs.path)
+    failed = jobs.get(job["id"])
+    assert failed["state"] == FAILED and "gone.txt" in failed["error"]
+
+
+def _wait_until_finished(jobs, job_id, timeout=120):
+    deadline = time.time() + timeout
+    while jobs.get(job_id)["state"] not in (DONE, FAILED):
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.1)
+    return jobs.get(job_id)
+
+
+def test_queue_survives_a_worker_process_dying(tmp_path):
+    queue = IngestQueue(str(tmp_path / "jobs.sqlite"), workers=1)
+    try:
+        # A worker that exits mid-task (as on OOM) takes down the job queued behind it
+        crash = queue._pool.submit(os._exit, 1)
+        lost = queue.submit("lost", "lost.txt", str(tmp_path / "lost.txt"))
+        assert _wait_until_finished(queue.jobs, lost["id"])["error"] == "worker process died"
+        assert crash.exception() is not None
+
+        # Later uploads run in a new pool
+        job = queue.submit("next", "next.txt", str(tmp_path / "next.txt"))
+        failed = _wait_until_finished(queue.jobs, job["id"])
+        assert failed["state"] == FAILED and "next.txt" in failed["error"]
+    finally:
+        queue.shutdown()
@@ -0,0 +1,57 @@
+# tests/test_lexical_index.py
+import numpy as np
+
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+TEXTS = [
+    "Gradient descent minimizes the loss function step by step.",
+    "The F1-score is the harmonic mean of precision and recall.",
+    "Precision and recall trade off against each other.",
+    "Euler's number e is about 2.718 and appears in compound interest.",
+]
+
+
+def test_tokenize_keeps_compound_terms():
+    tokens = tokenize("The F1-score is 2.718")
+    assert "f1-score" in tokens and "f1" in tokens and "score" in tokens
+    assert "2.718" in tokens and "718" in tokens
+
+
+def test_bm25_ranks_exact_terms_first():
+    index = BM25Index.build(["a", "b", "c", "d"], TEXTS)
+
+    hits = index.search("what is the f1-score", k=4)
+    assert hits[0][0] == "b"
+    assert index.search("2.718", k=2)[0][0] == "d"
+    # Chunks sharing no term with the query are not returned
+    assert index.search("zebra", k=4) == []
+
+
+def test_bm25_batch_matches_single_queries():
+    index = BM25Index.build(["a", "b", "c", "d"], TEXTS)
+    queries = ["precision recall", "loss function", "interest"]
+    assert index.search_batch(queries, k=3) == [index.search(q, k=3) for q in queries]
+
+
+def test_bm25_save_load_round_trip(tmp_path):
+    index = BM25Index.build(["a", "b", "c", "d"], TEXTS)
+    path = tmp_path / "lexical.npz"
+    with open(path, "wb") as f:
+        index.save(f)
+
+    loaded = BM25Index.load(str(path))
+    assert loaded.ids == index.ids
+    np.testing.assert_allclose(loaded.scores(["precision"]), index.scores(["precision"]))
+
+
+def test_bm25_empty_index():
+    index = BM25Index.build(["a"], ["..."])
+    assert index.search("anything") == []
+
+
+def test_reciprocal_rank_fusion():
+    dense = ["x", "y", "z"]
+    lexical = ["z", "w"]
+    # z is ranked by both lists and wins; x beats w on rank
+    assert reciprocal_rank_fusion([dense, lexical], k=3) == ["z", "x", "y"]
@@ -0,0 +1,31 @@
+# tests/test_llm_backend.py
+import asyncio
+import time
+
+from backend.llm_backend import FakeBackend, GeminiBackend
+
+
+def test_fake_backend_is_deterministic():
+    llm = FakeBackend(chunk_size=4)
+    prompt = "Context:\nSupervised learning uses labels.\n\nQuestion: what?"
+    answer = llm.generate(prompt)
+    assert answer == llm.generate(prompt)
+    assert "labels" in answer
+    assert "".join(llm.stream(prompt)) == answer
+    assert asyncio.run(llm.agenerate(prompt)) == answer
+    assert llm.calls == 4
+
+
+def test_fake_backend_latency():
+    llm = FakeBackend(reply="abcdef", first_token_latency=0.05, token_latency=0.01, chunk_size=2)
+    start = time.perf_counter()
+    chunks = llm.stream("q")
+    assert next(chunks) == "ab"
+    assert time.perf_counter() - start >= 0.05
+    assert list(chunks) == ["cd", "ef"]
+    assert time.perf_counter() - start >= 0.07
+
+
+def test_model_id_names_backend_and_model():
+    assert FakeBackend().model_id == "fake"
+    assert GeminiBackend("models/gemini-x", api_key="key").model_id == "gemini:models/gemini-x"
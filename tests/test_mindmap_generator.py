@@ -0,0 +1,122 @@
+# tests/test_mindmap_generator.py
+import json
+import threading
+import time
+
+from backend.llm_backend import FakeBackend
+from backend.mindmap_generator import (
+    THEME_PROMPT,
+    build_mindmap,
+    cached_mindmap,
+    generate_mindmap_outline,
+    limit_outline,
+    merge_topics,
+)
+
+
+def section_reply(prompt):
+    """Fake LLM: one subtree per section, topic from the section's first word; themes 'Part <first topic>'"""
+    if prompt.startswith(THEME_PROMPT.split("{")[0]):
+        return "Part " + prompt.split("- ", 1)[1].split()[0]
+    text = prompt.split("Document:", 1)[1].split()
+    return "```json\n" + json.dumps({
+        "topic": text[0].capitalize(),
+        "children": [{"topic": "Details of " + text[0], "children": [{"topic": w, "children": []} for w in text[1:3]]}],
+    }) + "\n```"
+
+
+def topics(node):
+    return [node["topic"]] + [t for child in node["children"] for t in topics(child)]
+
+
+def test_merge_topics_dedupes_siblings():
+    nodes = [
+        {"topic": "1. Introduction", "children": [{"topic": "Scope", "children": []}]},
+        {"topic": "Methods", "children": [{"topic": "methods", "children": [{"topic": "Survey", "children": []}]}]},
+        {"topic": "introduction:", "children": [{"topic": "scope", "children": []}, {"topic": "Goals", "children": []}]},
+    ]
+    merged = merge_topics(nodes)
+    assert [n["topic"] for n in merged] == ["1. Introduction", "Methods"]
+    assert [c["topic"] for c in merged[0]["children"]] == ["Scope", "Goals"]
+    # A child repeating its parent's topic is folded into the parent
+    assert [c["topic"] for c in merged[1]["children"]] == ["Survey"]
+
+
+def test_limit_outline_depth_and_breadth():
+    leaf = lambda t: {"topic": t, "children": []}
+    tree = {"topic": "root", "children": [
+        leaf("a"), {"topic": "b", "children": [leaf("b1"), leaf("b2")]}, leaf("c"),
+        {"topic": "d", "children": [{"topic": "d1", "children": [leaf("deep")]}]},
+    ]}
+    limited = limit_outline(tree, max_depth=3, max_children=2)
+    assert [c["topic"] for c in limited["children"]] == ["b", "d"]
+    assert "deep" not in topics(limited)
+
+
+def test_build_mindmap_covers_whole_document_with_bounded_concurrency():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def reply(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return section_reply(prompt)
+
+    llm = FakeBackend(reply=reply)
+    # 20 sections; "alpha" opens two of them and is merged into one topic
+    chunks = [f"{word} first second" for word in ["alpha"] + [f"topic{i}" for i in range(18)] + ["alpha"]]
+    outline = build_mindmap(chunks, llm, max_chars=10, workers=3, max_depth=5, max_children=4)
+
+    assert peak[0] <= 3
+    names = topics(outline)
+    assert names.count("Alpha") == 1
+    assert "Topic17" in names  # sections far past the old 4000-character cut are included
+    assert len(outline["children"]) <= 4
+
+
+def test_cached_mindmap_builds_once_per_mode(tmp_path):
+    llm = FakeBackend(reply=section_reply)
+    chunks = ["alpha one two", "beta three four"]
+    first = cached_mindmap(str(tmp_path), chunks, "overview", llm, max_chars=20)
+    calls = llm.calls
+    assert cached_mindmap(str(tmp_path), chunks, "overview", llm, max_chars=20) == first
+    assert llm.calls == calls
+
+    cached_mindmap(str(tmp_path), chunks, "study", llm, max_chars=20)
+    assert llm.calls > calls
+    calls = llm.calls
+    cached_mindmap(str(tmp_path), chunks + ["gamma five six"], "overview", llm, max_chars=20)
+    assert llm.calls > calls
+
+
+def test_generate_mindmap_outline_falls_back_on_unparseable_replies():
+    outline = generate_mindmap_outline("some text", llm=FakeBackend(reply="not json"))
+    assert outline["topic"] == "Document"
+
+
+def test_build_mindmap_streams_partial_trees_and_keeps_cut_off_replies():
+    reply = json.dumps({"topic": "Main", "children": [{"topic": f"Point {i}", "children": []} for i in range(6)]})
+    progress = []
+    llm = FakeBackend(reply="```json\n" + reply, token_latency=0.01, chunk_size=8)
+    outline = build_mindmap(["only section"], llm, on_progress=progress.append, progress_interval=0.05)
+    assert outline["topic"] == "Main" and len(outline["children"]) == 6
+    assert progress and len(progress[0]["children"]) < 6
+
+    class DroppedStream(FakeBackend):
+        def stream(self, prompt):
+            yield reply[:len(reply) // 2]
+            raise ConnectionError("stream dropped")
+
+    llm = DroppedStream()
+    outline = build_mindmap(["only section"], llm)
+    assert outline["topic"] == "Main" and 0 < len(outline["children"]) < 6
+
+
+def test_build_mindmap_retries_replies_without_an_outline():
+    replies = iter(["Sorry, try again.", '{"topic": "Second try", "children": []}'])
+    outline = build_mindmap(["only section"], FakeBackend(reply=lambda prompt: next(replies)))
+    assert outline["topic"] == "Second try"
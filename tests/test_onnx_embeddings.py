@@ -0,0 +1,97 @@
+# tests/test_onnx_embeddings.py
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from backend.onnx_embeddings import ONNX_CONFIG_FILE, OnnxEncoder, export_onnx_model
+
+TEXTS = [
+    "short",
+    "a somewhat longer sentence about cats and dogs",
+    "the quick brown fox jumps over the lazy dog again and again and again",
+    "",
+    "rockets need fuel",
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling, Transformer
+
+    path = str(tmp_path_factory.mktemp("tiny"))
+    letters = list("abcdefghijklmnopqrstuvwxyz")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + letters + ["##" + c for c in letters]
+    with open(os.path.join(path, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=4,
+                         intermediate_size=128)).save_pretrained(path)
+    model = SentenceTransformer(modules=[Transformer(path, max_seq_length=32), Pooling(64), Normalize()], device="cpu")
+    model.save(path)
+    out_dir = str(tmp_path_factory.mktemp("onnx"))
+    export_onnx_model(path, out_dir)
+    return model, out_dir
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")  # deprecated sentence-transformers calls in the export
+def test_export_writes_config(tiny_model):
+    _, out_dir = tiny_model
+    with open(os.path.join(out_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+        config = json.load(f)
+    assert config["dim"] == 64 and config["pooling"] == "mean" and config["normalize"]
+    assert config["max_seq_length"] == 32
+    assert os.listdir(out_dir).count("model.int8.onnx") == 1
+
+
+def test_onnx_vectors_match_torch(tiny_model):
+    model, out_dir = tiny_model
+    expected = model.encode(TEXTS, convert_to_numpy=True)
+
+    # fp32 export: same vectors; batching by length keeps the input order
+    fp32 = OnnxEncoder(out_dir, quantized=False).encode(TEXTS, batch_size=2)
+    assert fp32.shape == (len(TEXTS), 64) and fp32.dtype == np.float32
+    np.testing.assert_allclose(fp32, expected, atol=1e-4)
+
+    # int8: within the documented tolerance (cosine >= 0.99 to the torch vectors)
+    int8 = OnnxEncoder(out_dir).encode(TEXTS, batch_size=2)
+    assert (int8 * expected).sum(axis=1).min() >= 0.99
+
+    # SentenceTransformer.encode() options that do not apply are ignored
+    again = OnnxEncoder(out_dir).encode(TEXTS, batch_size=2, pool=None, show_progress_bar=False)
+    np.testing.assert_array_equal(again, int8)
+
+
+def test_missing_model_file(tiny_model, tmp_path):
+    _, out_dir = tiny_model
+    os.makedirs(tmp_path / "partial")
+    for name in (ONNX_CONFIG_FILE, "tokenizer.json"):
+        with open(os.path.join(out_dir, name), "rb") as src, open(tmp_path / "partial" / name, "wb") as dst:
+            dst.write(src.read())
+    with pytest.raises(FileNotFoundError):
+        OnnxEncoder(str(tmp_path / "partial"))
+
+
+def test_local_embeddings_run_on_the_onnx_encoder(tiny_model, monkeypatch, fresh_embeddings):
+    from backend.rag_pipeline import get_embeddings
+
+    _, out_dir = tiny_model
+    monkeypatch.setenv("EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setenv("EMBEDDING_ONNX_DIR", out_dir)
+    monkeypatch.setenv("EMBED_WORKERS", "4")
+    monkeypatch.setenv("EMBED_BATCH_SIZE", "2")
+    embeddings = get_embeddings()
+    assert embeddings.backend == "onnx" and embeddings.embedder_info["dim"] == 64
+
+    # Worker processes are a torch-only option: a large batch still runs in-process
+    expected = OnnxEncoder(out_dir).encode(TEXTS, batch_size=2)
+    np.testing.assert_allclose(embeddings.embed_documents_array(TEXTS), expected, atol=1e-5)
+    # int8 activations are quantized per batch: a query encoded alone differs slightly
+    np.testing.assert_allclose(embeddings.embed_query(TEXTS[1]), expected[1], atol=1e-3)
+    assert embeddings._pool is None
@@ -0,0 +1,48 @@
+# tests/test_outline_parser.py
+import json
+import os
+
+import pytest
+
+from backend.outline_parser import OutlineParser
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "malformed_outlines.json"), encoding="utf-8") as f:
+    CASES = json.load(f)
+
+
+def parse(response, chunk_size=None):
+    parser = OutlineParser()
+    chunk_size = chunk_size or max(len(response), 1)
+    for i in range(0, len(response), chunk_size):
+        parser.feed(response[i:i + chunk_size])
+    return parser.close()
+
+
+def preorder(node):
+    return [node["topic"]] + [t for child in node["children"] for t in preorder(child)]
+
+
+@pytest.mark.parametrize("case", CASES, ids=[c["name"] for c in CASES])
+@pytest.mark.parametrize("chunk_size", [None, 1, 7])
+def test_fixture_corpus(case, chunk_size):
+    if case["outline"] is None:
+        with pytest.raises(ValueError):
+            parse(case["response"], chunk_size)
+    else:
+        assert parse(case["response"], chunk_size) == case["outline"]
+
+
+def test_partial_outlines_grow_towards_the_final_tree():
+    response = next(c for c in CASES if c["name"] == "clean")["response"]
+    final = preorder(parse(response))
+    parser, seen = OutlineParser(), []
+    for ch in response:
+        parser.feed(ch)
+        partial = parser.outline()
+        if partial:
+            topics = preorder(partial)
+            # Only complete strings appear, in order, and nothing is taken back
+            assert topics == final[:len(topics)]
+            assert len(topics) >= len(seen)
+            seen = topics
+    assert seen == final
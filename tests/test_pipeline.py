@@ -1,5 +1,28 @@
 # tests/test_pipeline.py
-from backend.rag_pipeline import build_and_persist_vectorstore, load_vectorstore_and_qa
+import sys
+import time
+import types
+import asyncio
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from backend.lexical_index import BM25Index
+from backend.llm_backend import FakeBackend, set_llm_backend
+from backend.rag_pipeline import (
+    INDEX_FILES,
+    DirectGeminiQA,
+    HybridRetriever,
+    IndexRegistry,
+    MultiIndexRetriever,
+    QAWrapper,
+    answer_batch,
+    build_and_persist_vectorstore,
+    get_embeddings,
+    load_vectorstore_and_qa,
+    precompute_summaries,
+)
 
 
 def test_basic_rag(tmp_path):
@@ -9,3 +32,280 @@ def test_basic_rag(tmp_path):
     qa = load_vectorstore_and_qa(persist_dir=persist_dir)
     answer = qa.run("What is supervised learning?")
     assert "labels" in answer.lower()
+
+
+@pytest.mark.live
+def test_basic_rag_live(tmp_path):
+    # Same as test_basic_rag against Gemini and MiniLM (needs GEMINI_API_KEY)
+    test_basic_rag(tmp_path)
+
+
+def _write_fake_index(persist_dir, payload=b"x"):
+    persist_dir.mkdir(exist_ok=True)
+    for name in INDEX_FILES:
+        (persist_dir / name).write_bytes(payload)
+
+
+def test_index_registry_reuses_until_index_changes(tmp_path):
+    persist_dir = tmp_path / "vs"
+    _write_fake_index(persist_dir)
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        return object()
+
+    registry = IndexRegistry()
+    first = registry.get(str(persist_dir), loader)
+    assert registry.get(str(persist_dir), loader) is first
+    assert len(loads) == 1
+
+    _write_fake_index(persist_dir, payload=b"changed")
+    assert registry.get(str(persist_dir), loader) is not first
+    assert len(loads) == 2
+
+
+def test_index_registry_evicts_least_recently_used(tmp_path):
+    registry = IndexRegistry(max_entries=2)
+    dirs = [tmp_path / name for name in ("a", "b", "c")]
+    for d in dirs:
+        _write_fake_index(d)
+    a = registry.get(str(dirs[0]), lambda path: object())
+    registry.get(str(dirs[1]), lambda path: object())
+    registry.get(str(dirs[0]), lambda path: object())  # touch a
+    registry.get(str(dirs[2]), lambda path: object())  # evicts b
+    assert len(registry) == 2
+    assert registry.get(str(dirs[0]), lambda path: object()) is a
+    # Load locks only live while a load runs, failed or not
+    with pytest.raises(OSError):
+        registry.get(str(dirs[1]), lambda path: open(path + "/missing"))
+    assert registry._load_locks == {}
+
+    budget = IndexRegistry(max_bytes=len(INDEX_FILES))
+    budget.get(str(dirs[0]), lambda path: object())
+    budget.get(str(dirs[1]), lambda path: object())
+    assert len(budget) == 1
+
+
+class StubSentenceTransformer:
+    """Stands in for SentenceTransformer (>= 5: encode() takes a pool) and records how it encodes"""
+
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def start_multi_process_pool(self, devices):
+        return {"devices": devices}
+
+    def stop_multi_process_pool(self, pool):
+        pass
+
+    def _vectors(self, texts):
+        return np.asarray([[len(t), t.count("a")] for t in texts], dtype=np.float32)
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, pool=None):
+        self.calls.append(("encode", pool is not None))
+        return self._vectors(texts)
+
+
+class LegacySentenceTransformer(StubSentenceTransformer):
+    """sentence-transformers < 5: a pool goes through encode_multi_process"""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        self.calls.append(("encode", False))
+        return self._vectors(texts)
+
+    def encode_multi_process(self, texts, pool, batch_size=32, normalize_embeddings=False):
+        self.calls.append(("encode_multi_process", True))
+        return self._vectors(texts)
+
+
+@pytest.mark.parametrize("model_class, pooled_call", [
+    (StubSentenceTransformer, ("encode", True)),
+    (LegacySentenceTransformer, ("encode_multi_process", True)),
+])
+def test_local_embeddings_uses_the_worker_pool_only_for_large_batches(monkeypatch, fresh_embeddings,
+                                                                       model_class, pooled_call):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=model_class))
+    monkeypatch.setenv("EMBED_WORKERS", "2")
+    monkeypatch.setenv("EMBED_BATCH_SIZE", "2")
+    monkeypatch.setenv("QUERY_BATCH_WINDOW_MS", "0")
+    embeddings = get_embeddings()
+    try:
+        assert embeddings.embed_documents(["a", "aa", "b", "ab"]) == [[1, 1], [2, 2], [1, 0], [2, 1]]
+        assert embeddings.embed_query("banana") == [6, 3]
+        assert embeddings.model.calls == [pooled_call, ("encode", False)]
+    finally:
+        embeddings.stop_pool()
+
+
+class CountingIndex:
+    """Proxy around a faiss index that counts search calls"""
+
+    def __init__(self, index):
+        self.index = index
+        self.search_calls = 0
+
+    def search(self, *args, **kwargs):
+        self.search_calls += 1
+        return self.index.search(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def test_run_with_sources_retrieves_once(embeddings):
+    vs = FAISS.from_texts(["alpha text", "beta text", "gamma text"], embeddings,
+                          metadatas=[{"n": 0}, {"n": 1}, {"n": 2}])
+    vs.index = CountingIndex(vs.index)
+    retriever = vs.as_retriever(search_kwargs={"k": 2})
+    llm = FakeBackend(reply="answer")
+    qa = QAWrapper(DirectGeminiQA(llm, retriever), retriever, vectorstore=vs)
+
+    answer, sources = qa.run_with_sources("alpha")
+
+    assert answer == "answer"
+    assert embeddings.query_calls == 1
+    assert vs.index.search_calls == 1
+    assert llm.calls == 1
+    assert len(sources) == 2
+    assert sources[0]["text"] == "alpha text"
+    assert sources[0]["metadata"] == {"n": 0}
+
+
+def test_multi_index_retriever_merges_top_k(embeddings):
+    first = FAISS.from_texts(["aaaa", "zzzz"], embeddings, metadatas=[{"d": 1}, {"d": 1}])
+    second = FAISS.from_texts(["aaab", "yyyy"], embeddings, metadatas=[{"d": 2}, {"d": 2}])
+    retriever = MultiIndexRetriever([first, second], embeddings, k=2)
+
+    docs = retriever.invoke("aaaa")
+
+    assert [d.page_content for d in docs] == ["aaaa", "aaab"]
+    assert embeddings.query_calls == 1
+
+
+def test_stream_yields_sources_before_tokens(embeddings):
+    vs = FAISS.from_texts(["alpha text", "beta text"], embeddings)
+    retriever = vs.as_retriever(search_kwargs={"k": 1})
+    llm = FakeBackend(reply="Alpha answer", chunk_size=2)
+    qa = QAWrapper(DirectGeminiQA(llm, retriever), retriever)
+
+    sources, chunks = qa.stream("alpha")
+
+    assert sources == [{"text": "alpha text", "metadata": {}}]
+    assert llm.chunks_streamed == 0
+    assert next(chunks) == "Al"
+    assert llm.chunks_streamed == 1
+    assert "".join(chunks) == "pha answer"
+
+
+def test_precompute_summaries_skips_unchanged_chunks(tmp_path):
+    llm = FakeBackend(reply="summary")
+    set_llm_backend(llm)
+    try:
+        data = precompute_summaries(["first chunk", "second chunk"], str(tmp_path))
+        assert data["summaries"]["Key Points"] == "summary"
+        calls = llm.calls
+
+        assert precompute_summaries(["first chunk", "second chunk"], str(tmp_path)) == data
+        assert llm.calls == calls
+        precompute_summaries(["first chunk", "edited chunk"], str(tmp_path))
+        assert llm.calls > calls
+    finally:
+        set_llm_backend(None)
+
+
+class ConcurrencyProbe(FakeBackend):
+    """FakeBackend that records peak concurrency and fails the first attempts of some prompts"""
+
+    def __init__(self, fail_first=(), **kwargs):
+        super().__init__(reply=lambda prompt: prompt.split("Question:")[1].split()[0], **kwargs)
+        self.fail_first = set(fail_first)
+        self.active = 0
+        self.peak = 0
+
+    async def agenerate(self, prompt):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.02)
+            answer = self._reply(prompt)
+            if answer in self.fail_first:
+                self.fail_first.discard(answer)
+                raise RuntimeError("429 rate limited")
+            return answer
+        finally:
+            self.active -= 1
+
+
+def test_answer_batch_is_ordered_batched_and_bounded(embeddings):
+    vs = FAISS.from_texts(["alpha text", "beta text", "gamma text"], embeddings)
+    vs.index = CountingIndex(vs.index)
+    retriever = vs.as_retriever(search_kwargs={"k": 2})
+    llm = ConcurrencyProbe(fail_first={"q3"})
+    qa = QAWrapper(DirectGeminiQA(llm, retriever), retriever, vectorstore=vs)
+    questions = [f"q{i}" for i in range(10)]
+
+    results = list(answer_batch(questions, concurrency=3, qa=qa, backoff=0.01))
+
+    assert [r["question"] for r in results] == questions
+    assert [r["answer"] for r in results] == questions
+    assert all(len(r["sources"]) == 2 for r in results)
+    assert embeddings.batch_calls == 1 and embeddings.query_calls == 0
+    assert vs.index.search_calls == 1
+    assert llm.peak == 3
+
+
+def test_answer_batch_reports_exhausted_retries(embeddings):
+    vs = FAISS.from_texts(["alpha text"], embeddings)
+    retriever = vs.as_retriever(search_kwargs={"k": 1})
+    llm = ConcurrencyProbe(fail_first={"q1"})
+    qa = QAWrapper(DirectGeminiQA(llm, retriever), retriever, vectorstore=vs)
+
+    results = list(answer_batch(["q0", "q1"], qa=qa, max_retries=0, backoff=0.01))
+
+    assert results[0]["answer"] == "q0"
+    assert "429" in results[1]["error"]
+
+
+def test_answer_batch_rate_limit(embeddings):
+    vs = FAISS.from_texts(["alpha text"], embeddings)
+    retriever = vs.as_retriever(search_kwargs={"k": 1})
+    qa = QAWrapper(DirectGeminiQA(ConcurrencyProbe(), retriever), retriever, vectorstore=vs)
+
+    start = time.perf_counter()
+    list(answer_batch(["q0", "q1", "q2"], concurrency=3, qa=qa, requests_per_minute=1200))
+    # 1200 rpm spaces starts 50 ms apart
+    assert time.perf_counter() - start >= 0.1
+
+
+def test_hybrid_retriever_surfaces_exact_terms(embeddings):
+    texts = ["aaaa bbbb", "aaab bbbb", "aaba bbbb", "zq17 xylophone"]
+    vs = FAISS.from_texts(texts, embeddings, metadatas=[{"doc_id": "d", "chunk": i} for i in range(4)])
+    lexical = BM25Index.build(list(vs.index_to_docstore_id.values()), texts)
+    retriever = HybridRetriever([vs], [lexical], embeddings, k=2, candidates=4)
+
+    # Dense alone ranks the letter-heavy chunks first; BM25 finds the exact term
+    docs = retriever.invoke("aaaa zq17")
+    assert [d.page_content for d in docs] == ["aaaa bbbb", "zq17 xylophone"]
+    assert embeddings.query_calls == 1
+
+    batch = retriever.invoke_batch_by_vectors(np.asarray([embeddings._vector("aaaa zq17")]), ["aaaa zq17"])
+    assert batch == [docs]
+
+
+def test_hybrid_retriever_merges_bm25_by_rank_across_indexes(embeddings):
+    corpora = {"a": ["alpha one", "alpha two", "gamma", "delta", "epsilon", "zeta"], "b": ["beta x", "beta y"]}
+    vectorstores, lexical = [], []
+    for doc_id, texts in corpora.items():
+        vs = FAISS.from_texts(texts, embeddings, metadatas=[{"doc_id": doc_id, "chunk": i} for i in range(len(texts))])
+        vectorstores.append(vs)
+        lexical.append(BM25Index.build(list(vs.index_to_docstore_id.values()), texts))
+    retriever = HybridRetriever(vectorstores, lexical, embeddings)
+    assert retriever.dense.k == 20
+
+    # "beta" is in every chunk of b, so its BM25 scores are far below a's for "alpha"
+    ranked, = retriever.lexical_batch(["alpha beta"])
+    assert [d.page_content for d in ranked] == ["alpha one", "beta x", "alpha two", "beta y"]
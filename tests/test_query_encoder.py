@@ -0,0 +1,112 @@
+# tests/test_query_encoder.py
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.query_encoder import MicroBatcher, QueryEncoder
+
+
+class SlowEncoder:
+    """Encoder stand-in that records its calls; each call takes delay seconds"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return np.asarray([[len(t), t.count("a")] for t in texts], dtype=np.float32)
+
+
+def run_concurrently(fn, items):
+    results = [None] * len(items)
+    barrier = threading.Barrier(len(items))
+
+    def worker(i):
+        barrier.wait()
+        results[i] = fn(items[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_micro_batcher_coalesces_concurrent_calls():
+    calls = []
+
+    def double(items):
+        calls.append(items)
+        time.sleep(0.05)
+        return [2 * i for i in items]
+
+    batcher = MicroBatcher(double, window=0.2)
+    assert run_concurrently(batcher.submit, list(range(8))) == [2 * i for i in range(8)]
+    assert len(calls) < 8 and sum(len(c) for c in calls) == 8
+
+    # An idle batcher does not wait for company
+    start = time.perf_counter()
+    assert batcher.submit(5) == 10
+    assert time.perf_counter() - start < 0.15
+
+    # While a batch runs, a full batch does not wait out the window
+    def slow_on_zero(items):
+        time.sleep(0.5 if 0 in items else 0)
+        return [2 * i for i in items]
+
+    batcher = MicroBatcher(slow_on_zero, window=10, max_batch=4)
+    running = threading.Thread(target=batcher.submit, args=(0,))
+    running.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    assert sorted(run_concurrently(batcher.submit, [1, 2, 3, 4])) == [2, 4, 6, 8]
+    assert time.perf_counter() - start < 5
+    running.join()
+    assert batcher.batches == 2
+
+
+def test_micro_batcher_propagates_errors():
+    def fail(items):
+        raise RuntimeError("encoder down")
+
+    batcher = MicroBatcher(fail, window=0.05)
+    with pytest.raises(RuntimeError, match="encoder down"):
+        batcher.submit("query")
+
+
+def test_query_encoder_batches_concurrent_misses():
+    encoder = SlowEncoder(delay=0.05)
+    queries = QueryEncoder(encoder, window=0.1)
+    vectors = run_concurrently(queries.embed, ["alpha", "banana", "cab", "alpha"])
+    assert [v.tolist() for v in vectors] == [[5, 2], [6, 3], [3, 1], [5, 2]]
+    assert len(encoder.calls) < 4
+    assert all(len(set(call)) == len(call) for call in encoder.calls)
+
+
+def test_query_encoder_lru():
+    encoder = SlowEncoder()
+    queries = QueryEncoder(encoder, max_entries=2, window=0)
+    for text in ["a", "b", "a", "c"]:  # "c" evicts "b", the least recently used
+        queries.embed(text)
+    assert encoder.calls == [["a"], ["b"], ["c"]]
+    queries.embed("a")
+    queries.embed("b")
+    assert encoder.calls[-1] == ["b"] and len(encoder.calls) == 4
+
+    # Batches encode only their misses, in one call
+    assert queries.embed_many(["a", "b", "x", "y", "x"]).shape == (5, 2)
+    assert encoder.calls[-1] == ["x", "y"]
+
+
+def test_query_encoder_without_window_encodes_inline():
+    encoder = SlowEncoder()
+    queries = QueryEncoder(encoder, window=0)
+    assert queries.embed("abc").tolist() == [3, 1]
+    assert queries.embed("abc").tolist() == [3, 1]
+    assert encoder.calls == [["abc"]]
+    assert queries.stats() == {"hits": 1, "misses": 1, "entries": 1, "batches": 0, "batched_queries": 0}
@@ -0,0 +1,81 @@
+# tests/test_sparse_embeddings.py
+import os
+
+import pytest
+from langchain.embeddings.base import Embeddings
+
+from backend.sparse_embeddings import SPARSE_INDEX_FILE, SparseIndex, TfidfEmbeddings
+from backend.vectorstore_handler import IncrementalVectorStore, open_vectorstore
+
+DOCS = {
+    "cats": "Cats purr and chase mice. A cat sleeps most of the day.",
+    "rockets": "Rockets burn fuel to reach orbit. The rocket engine needs oxygen.",
+    "bread": "Bread dough rises with yeast before baking in a hot oven.",
+}
+
+
+class TinyEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+def build(persist_dir, embeddings):
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=80, chunk_overlap=0)
+    for doc_id, text in DOCS.items():
+        store.add_document(doc_id, text)
+    store.save()
+    return store
+
+
+def test_sparse_index_search_subset_and_remove():
+    embeddings = TfidfEmbeddings(n_features=256)
+    index = SparseIndex(256)
+    index.add_with_ids(embeddings.embed_documents_array(list(DOCS.values())), [10, 11, 12])
+    query = embeddings.embed_queries_array(["rocket fuel"])
+    distances, ids = index.search(query, 2)
+    assert ids[0][0] == 11 and distances[0][0] < distances[0][1]
+
+    # Restricted to other rows; k beyond the candidates is padded with -1
+    assert index.search(query, 3, subset=[10, 12])[1][0][-1] == -1
+    assert index.remove_ids([11]) == 1
+    assert 11 not in index.search(query, 3)[1][0]
+
+
+def test_tfidf_store_survives_restart(tmp_path):
+    persist_dir = str(tmp_path / "vs")
+    build(persist_dir, TfidfEmbeddings())
+    assert os.path.exists(os.path.join(persist_dir, SPARSE_INDEX_FILE))
+    assert not os.path.exists(os.path.join(persist_dir, "index.faiss"))
+
+    # A fresh embedder (as after a restart) queries the saved index in the same space
+    embeddings = TfidfEmbeddings()
+    vs = open_vectorstore(persist_dir, embeddings)
+    assert vs.similarity_search("why do cats purr", k=1)[0].metadata["doc_id"] == "cats"
+
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=80, chunk_overlap=0)
+    hits = store.search("yeast in the oven", k=2, doc_ids=["bread", "cats"])
+    assert [doc.metadata["doc_id"] for doc, _ in hits][0] == "bread"
+    store.add_document("tea", "Green tea leaves steep in hot water.")
+    store.remove_document("rockets")
+    store.save()
+    vs = open_vectorstore(persist_dir, TfidfEmbeddings())
+    assert vs.similarity_search("steep tea", k=1)[0].metadata["doc_id"] == "tea"
+    assert vs.index.ntotal == len(store.select_chunk_ids())
+
+
+def test_mismatched_embedder_is_rejected(tmp_path):
+    persist_dir = str(tmp_path / "vs")
+    build(persist_dir, TfidfEmbeddings(n_features=1024))
+    with pytest.raises(ValueError, match="dimension"):
+        open_vectorstore(persist_dir, TfidfEmbeddings(n_features=2048))
+    with pytest.raises(ValueError, match="built with tfidf-hashing"):
+        IncrementalVectorStore(persist_dir, TinyEmbeddings())
+
+    dense_dir = str(tmp_path / "dense")
+    build(dense_dir, TinyEmbeddings())
+    with pytest.raises(ValueError):
+        open_vectorstore(dense_dir, TfidfEmbeddings())
+    assert open_vectorstore(dense_dir, TinyEmbeddings()).index.d == 2
@@ -0,0 +1,73 @@
+# tests/test_summarizer.py
+from backend.llm_backend import FakeBackend
+from backend.summarizer import (
+    MAP_PROMPT,
+    SUMMARY_PROMPTS,
+    chunks_fingerprint,
+    group_texts,
+    load_summaries,
+    save_summaries,
+    summaries_complete,
+    summarize_document,
+)
+
+
+def fake_reply(prompt):
+    # Short, prompt-dependent replies so the reduce loop terminates
+    kind = "map" if prompt.startswith(MAP_PROMPT.split("{text}")[0]) else "other"
+    return f"{kind}:{len(prompt)}"
+
+
+def test_group_texts_packs_consecutive_texts():
+    assert group_texts(["aaaa", "bbbb", "cc", "d" * 20], 10) == ["aaaa\n\nbbbb\n\ncc", "d" * 20]
+
+
+def test_summarize_document_map_reduce():
+    llm = FakeBackend(reply=fake_reply)
+    chunks = [f"chunk {i} " + "x" * 90 for i in range(40)]
+    data = summarize_document(chunks, llm, max_chars=400, workers=2)
+
+    # 40 chunks of ~100 chars -> several map summaries, then the views
+    assert len(data["levels"][0]) > 1
+    assert all(s.startswith("map:") for s in data["levels"][0])
+    assert set(data["summaries"]) == set(SUMMARY_PROMPTS)
+    assert llm.calls == sum(len(level) for level in data["levels"]) + len(SUMMARY_PROMPTS)
+
+
+def test_summarize_document_reduces_until_it_fits():
+    llm = FakeBackend(reply=lambda prompt: "s" * 60)
+    data = summarize_document(["x" * 100] * 20, llm, max_chars=150, workers=2)
+    assert len(data["levels"]) > 1
+    assert sum(len(s) for s in data["levels"][-1]) <= 150 or len(data["levels"][-1]) == 1
+
+
+def test_summaries_round_trip(tmp_path):
+    assert load_summaries(str(tmp_path)) is None
+    data = {"fingerprint": chunks_fingerprint(["a", "b"]), "levels": [["s"]], "summaries": {"Key Points": "k"}}
+    save_summaries(str(tmp_path), data)
+    assert load_summaries(str(tmp_path)) == data
+    assert chunks_fingerprint(["a", "b"]) != chunks_fingerprint(["ab"])
+
+
+def test_summarize_document_retries_and_keeps_sections_that_succeeded():
+    attempts = {}
+
+    def flaky(prompt):
+        # "chunk 1" always fails, other prompts fail once before succeeding
+        attempts[prompt] = attempts.get(prompt, 0) + 1
+        if "chunk 1 " in prompt or attempts[prompt] == 1:
+            raise RuntimeError("429 Too Many Requests")
+        return fake_reply(prompt)
+
+    chunks = [f"chunk {i} " + "x" * 90 for i in range(4)]
+    data = summarize_document(chunks, FakeBackend(reply=flaky), max_chars=100, workers=2, retries=2, backoff=0)
+    assert data["levels"][0][1] is None
+    assert all(data["levels"][0][i] for i in (0, 2, 3))
+    assert set(data["summaries"]) == set(SUMMARY_PROMPTS) and not summaries_complete(data)
+
+    # A later run only regenerates the missing section
+    prompts = []
+    llm = FakeBackend(reply=lambda prompt: prompts.append(prompt) or fake_reply(prompt))
+    again = summarize_document(chunks, llm, max_chars=100, workers=2, sections=data["levels"][0])
+    assert again["levels"][0][0] == data["levels"][0][0] and summaries_complete(again)
+    assert [p for p in prompts if p.startswith(MAP_PROMPT.split("{text}")[0])] == [MAP_PROMPT.format(text=chunks[1])]
@@ -0,0 +1,261 @@
+# tests/test_vectorstore_handler.py
+import hashlib
+
+import faiss
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+from langchain_community.vectorstores import FAISS
+
+from backend.vectorstore_handler import (
+    IncrementalVectorStore,
+    ChunkDocstore,
+    ChunkStore,
+    load_index_config,
+    load_lexical_index,
+    open_vectorstore,
+)
+
+
+def _doc_ids(vs, query, k=10):
+    return {doc.metadata["doc_id"] for doc in vs.similarity_search(query, k=k)}
+
+
+def test_add_update_and_remove_documents(tmp_path, embeddings):
+    persist_dir = str(tmp_path / "vs")
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=20, chunk_overlap=0)
+    assert store.add_document("a", "apples are red. bananas are yellow.") == 2
+    assert store.add_document("b", "zebras run fast") == 1
+    store.save()
+
+    # Reopening keeps both documents; re-adding an unchanged one embeds nothing
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=20, chunk_overlap=0)
+    assert store.add_document("a", "apples are red. bananas are yellow.") == 0
+    # Only the changed chunk is embedded
+    assert store.add_document("a", "apples are red. cherries are dark.") == 1
+    assert store.vectorstore.index.ntotal == 3
+
+    assert store.remove_document("a")
+    assert not store.remove_document("a")
+    store.save()
+
+    vs = open_vectorstore(persist_dir, embeddings)
+    assert vs.index.ntotal == 1
+    assert _doc_ids(vs, "zebras") == {"b"}
+
+
+def test_reopening_after_an_interrupted_save_reconciles_with_the_manifest(tmp_path, monkeypatch, embeddings):
+    persist_dir = tmp_path / "vs"
+    store = IncrementalVectorStore(str(persist_dir), embeddings, chunk_size=20, chunk_overlap=0)
+    store.add_document("a", "apples are red. bananas are yellow.")
+    store.save()
+    saved_index = (persist_dir / "index.faiss").read_bytes()
+
+    # Stopped after the index was written: it holds "b", the manifest does not
+    store.add_document("b", "zebras run fast")
+    with monkeypatch.context() as m:
+        m.setattr("backend.vectorstore_handler.write_chunk_files", lambda *args: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            store.save()
+    store = IncrementalVectorStore(str(persist_dir), embeddings, chunk_size=20, chunk_overlap=0)
+    assert store.document_ids() == ["a"] and store.vectorstore.index.ntotal == 2
+    assert store.add_document("b", "zebras run fast") == 1
+    assert store.vectorstore.index.ntotal == 3
+    store.save()
+
+    # A manifest listing chunks the index lacks: "b" is dropped and re-added in full
+    (persist_dir / "index.faiss").write_bytes(saved_index)
+    store = IncrementalVectorStore(str(persist_dir), embeddings, chunk_size=20, chunk_overlap=0)
+    assert store.document_ids() == ["a"]
+    assert store.add_document("b", "zebras run fast") == 1
+    store.save()
+    assert _doc_ids(open_vectorstore(str(persist_dir), embeddings), "zebras") >= {"b"}
+
+
+def test_adopts_index_built_by_from_texts(tmp_path, embeddings):
+    persist_dir = str(tmp_path / "vs")
+    FAISS.from_texts(["old chunk one", "old chunk two"], embeddings).save_local(persist_dir)
+
+    store = IncrementalVectorStore(persist_dir, embeddings)
+    store.add_document("new", "a brand new document")
+    store.save()
+
+    vs = open_vectorstore(persist_dir, embeddings)
+    assert _doc_ids(vs, "chunk") == {"legacy", "new"}
+
+
+def test_add_document_consumes_page_stream(tmp_path, embeddings):
+    store = IncrementalVectorStore(str(tmp_path / "vs"), embeddings, chunk_size=40, chunk_overlap=0)
+    pages = ((n, f"content of page {n}") for n in range(1, 4))
+    assert store.add_document("doc", pages, embed_batch=2) == 3
+    docs = [store.vectorstore.docstore.search(str(i)) for i in range(3)]
+    assert [d.page_content for d in docs] == [f"content of page {n}" for n in range(1, 4)]
+    assert [d.metadata["page"] for d in docs] == [1, 2, 3]
+
+
+def test_chunks_carry_page_and_offsets(tmp_path, embeddings):
+    store = IncrementalVectorStore(str(tmp_path / "vs"), embeddings, chunk_size=30, chunk_overlap=0)
+    legacy_text = "\n\n[Page 1]\nzebra zone\n\n\n[Page 2]\nalpha apple. another apple here"
+    store.add_document("a", legacy_text)
+    store.add_document("b", [(5, "zebra on page five")])
+
+    docs = [store.vectorstore.docstore.search(str(i)) for i in store.select_chunk_ids()]
+    pages = {(d.metadata["doc_id"], d.metadata["page"]) for d in docs}
+    assert pages == {("a", 1), ("a", 2), ("b", 5)}
+    for doc in docs:
+        assert "[Page" not in doc.page_content
+        assert doc.metadata["end"] - doc.metadata["start"] == len(doc.page_content)
+
+    hits = store.search("zebra", k=4, doc_ids={"a"})
+    assert {d.metadata["doc_id"] for d, _ in hits} == {"a"}
+    hits = store.search("apple", k=4, pages=(2, 5))
+    assert {d.metadata["page"] for d, _ in hits} <= {2, 5}
+    assert store.search("apple", pages=(9, 9)) == []
+
+
+def test_save_writes_lexical_index(tmp_path, embeddings):
+    persist_dir = str(tmp_path / "vs")
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=20, chunk_overlap=0)
+    store.add_document("a", "apples are red. bananas are yellow.")
+    store.add_document("b", "zebras run fast")
+    store.save()
+    assert (tmp_path / "vs" / "lexical.npz").exists()
+
+    vs = open_vectorstore(persist_dir, embeddings)
+    lexical = load_lexical_index(persist_dir, vs)
+    (chunk_id, _), = lexical.search("zebras")
+    assert vs.docstore.search(chunk_id).metadata["doc_id"] == "b"
+
+    # Removed chunks leave the lexical index on the next save
+    store.remove_document("b")
+    store.save()
+    assert load_lexical_index(persist_dir, vs).search("zebras") == []
+
+
+class HashEmbeddings(Embeddings):
+    """Pseudo-random 32-d vectors seeded by the text, spread enough to train IVF / PQ"""
+
+    def _vector(self, text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=32).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq", "hnsw"])
+def test_ann_index_types(tmp_path, index_type):
+    persist_dir = str(tmp_path / "vs")
+    embeddings = HashEmbeddings()
+    params = {"min_train": 300, "nprobe": 64, "ef_search": 128}
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=30, chunk_overlap=0,
+                                   index_type=index_type, index_params=params)
+    for d in range(40):
+        store.add_document(f"doc{d}", [(p, f"document {d} page {p} text") for p in range(1, 9)])
+    # Below min_train nothing is trained yet
+    assert not store.index_config["trained"]
+    store.save()
+    assert store.index_config["trained"]
+
+    # The type is stored with the index and wins over the constructor argument
+    assert load_index_config(persist_dir)["type"] == index_type
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=30, chunk_overlap=0)
+    assert store.index_config["type"] == index_type
+    expected = {"ivf_flat": faiss.IndexIVFFlat, "ivf_pq": faiss.IndexIVFPQ, "hnsw": faiss.IndexIDMap2}
+    assert isinstance(store.vectorstore.index, expected[index_type])
+
+    hits = store.vectorstore.similarity_search("document 7 page 3 text", k=5)
+    assert "document 7 page 3 text" in [d.page_content for d in hits]
+
+    # Filtered search stays exact over the selection; removal works for every type
+    hits = store.search("document 7 page 3 text", k=3, doc_ids={"doc7"}, pages=(3, 4))
+    assert [d.page_content for d, _ in hits] == ["document 7 page 3 text", "document 7 page 4 text"]
+    assert store.remove_document("doc7")
+    store.add_document("extra", "an extra document")
+    store.save()
+    assert store.vectorstore.index.ntotal == 40 * 8 - 8 + 1
+    assert store.search("document 7 page 3 text", doc_ids={"doc7"}) == []
+
+
+def test_hnsw_removals_rebuild_the_graph_once(tmp_path, monkeypatch):
+    from backend import vectorstore_handler
+
+    store = IncrementalVectorStore(str(tmp_path / "vs"), HashEmbeddings(), chunk_size=30, chunk_overlap=0,
+                                   index_type="hnsw", index_params={"min_train": 50})
+    for d in range(10):
+        store.add_document(f"doc{d}", [(p, f"document {d} page {p} text") for p in range(1, 9)])
+    store.save()
+    assert store.index_config["trained"]
+
+    builds = []
+    create = vectorstore_handler.create_ann_index
+    monkeypatch.setattr(vectorstore_handler, "create_ann_index", lambda *args: builds.append(1) or create(*args))
+    for d in range(3):
+        store.remove_document(f"doc{d}")
+    # Updates drop the chunks that changed
+    store.add_document("doc3", [(1, "document 3 page 1 text"), (2, "a rewritten second page")])
+    store.add_document("doc4", [(1, "document 4 page 1 text")])
+    assert builds == []
+
+    hits = store.search("document 1 page 3 text", k=5)
+    assert builds == [1]
+    assert all(d.metadata["doc_id"] not in {"doc0", "doc1", "doc2"} for d, _ in hits)
+    assert store.vectorstore.index.ntotal == 7 * 8 - 7 + 1 - 7
+    store.save()
+    assert builds == [1]
+    hits = store.vectorstore.similarity_search("a rewritten second page", k=3)
+    assert "a rewritten second page" in [d.page_content for d in hits]
+
+
+def test_open_vectorstore_maps_chunks_without_pickle(tmp_path, embeddings):
+    persist_dir = str(tmp_path / "vs")
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=30, chunk_overlap=0)
+    store.add_document("a", [(1, "zebra zone"), (2, "alpha apple. ünïcode apple here")], metadata={"name": "a.pdf"})
+    store.save()
+    assert not (tmp_path / "vs" / "index.pkl").exists()
+
+    vs = open_vectorstore(persist_dir, embeddings)
+    assert isinstance(vs.docstore, ChunkDocstore)
+    expected = {str(i): store.vectorstore.docstore.search(str(i)) for i in store.select_chunk_ids()}
+    for docstore_id, doc in expected.items():
+        assert vs.docstore.search(docstore_id) == doc
+    assert vs.docstore.search("999").startswith("ID 999 not found")
+    assert vs.similarity_search("zebra", k=1)[0].metadata == {"name": "a.pdf", "doc_id": "a", "chunk": 0,
+                                                                "page": 1, "start": 0, "end": 10}
+
+    # A reader keeps its mapped files while the store is rewritten
+    store.add_document("b", "brand new zebras")
+    store.remove_document("a")
+    store.save()
+    assert vs.similarity_search("zebra", k=1)[0].metadata["doc_id"] == "a"
+    reopened = IncrementalVectorStore(persist_dir, embeddings)
+    assert reopened.document_ids() == ["b"]
+    assert open_vectorstore(persist_dir, embeddings).similarity_search("zebra", k=1)[0].page_content == "brand new zebras"
+
+
+def test_compact_chunk_store_round_trips_metadata(tmp_path, embeddings):
+    persist_dir = str(tmp_path / "vs")
+    FAISS.from_texts(["old chunk one"], embeddings).save_local(persist_dir)
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=30, chunk_overlap=0)
+    store.add_document("a", [(None, "no page here"), (3, "third page")], metadata={"name": "a.txt"})
+    store.save()
+    expected = {i: store.vectorstore.docstore.search(str(i)) for i in store.select_chunk_ids()}
+
+    chunks = ChunkStore(persist_dir)
+    assert len(chunks) == 3
+    assert {i: chunks.document(i) for i in chunks.ids().tolist()} == expected
+    # Adopted chunks have neither a page nor offsets
+    assert "page" not in chunks.document(0).metadata and "start" not in chunks.document(0).metadata
+    assert chunks.index_config["type"] == "flat"
+
+    # Reopening for ingest fetches saved chunks on demand instead of loading them all
+    store = IncrementalVectorStore(persist_dir, embeddings, chunk_size=30, chunk_overlap=0)
+    assert store.vectorstore.docstore.added == {}
+    store.remove_document("legacy")
+    store.add_document("b", "zebra")
+    store.save()
+    assert sorted(d.page_content for d in open_vectorstore(persist_dir, embeddings).similarity_search("e", k=9)) == [
+        "no page here", "third page", "zebra"]